@@ -0,0 +1,79 @@
+import asyncio
+import json
+import logging
+import time
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+def fetch_jwks(source: str) -> dict:
+    """Loads a JWKS document from an https:// URL, a file:// URL or a local path."""
+    if source.startswith(("http://", "https://")):
+        response = requests.get(source, timeout=5)
+        response.raise_for_status()
+        return response.json()
+    path = source[len("file://"):] if source.startswith("file://") else source
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+class JWKSCache:
+    """Caches the signing keys of a JWKS endpoint by `kid`.
+
+    Keys are refetched when the TTL runs out or when a token names a `kid` we
+    have not seen (Auth0 key rotation). Only one fetch runs at a time; other
+    callers wait for it instead of issuing their own request. Unknown-kid
+    refetches are limited to one per `min_refresh_interval` seconds so a flood
+    of forged tokens can't turn into a flood of JWKS requests."""
+
+    def __init__(self, source: str, ttl: float = 3600, min_refresh_interval: float = 30, fetcher=fetch_jwks):
+        self.source = source
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.fetcher = fetcher
+        self._keys = {}
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+        self.fetches = 0
+
+    def _fresh(self) -> bool:
+        return bool(self._keys) and time.monotonic() - self._fetched_at < self.ttl
+
+    async def _refresh(self, seen_fetched_at: float, force: bool):
+        async with self._lock:
+            # Someone else refreshed while we were waiting for the lock
+            if self._fetched_at != seen_fetched_at:
+                return
+            if force and time.monotonic() - self._fetched_at < self.min_refresh_interval:
+                return
+            # The fetch is blocking I/O, keep it off the event loop
+            jwks = await asyncio.to_thread(self.fetcher, self.source)
+            self._keys = {
+                key["kid"]: {
+                    "kty": key["kty"],
+                    "kid": key["kid"],
+                    "use": key["use"],
+                    "n": key["n"],
+                    "e": key["e"]
+                }
+                for key in jwks["keys"]
+            }
+            self._fetched_at = time.monotonic()
+            self.fetches += 1
+            logger.debug(f"Fetched {len(self._keys)} JWKS keys from {self.source}")
+
+    async def get_key(self, kid: str):
+        if not self._fresh():
+            await self._refresh(self._fetched_at, force=False)
+        elif kid not in self._keys:
+            await self._refresh(self._fetched_at, force=True)
+        return self._keys.get(kid)
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self._keys),
+            "fetches": self.fetches,
+            "age": round(time.monotonic() - self._fetched_at, 1) if self._fetched_at else None,
+        }
@@ -0,0 +1,118 @@
+"""Request concurrency on /goals and /expenses/{date} against a SQLite stand-in.
+
+Each query sleeps for --latency seconds to model the round trip to MySQL.
+With the async data-access layer, throughput should grow with concurrency
+up to the pool size; with --blocking (queries run directly on the event
+loop, like the old handlers) it stays flat at about 1 / (queries * latency).
+The per-user read cache is bypassed so every request reaches the database;
+pass --read-cache to measure cached responses instead.
+
+    cd backend
+    python benchmarks/bench_async_db.py --latency 0.005 --requests 200
+
+Needs httpx in addition to the backend requirements.
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from standin import connection_factory, make_database, StandInConnection
+
+BENCH_USER = "bench|user"
+
+
+def seed(path):
+    conn = StandInConnection(path)
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO Users (auth0_id, name, email) VALUES (%s, %s, %s)", (BENCH_USER, "Bench", "bench@example.com"))
+    user_id = cursor.lastrowid
+    cursor.executemany(
+        "INSERT INTO Goals (status, set_date, due_date, target_amount, current_amount, auth0_id, user_id, title, description) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+        [("active", "2024-11-01", "2025-06-01", 1000 + i, 10 * i, BENCH_USER, user_id, f"Goal {i}", "") for i in range(20)],
+    )
+    cursor.executemany(
+        "INSERT INTO Expenses (date, amount, category, user_id) VALUES (%s, %s, %s, %s)",
+        [("2024-12-10", 5.0 + i, "grocery", user_id) for i in range(50)],
+    )
+    conn.commit()
+    conn.close()
+
+
+class NoStore:
+    """Read cache backend that never keeps anything: every request is a miss."""
+    name = "none"
+
+    async def get(self, key):
+        return None
+
+    async def set(self, key, value):
+        pass
+
+    def stats(self):
+        return {}
+
+
+async def run(client, path, concurrency, total):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            response = await client.get(path, headers={"Authorization": "Bearer bench"})
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(total)])
+    return total / (time.perf_counter() - start)
+
+
+async def main_async(args):
+    from concurrent.futures import ThreadPoolExecutor
+    import httpx
+    import db
+
+    path = make_database()
+    seed(path)
+    db.db_pool = db.ConnectionPool(
+        factory=connection_factory(path, latency=args.latency),
+        pool_size=args.pool_size,
+        max_overflow=0,
+        pre_ping=False,
+    )
+    db.db_executor = ThreadPoolExecutor(max_workers=args.pool_size)
+    if args.blocking:
+        async def run_inline(fn, *a, **kw):
+            return fn(*a, **kw)
+        db.run_db = run_inline
+
+    import main
+    logging.getLogger().setLevel(logging.WARNING)  # main.py turns on DEBUG logging
+
+    async def fake_verify_token(token):
+        return {"sub": BENCH_USER}
+    main.verify_token = fake_verify_token
+    if not args.read_cache:
+        main.read_cache.backend = NoStore()
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        mode = "blocking" if args.blocking else "async"
+        print(f"mode={mode} latency={args.latency * 1000:.1f}ms pool={args.pool_size} requests={args.requests} "
+              f"read_cache={'on' if args.read_cache else 'off'}")
+        print(f"{'endpoint':<22}{'concurrency':>12}{'req/s':>10}")
+        for endpoint in ("/goals", "/expenses/2024-12-10"):
+            for concurrency in args.concurrency:
+                rate = await run(client, endpoint, concurrency, args.requests)
+                print(f"{endpoint:<22}{concurrency:>12}{rate:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.005, help="simulated seconds per query")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--pool-size", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--blocking", action="store_true", help="run queries on the event loop like the old handlers")
+    parser.add_argument("--read-cache", action="store_true", help="keep the per-user read cache on")
+    asyncio.run(main_async(parser.parse_args()))
@@ -0,0 +1,89 @@
+"""Listing page parse time: CardSelector vs BeautifulSoup.
+
+Every parser extracts the same fields with the same selectors from the same
+saved pages, and the results are checked to be identical. "bs4
+html.parser" is how the scrapers parsed pages before (one full
+BeautifulSoup tree per page, then a select per field per card).
+
+    cd backend
+    python benchmarks/bench_parsing.py --pages 1-12
+    python benchmarks/bench_parsing.py --fixtures pages   # pages saved with --save-pages
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from bs4 import BeautifulSoup
+
+from fixtures import PAGES, write_fixtures
+from scrapers import ADAPTERS, CardSelector, parse_pages
+from scrapers.fetch import page_path
+from scrapers.parsing import BACKENDS
+
+
+def bs4_extract(cards: CardSelector, html: str, features: str) -> list:
+    soup = BeautifulSoup(html, features)
+    items = []
+    for card in soup.select(cards.card):
+        item = {}
+        for name, field in cards.fields.items():
+            node = card.select_one(field.selector)
+            if node is None:
+                item[name] = field.default
+            elif field.attr:
+                item[name] = node.get(field.attr) or field.default
+            else:
+                item[name] = " ".join(node.get_text().split())
+        items.append(item)
+    return items
+
+
+def timed(fn, pages, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [fn(html) for html in pages]
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) / len(pages) * 1000, results
+
+
+def main(args):
+    numbers = parse_pages(args.pages)
+    directory = args.fixtures or write_fixtures(os.path.join(tempfile.gettempdir(), "econome_fixtures"), numbers)
+
+    for store in args.stores:
+        adapter = ADAPTERS[store]()
+        pages = []
+        for page in numbers:
+            with open(page_path(directory, adapter, page), encoding="utf-8") as f:
+                pages.append(f.read())
+        size = sum(len(html) for html in pages) / len(pages)
+        print(f"\n{adapter.store_name}: {len(pages)} pages, avg {size / 1024:.0f} KiB")
+
+        parsers = {
+            "bs4 html.parser": lambda html: bs4_extract(adapter.cards, html, "html.parser"),
+            "bs4 lxml": lambda html: bs4_extract(adapter.cards, html, "lxml"),
+        }
+        for backend in BACKENDS:
+            cards = CardSelector(adapter.cards.card, adapter.cards.fields, backend=backend)
+            parsers[f"CardSelector ({backend})"] = lambda html, cards=cards: list(cards.extract(html))
+
+        print(f"{'parser':<26}{'ms/page':>10}{'pages/sec':>11}{'speedup':>9}{'cards':>7}  same")
+        baseline = expected = None
+        for name, parse in parsers.items():
+            ms, results = timed(parse, pages, args.repeat)
+            baseline = baseline or ms
+            expected = expected or results
+            cards = sum(len(r) for r in results)
+            print(f"{name:<26}{ms:>10.2f}{1000 / ms:>11.1f}{baseline / ms:>8.1f}x{cards:>7}  {results == expected}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stores", nargs="+", default=list(PAGES))
+    parser.add_argument("--pages", default="1-12")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--fixtures", help="directory of saved <store>/page_<n>.html files")
+    main(parser.parse_args())
@@ -0,0 +1,87 @@
+"""GET /price-history latency against a SQLite stand-in PriceHistory table.
+
+Seeds --products products with --observations price observations each, then
+times price_history() (the primary-key range scan bucketed in SQL) over a
+few ranges, next to fetching the raw rows of the same range.
+
+    cd backend
+    python benchmarks/bench_price_history.py --products 2000 --observations 1000
+"""
+import argparse
+import asyncio
+import datetime
+import random
+import statistics
+import time
+
+import standin
+from db import AsyncCursor
+from pricehistory import price_history
+
+STORES = ["Target", "Trader Joe's"]
+START = datetime.datetime(2022, 1, 1)
+
+
+def seed(path, products: int, observations: int, seed: int = 7):
+    rng = random.Random(seed)
+    conn = standin.StandInConnection(path)
+    cursor = conn.cursor()
+    step = datetime.timedelta(hours=12)
+    for p in range(products):
+        price = round(rng.uniform(0.5, 15), 2)
+        rows = []
+        for i in range(observations):
+            price = max(0.25, round(price + rng.choice([-0.1, 0, 0, 0.1]), 2))
+            rows.append((STORES[p % 2], f"Product {p}", START + i * step, price, None))
+        cursor.executemany(
+            "INSERT INTO PriceHistory (store_name, product_name, observed_at, price, unit_price) "
+            "VALUES (%s, %s, %s, %s, %s)", rows)
+    conn.commit()
+    conn.close()
+    return START + observations * step
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000, result
+
+
+def main(args):
+    path = standin.make_database()
+    started = time.perf_counter()
+    end = seed(path, args.products, args.observations)
+    print(f"rows={args.products * args.observations:,} seeded in {time.perf_counter() - started:.1f}s")
+
+    conn = standin.StandInConnection(path)
+    cursor = AsyncCursor(conn.cursor(dictionary=True))
+    raw = conn.cursor()
+    store, product = STORES[1], f"Product {args.products // 2 + 1}"
+    loop = asyncio.new_event_loop()
+
+    print(f"{'range':<10}{'points':>8}{'history ms':>12}{'raw rows ms':>13}{'raw rows':>10}")
+    for label, days in (("30 days", 30), ("1 year", 365), ("all", None)):
+        start = end - datetime.timedelta(days=days) if days else START
+        history_ms, history = timed(lambda: loop.run_until_complete(
+            price_history(cursor, store, product, start, end, args.points)), args.repeat)
+
+        def raw_rows():
+            raw.execute("SELECT observed_at, price FROM PriceHistory WHERE store_name = %s AND product_name = %s "
+                        "AND observed_at >= %s AND observed_at < %s", (store, product, start, end))
+            return raw.fetchall()
+
+        raw_ms, rows = timed(raw_rows, args.repeat)
+        print(f"{label:<10}{len(history['sparkline']):>8}{history_ms:>12.2f}{raw_ms:>13.2f}{len(rows):>10,}")
+    loop.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--observations", type=int, default=1000)
+    parser.add_argument("--points", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=20)
+    main(parser.parse_args())
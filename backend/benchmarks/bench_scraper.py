@@ -0,0 +1,54 @@
+"""Scraper throughput (pages/sec) over saved listing pages.
+
+Runs the scrapers pipeline for every store against local fixtures with
+1..N workers. Each page fetch waits --latency seconds to stand in for a
+headless page load (what the explicit readiness wait actually spends), so
+the numbers show how far concurrency hides it; --latency 0 measures parsing
+alone. The old Target runner slept a fixed 5s per page on one browser:
+0.2 pages/sec at best.
+
+    cd backend
+    python benchmarks/bench_scraper.py --pages 1-12 --latency 1.5
+    python benchmarks/bench_scraper.py --fixtures pages   # pages saved with --save-pages
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from fixtures import PAGES, write_fixtures
+from scrapers import ADAPTERS, FixtureFetcher, parse_pages, run
+from scrapers.fetch import page_path
+
+
+def main(args):
+    numbers = parse_pages(args.pages)
+    directory = args.fixtures or write_fixtures(os.path.join(tempfile.gettempdir(), "econome_fixtures"), numbers)
+    adapters = [ADAPTERS[store]() for store in args.stores]
+    pages = {adapter: numbers for adapter in adapters}
+    total = len(numbers) * len(adapters)
+    size = sum(os.path.getsize(page_path(directory, a, p)) for a in adapters for p in numbers) / total
+    print(f"stores={','.join(args.stores)}  pages={total}  avg page {size / 1024:.0f} KiB  "
+          f"latency={args.latency}s  ({directory})")
+
+    output_dir = tempfile.mkdtemp()
+    print(f"{'workers':>8}{'seconds':>10}{'pages/sec':>11}{'products':>10}")
+    for workers in args.workers:
+        fetcher = FixtureFetcher(directory, latency=args.latency)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # per-page progress lines
+            summary = run(pages, fetcher, workers, rate=0, output_dir=output_dir)
+        elapsed = time.perf_counter() - start
+        print(f"{workers:>8}{elapsed:>10.2f}{total / elapsed:>11.2f}{sum(s['products'] for s in summary.values()):>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stores", nargs="+", default=list(PAGES))
+    parser.add_argument("--pages", default="1-12")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--latency", type=float, default=1.5, help="seconds per simulated page load")
+    parser.add_argument("--fixtures", help="directory of saved <store>/page_<n>.html files")
+    main(parser.parse_args())
@@ -0,0 +1,78 @@
+"""Product search latency: in-process ProductSearchIndex vs a LIKE '%term%' scan.
+
+The LIKE side runs against a SQLite stand-in table with the same rows, which
+(like MySQL) has to scan every product name for a leading-wildcard pattern.
+
+    cd backend
+    python benchmarks/bench_search.py --rows 1000000
+"""
+import argparse
+import random
+import sqlite3
+import statistics
+import time
+
+import standin  # noqa: F401  (puts the backend on sys.path)
+from search import ProductSearchIndex
+
+ADJECTIVES = ["organic", "fresh", "baby", "red", "green", "yellow", "sweet", "mini", "large", "chopped",
+              "sliced", "roasted", "whole", "seedless", "heirloom", "golden", "wild", "frozen", "crispy", "spicy"]
+PRODUCE = ["tomatoes", "onion", "garlic", "kale", "spinach", "carrots", "potatoes", "peppers", "apples",
+           "bananas", "grapes", "lettuce", "broccoli", "cucumber", "mushrooms", "avocado", "berries", "herbs",
+           "celery", "squash", "zucchini", "pears", "lemons", "limes", "mango", "cabbage", "corn", "beets"]
+BRANDS = ["good & gather", "trader joe's", "market pantry", "simply balanced", "favorite day", "taylor farms"]
+STORES = ["Target", "Trader Joe's"]
+QUERIES = ["t", "to", "tom", "tomatoes", "red on", "organic baby spinach", "garlik", "zucchinni", "heirloom tom"]
+
+
+def synthetic_products(rows: int, seed: int = 7):
+    rng = random.Random(seed)
+    products = []
+    for i in range(rows):
+        name = " ".join(rng.sample(ADJECTIVES, rng.randint(0, 2)) + [rng.choice(PRODUCE)])
+        if rng.random() < 0.5:
+            name += f" - {rng.randint(1, 64)}oz - {rng.choice(BRANDS)}"
+        products.append({"product_id": i + 1, "product_name": name.title(),
+                         "store_name": rng.choice(STORES), "price": round(rng.uniform(0.5, 15), 2)})
+    return products
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main(args):
+    products = synthetic_products(args.rows)
+    print(f"products={len(products):,}")
+
+    start = time.perf_counter()
+    index = ProductSearchIndex(products)
+    print(f"index build {time.perf_counter() - start:.1f}s")
+
+    db = sqlite3.connect(":memory:")
+    db.execute("CREATE TABLE Marketplace (product_id INTEGER, product_name TEXT, store_name TEXT, price REAL)")
+    db.executemany("INSERT INTO Marketplace VALUES (:product_id, :product_name, :store_name, :price)", products)
+
+    print(f"{'query':<24}{'cold ms':>10}{'warm ms':>10}{'LIKE ms':>10}{'matches':>10}")
+    for query in QUERIES:
+        cold_ms = timed(lambda: index.search(query, limit=args.limit), 1)  # first time this query is seen
+        index_ms = timed(lambda: index.search(query, limit=args.limit), args.repeat)
+        # The old /products/ query: no index can serve a leading wildcard
+        like_ms = timed(lambda: db.execute(
+            "SELECT * FROM Marketplace WHERE LOWER(product_name) LIKE ?",
+            (f"%{query.lower()}%",)).fetchall(), max(1, args.repeat // 10))
+        total = index.search(query, limit=1)["total"]
+        print(f"{query:<24}{cold_ms:>10.3f}{index_ms:>10.3f}{like_ms:>10.3f}{total:>10,}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=50)
+    main(parser.parse_args())
@@ -0,0 +1,103 @@
+"""Asserts that every hot route query is served by an index, using EXPLAIN.
+
+Runs the migrations first, then EXPLAINs each query in ROUTE_QUERIES. Against
+MySQL (the db_* env vars) a query passes when EXPLAIN reports a key and an
+index access type; with --sqlite it runs against the stand-in schema (built
+from the same migrations) and passes when every table in EXPLAIN QUERY PLAN
+is a SEARCH, not a SCAN.
+
+    cd backend
+    python benchmarks/check_indexes.py
+    python benchmarks/check_indexes.py --sqlite
+"""
+import argparse
+import datetime
+import sys
+
+import standin
+
+TODAY = datetime.date.today()
+
+# (route, query, sample parameters), the same statements the handlers run
+ROUTE_QUERIES = [
+    ("resolve_user_id", "SELECT user_id FROM Users WHERE auth0_id = %s", ("auth0|check",)),
+    ("GET /goals", "SELECT * FROM Goals WHERE auth0_id = %s ORDER BY due_date ASC", ("auth0|check",)),
+    ("GET /goals?status=", "SELECT * FROM Goals WHERE auth0_id = %s AND status = %s ORDER BY due_date ASC",
+     ("auth0|check", "active")),
+    ("PUT/DELETE /goals/{id}", "SELECT * FROM Goals WHERE goal_id = %s AND auth0_id = %s", (1, "auth0|check")),
+    ("GET /expense-dates", "SELECT DISTINCT date FROM Expenses WHERE user_id = %s ORDER BY date DESC", (1,)),
+    ("GET /expenses/{date}", "SELECT * FROM Expenses WHERE user_id = %s AND date = %s", (1, TODAY)),
+    ("POST /upload-expenses", "DELETE FROM Expenses WHERE user_id = %s AND date = %s", (1, TODAY)),
+    ("PUT /expenses/{id}", "SELECT date, amount, category FROM Expenses WHERE expense_id = %s AND user_id = %s",
+     (1, 1)),
+    ("GET /ai-review goals", "SELECT * FROM Goals WHERE user_id = %s AND status = 'active'", (1,)),
+    ("GET /api/yes_no", "SELECT 1 FROM yes_no WHERE email = %s", ("check@example.com",)),
+    ("GET /category-rules", "SELECT keyword, category FROM CategoryRules WHERE user_id = %s ORDER BY rule_id", (1,)),
+    ("GET /daily-average", "SELECT category, SUM(total_amount) AS total FROM ExpenseRollups "
+                           "WHERE user_id = %s AND period_type = %s AND period_start >= %s GROUP BY category",
+     (1, "day", TODAY)),
+    ("marketplace upsert key", "SELECT price FROM Marketplace WHERE product_name = %s AND store_name = %s",
+     ("Check", "Target")),
+    ("GET /price-history opening", "SELECT price FROM PriceHistory WHERE store_name = %s AND product_name = %s "
+                                   "AND observed_at < %s ORDER BY observed_at DESC LIMIT 1",
+     ("Target", "Check", TODAY)),
+    ("GET /price-history range", "SELECT MIN(price), MAX(price), COUNT(*) FROM PriceHistory WHERE store_name = %s "
+                                 "AND product_name = %s AND observed_at >= %s AND observed_at < %s",
+     ("Target", "Check", TODAY, TODAY)),
+]
+
+# EXPLAIN access types that mean an index lookup rather than a full scan
+INDEX_ACCESS = {"system", "const", "eq_ref", "ref", "ref_or_null", "range", "index_merge"}
+
+
+def mysql_plan(cursor, query, params):
+    cursor.execute("EXPLAIN " + query, params)
+    problems = []
+    for row in cursor.fetchall():
+        extra = row.get("Extra") or ""
+        if "no matching row" in extra or "Impossible WHERE" in extra:
+            continue  # resolved through a unique key against an empty table
+        if not row.get("key") or row.get("type") not in INDEX_ACCESS:
+            problems.append(f"{row.get('table')}: type={row.get('type')} key={row.get('key')}")
+    return problems
+
+
+def sqlite_plan(cursor, query, params):
+    cursor.execute("EXPLAIN QUERY PLAN " + query, params)
+    return [row["detail"] for row in cursor.fetchall() if row["detail"].startswith("SCAN")]
+
+
+def main(args):
+    if args.sqlite:
+        conn = standin.StandInConnection(standin.make_database())
+        plan = sqlite_plan
+    else:
+        from db import db_pool
+        from schema import migrate
+
+        migrate()
+        conn = db_pool.checkout()
+        plan = mysql_plan
+
+    failures = 0
+    cursor = conn.cursor(dictionary=True)
+    try:
+        for route, query, params in ROUTE_QUERIES:
+            problems = plan(cursor, query, params)
+            failures += bool(problems)
+            print(f"{'FAIL' if problems else 'ok':<6}{route:<26}{'; '.join(problems)}")
+    finally:
+        cursor.close()
+        if args.sqlite:
+            conn.close()
+        else:
+            db_pool.checkin(conn)
+
+    print(f"{len(ROUTE_QUERIES) - failures}/{len(ROUTE_QUERIES)} route queries use an index")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sqlite", action="store_true", help="check against the SQLite stand-in schema")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,150 @@
+"""Synthetic store listing pages for the scraper benchmarks.
+
+Pages follow the markup the scrapers select on (Target's data-test
+attributes, Trader Joe's CSS-module classes) and are padded with the
+scripts, navigation and per-card markup that make real listing pages heavy,
+so parsing costs are realistic.
+Products come from the scraped CSVs in backend/ and are reused with fresh
+ids once a page range runs past them. Real pages saved with
+`python -m scrapers --save-pages DIR` can be used instead."""
+import csv
+import json
+import os
+import random
+from html import escape
+from urllib.parse import urlparse
+
+import standin  # noqa: F401  (puts the backend on sys.path)
+from standin import BACKEND_DIR
+from scrapers import ADAPTERS
+from scrapers.fetch import page_path
+from scrapers.target import PAGE_SIZE
+
+TRADER_JOES_PAGE_SIZE = 15
+
+
+def csv_products(filename: str) -> list:
+    with open(os.path.join(BACKEND_DIR, filename), newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def _page_padding(rng: random.Random) -> tuple:
+    # The inline app state and navigation that every real listing page carries
+    state = {"props": {"taxonomy": [{"id": rng.randint(1, 10 ** 6), "name": f"Category {i}",
+                                     "children": [f"Subcategory {i}.{j}" for j in range(12)]}
+                                    for i in range(400)]}}
+    head = (f'<script id="__TGT_DATA__" type="application/json">{json.dumps(state)}</script>'
+            + "".join(f'<link rel="preload" href="/static/chunk-{i}.js" as="script">' for i in range(40)))
+    nav = "".join(f'<li class="styles_navItem__{i}"><a href="/c/{i}">Category {i}</a></li>' for i in range(300))
+    return head, f'<nav><ul class="styles_nav__Wq1">{nav}</ul></nav>'
+
+
+def _nested_markup(name: str, rng: random.Random) -> str:
+    # Live titles often wrap a brand or keyword in its own tag, and the
+    # parsers must keep the space around it ("Organic <b>Baby</b> Spinach")
+    words = name.split(" ")
+    if len(words) < 2 or rng.random() > 0.3:
+        return name
+    i = rng.randrange(len(words))
+    words[i] = f"<b>{words[i]}</b>"
+    return " ".join(words)
+
+
+def target_card(product: dict, product_id: int, rng: random.Random) -> str:
+    path = urlparse(product["url"]).path.rsplit("/A-", 1)[0]
+    href = f"{path}/A-{product_id}#lnk=sametab"
+    name = escape(product["product_name"])
+    return f"""
+<div data-test="@web/site-top-of-funnel/ProductCardWrapper" class="styles_ndsCol__MIQSp">
+  <div class="styles_cardOuter__x8a2">
+    <picture data-test="@web/ProductCard/ProductCardImage/primary">
+      <source srcset="https://target.scene7.com/is/image/Target/GUEST_{product_id}?wid=300" type="image/webp">
+      <img alt="{name}" src="https://target.scene7.com/is/image/Target/GUEST_{product_id}?wid=300" loading="lazy">
+    </picture>
+    <div data-test="@web/ProductCard/body" class="styles_body__tS2dp">
+      <div class="styles_titleWrap__Rf3i">
+        <a data-test="product-title" href="{escape(href)}" class="styles_titleLink__Ufw8w h-display-block">{_nested_markup(name, rng)} - {rng.randint(1, 32)}oz - Good &amp; Gather&#8482;</a>
+      </div>
+      <div data-test="ratings" class="styles_ratings__a8Kd"><span class="h-sr-only">{rng.uniform(3, 5):.1f} out of 5 stars with {rng.randint(1, 900)} ratings</span>
+        {"".join(f'<svg class="styles_star__{i}" viewBox="0 0 24 24"><path d="M12 2l3 7h7l-6 4 2 7-6-4-6 4 2-7-6-4h7z"></path></svg>' for i in range(5))}
+      </div>
+      <div class="styles_priceWrap__Ck9s">
+        <span data-test="current-price"><span>{escape(product["price"])}</span></span>
+        <div class="styles_unitPrice__bL3k">({rng.uniform(0.1, 2):.2f}/ounce)</div>
+      </div>
+      <div data-test="@web/ProductCard/ProductCardVariantDefault/fulfillment" class="styles_fulfillment__k2Xp">
+        <span>Pickup</span><span>Same Day Delivery</span><span>Shipping not available</span>
+      </div>
+      <button type="button" data-test="chooseOptionsButton" class="styles_button__D8Xvn">Add to cart</button>
+    </div>
+  </div>
+</div>"""
+
+
+def target_page(products: list, page: int, seed: int = 7) -> str:
+    rng = random.Random(seed * 1000 + page)
+    head, nav = _page_padding(rng)
+    cards = "".join(
+        target_card(products[(page * PAGE_SIZE + i) % len(products)], 10 ** 7 + page * PAGE_SIZE + i, rng)
+        for i in range(PAGE_SIZE)
+    )
+    return (f'<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>Fresh Vegetables : Target</title>'
+            f'{head}</head><body><div id="root">{nav}<main><section data-test="product-grid">'
+            f'<div class="styles_grid__L1b2">{cards}</div></section></main></div></body></html>')
+
+
+def trader_joes_card(product: dict, product_id: int, rng: random.Random) -> str:
+    href = urlparse(product["url"]).path.rsplit("-", 1)[0] + f"-{product_id:06d}"
+    name = escape(product["product_name"])
+    return f"""
+<li class="ProductList_productList__item__1EIvq">
+  <section class="ProductCard_card__4KnEu">
+    <div class="ProductCard_card__cover__19gWQ">
+      <a href="{href}" class="Link_link__1AZfr ProductCard_card__imgLink__2ePUN"><picture><img src="/content/dam/trjo/products/m{product_id}/{product_id}.jpg" alt="{name}"></picture></a>
+    </div>
+    <div class="ProductCard_card__category__Xh2qU"><a href="/home/products/category/fresh-fruits-veggies-113" class="Link_link__1AZfr">Fresh Fruits &amp; Veggies</a></div>
+    <a href="{href}" class="Link_link__1AZfr ProductCard_card__title__301JH ProductCard_card__title__large__3bAY6"><h2 class="ProductCard_card__title__text__uiWLe">{_nested_markup(name, rng)}</h2></a>
+    <div class="ProductCard_card__price__1Pj4J"><div class="ProductPrice_productPrice__1Rq1r">
+      <span class="ProductPrice_productPrice__price__3-50j">{escape(product["price"])}</span>
+      <span class="ProductPrice_productPrice__unit__2jvkA">{escape(product.get("unit") or "/1 Each")}</span>
+    </div></div>
+    <button type="button" class="Button_button__3Me73 ProductCard_card__addToList__{rng.randint(100, 999)}" aria-label="Add to list">
+      <svg viewBox="0 0 24 24"><path d="M12 5v14M5 12h14"></path></svg>
+    </button>
+  </section>
+</li>"""
+
+
+def trader_joes_page(products: list, page: int, seed: int = 7) -> str:
+    rng = random.Random(seed * 1000 + page)
+    head, nav = _page_padding(rng)
+    cards = "".join(
+        trader_joes_card(products[(page * TRADER_JOES_PAGE_SIZE + i) % len(products)],
+                         page * TRADER_JOES_PAGE_SIZE + i, rng)
+        for i in range(TRADER_JOES_PAGE_SIZE)
+    )
+    return (f'<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>Fresh Fruits &amp; Veggies</title>'
+            f'{head}</head><body><div id="__next">{nav}<main><ul class="ProductList_productList__list__3-dGs">'
+            f'{cards}</ul></main></div></body></html>')
+
+
+PAGES = {
+    "target": (target_page, "scraped_products.csv"),
+    "traderjoes": (trader_joes_page, "trader_joes_products.csv"),
+}
+
+
+def write_fixtures(directory: str, pages, stores=tuple(PAGES)) -> str:
+    """Writes <directory>/<store>/page_<n>.html for each store and page
+    (skipping existing files) and returns the directory."""
+    for store in stores:
+        render, csv_filename = PAGES[store]
+        adapter = ADAPTERS[store]()
+        products = csv_products(csv_filename)
+        for page in pages:
+            path = page_path(directory, adapter, page)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(render(products, page))
+    return directory
@@ -0,0 +1,143 @@
+"""SQLite stand-in for the MySQL connection used by the benchmarks.
+
+It mimics the small slice of the mysql.connector API that main.py uses
+(`cursor(dictionary=True)`, `%s` placeholders, `commit`, `rollback`,
+`in_transaction`, `is_connected`, plus `INSERT IGNORE`, `UNIX_TIMESTAMP` and
+`FLOOR`) and can add a fixed per-query latency to model the network round
+trip to Cloud SQL."""
+import datetime
+import math
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+
+# Make the backend modules importable when run as `python benchmarks/<script>.py`
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from schema import MIGRATIONS
+
+_AUTO_INCREMENT = re.compile(r"\bINT AUTO_INCREMENT PRIMARY KEY\b")
+_INLINE_INDEX = re.compile(r",\s*INDEX (\w+) \(([^)]*)\)")
+_TABLE_NAME = re.compile(r"CREATE TABLE IF NOT EXISTS (\w+)")
+
+
+def schema_statements():
+    """The SQLite version of every step in schema.MIGRATIONS, so the stand-in
+    (and check_indexes.py --sqlite) has exactly the tables, columns and indexes
+    the migrations create. Data-only steps have nothing to do on a new database."""
+    statements = []
+    for _, _, steps in MIGRATIONS:
+        for step in steps:
+            if hasattr(step, "adds_index"):
+                table, name, columns, unique = step.adds_index
+                statements.append(f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+            elif hasattr(step, "adds_column"):
+                table, name, definition = step.adds_column
+                statements.append(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+            elif isinstance(step, str) and step.strip().startswith("CREATE TABLE"):
+                table = _TABLE_NAME.search(step).group(1)
+                indexes = _INLINE_INDEX.findall(step)
+                statements.append(_AUTO_INCREMENT.sub("INTEGER PRIMARY KEY AUTOINCREMENT", _INLINE_INDEX.sub("", step)))
+                statements.extend(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})" for name, columns in indexes)
+    return statements
+
+
+_PLACEHOLDER = re.compile(r"%s")
+
+
+def _translate(query):
+    return _PLACEHOLDER.sub("?", query).replace("INSERT IGNORE", "INSERT OR IGNORE")
+
+
+def _unix_timestamp(value):
+    return datetime.datetime.fromisoformat(str(value)).timestamp()
+
+
+class StandInCursor:
+    def __init__(self, conn, dictionary=False):
+        self._conn = conn
+        self._cursor = conn._db.cursor()
+        self.dictionary = dictionary
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def execute(self, query, params=None):
+        if self._conn.latency:
+            time.sleep(self._conn.latency)
+        self._cursor.execute(_translate(query), tuple(params or ()))
+
+    def executemany(self, query, seq_params):
+        if self._conn.latency:
+            time.sleep(self._conn.latency)
+        self._cursor.executemany(_translate(query), [tuple(p) for p in seq_params])
+
+    def _row(self, row):
+        if row is None or not self.dictionary:
+            return row
+        return {d[0]: v for d, v in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(r) for r in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+
+class StandInConnection:
+    def __init__(self, path, latency=0.0):
+        self._db = sqlite3.connect(path, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+        self._db.create_function("UNIX_TIMESTAMP", 1, _unix_timestamp, deterministic=True)
+        self._db.create_function("FLOOR", 1, math.floor, deterministic=True)
+        self.latency = latency
+
+    @property
+    def in_transaction(self):
+        return self._db.in_transaction
+
+    def is_connected(self):
+        return True
+
+    def cursor(self, dictionary=False, **kwargs):
+        return StandInCursor(self, dictionary=dictionary)
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+    def close(self):
+        self._db.close()
+
+
+def make_database(path=None):
+    """Creates (or reuses) a SQLite file with the app's tables and returns its path."""
+    path = path or os.path.join(tempfile.mkdtemp(prefix="econome-bench-"), "bench.db")
+    db = sqlite3.connect(path)
+    for statement in schema_statements():
+        try:
+            db.execute(statement)
+        except sqlite3.OperationalError as e:
+            if "duplicate column" not in str(e):  # reusing a database made earlier
+                raise
+    db.commit()
+    db.close()
+    return path
+
+
+def connection_factory(path, latency=0.0):
+    return lambda: StandInConnection(path, latency=latency)
@@ -0,0 +1,80 @@
+import os
+import asyncio
+import threading
+from typing import Awaitable, Callable, Hashable
+
+import pandas as pd
+from fastapi import HTTPException
+
+from cache import LRUCache
+
+
+class CatalogCache:
+    """Cleaned store catalogs and results computed from them.
+
+    A catalog is identified by (path, mtime, size), so a rescrape that
+    rewrites the CSV is picked up on the next request without any explicit
+    invalidation. Results are memoized under the signatures of the catalogs
+    they were computed from, and concurrent requests for the same result
+    share one computation (single flight)."""
+
+    def __init__(self, loader: Callable[[str], pd.DataFrame], max_results: int = 16):
+        self._loader = loader
+        self._frames = {}  # path -> (signature, DataFrame)
+        self._frames_lock = threading.Lock()
+        self._results = LRUCache(maxsize=max_results)
+        self._inflight = {}  # key -> asyncio.Task
+        self.loads = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def signature(path: str) -> tuple:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail=f"CSV file '{path}' not found")
+        return (path, st.st_mtime_ns, st.st_size)
+
+    def frame(self, path: str) -> pd.DataFrame:
+        """The cleaned catalog at `path`, re-read only when the file changed.
+        Callers must not modify the returned frame."""
+        signature = self.signature(path)
+        with self._frames_lock:
+            cached = self._frames.get(path)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+            frame = self._loader(path)
+            self._frames[path] = (signature, frame)
+            self.loads += 1
+            return frame
+
+    async def memoize(self, key: Hashable, compute: Callable[[], Awaitable]):
+        """Cached result for `key`, computing it at most once at a time."""
+        result = self._results.get(key)
+        if result is not None:
+            return result
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run(key, compute))
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+        # A client disconnecting must not cancel the work other requests wait on
+        return await asyncio.shield(task)
+
+    async def _run(self, key: Hashable, compute: Callable[[], Awaitable]):
+        try:
+            result = await compute()
+            self._results.set(key, result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "catalogs": len(self._frames),
+            "loads": self.loads,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+            "results": self._results.stats(),
+        }
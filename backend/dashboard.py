@@ -0,0 +1,43 @@
+from datetime import date
+
+from rollups import daily_averages, weekly_averages
+
+# Everything the Dashboard page shows on load, for one user. main.py serves
+# it through the read cache, so it is rebuilt only after the user's next
+# expense write (or when the day changes).
+async def build_dashboard(cursor, user_id: int, today: date) -> dict:
+    # 1) every date with expenses, newest first
+    await cursor.execute("SELECT DISTINCT date FROM Expenses WHERE user_id = %s ORDER BY date DESC", (user_id,))
+    dates = [row['date'] for row in await cursor.fetchall()]
+
+    # 2) the latest day's expenses
+    latest = []
+    if dates:
+        await cursor.execute("SELECT * FROM Expenses WHERE user_id = %s AND date = %s", (user_id, dates[0]))
+        latest = await cursor.fetchall()
+
+    # 3) all-time category totals from the monthly rollups
+    await cursor.execute(
+        """
+        SELECT category, SUM(total_amount) AS total, SUM(expense_count) AS count
+        FROM ExpenseRollups
+        WHERE user_id = %s AND period_type = 'month'
+        GROUP BY category
+        ORDER BY total DESC
+        """,
+        (user_id,)
+    )
+    category_totals = [
+        {"category": r['category'], "total": round(float(r['total']), 2), "count": int(r['count'])}
+        for r in await cursor.fetchall()
+    ]
+
+    # 4) and 5) the same averages /daily-average and /weekly-averages return
+    return {
+        "dates": [d.isoformat() for d in dates],
+        "latest_date": dates[0].isoformat() if dates else None,
+        "expenses": latest,
+        "category_totals": category_totals,
+        **(await daily_averages(cursor, user_id, 30, today)),
+        **(await weekly_averages(cursor, user_id, 4, today)),
+    }
@@ -0,0 +1,301 @@
+import os
+import asyncio
+import functools
+import queue
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+
+import mysql.connector
+from dotenv import load_dotenv
+from mysql.connector import Error
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# Standalone entry points (python marketplace.py, schema.py, rollups.py)
+# import this module first, so .env has to be loaded before the settings below
+load_dotenv()
+
+# Database configuration
+DB_HOST = os.getenv("db_host")
+DB_NAME = os.getenv("db_name")
+DB_USER = os.getenv("db_user")
+DB_PASS = os.getenv("db_pass")
+
+# Pool configuration
+DB_POOL_SIZE = int(os.getenv("db_pool_size", 5))
+DB_POOL_MAX_OVERFLOW = int(os.getenv("db_pool_max_overflow", 10))
+DB_POOL_RECYCLE = int(os.getenv("db_pool_recycle", 1800))  # seconds a connection may live
+DB_POOL_TIMEOUT = float(os.getenv("db_pool_timeout", 30))  # seconds to wait for a free connection
+DB_POOL_PRE_PING = os.getenv("db_pool_pre_ping", "true").lower() == "true"
+
+
+# Database connection helper
+def create_connection():
+    try:
+        conn = mysql.connector.connect(
+            host=DB_HOST,
+            database=DB_NAME,
+            user=DB_USER,
+            password=DB_PASS,
+        )
+        if conn.is_connected():
+            logger.debug("Connected to the database")
+            return conn
+    except Error as error:
+        raise HTTPException(status_code=500, detail=f"Database connection error: {error}")
+    raise HTTPException(status_code=500, detail="Database connection failed.")
+
+
+class ConnectionPool:
+    """Keeps up to `pool_size` idle connections around and allows up to
+    `max_overflow` extra connections under bursts. Connections older than
+    `recycle` seconds are replaced, and idle ones are pinged on checkout."""
+
+    def __init__(self, factory=create_connection, pool_size=DB_POOL_SIZE, max_overflow=DB_POOL_MAX_OVERFLOW,
+                 recycle=DB_POOL_RECYCLE, timeout=DB_POOL_TIMEOUT, pre_ping=DB_POOL_PRE_PING):
+        self.factory = factory
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.recycle = recycle
+        self.timeout = timeout
+        self.pre_ping = pre_ping
+
+        self._idle = queue.LifoQueue()  # most recently used first, so extra connections age out
+        self._lock = threading.Lock()
+        self._born = {}  # id(conn) -> creation time
+        self._total = 0
+
+        # Metrics
+        self._checked_out = 0
+        self._checkouts = 0
+        self._created = 0
+        self._recycled = 0
+        self._discarded = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _open(self):
+        conn = self.factory()
+        with self._lock:
+            self._born[id(conn)] = time.monotonic()
+            self._created += 1
+        return conn
+
+    def _close(self, conn):
+        with self._lock:
+            self._born.pop(id(conn), None)
+            self._total -= 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _reserve_slot(self):
+        with self._lock:
+            if self._total < self.pool_size + self.max_overflow:
+                self._total += 1
+                return True
+            return False
+
+    def _healthy(self, conn):
+        try:
+            return conn.is_connected()
+        except Exception:
+            return False
+
+    def checkout(self):
+        start = time.monotonic()
+        while True:
+            conn = self._next_connection(start)
+            if conn is None:
+                continue
+
+            waited = time.monotonic() - start
+            with self._lock:
+                self._checked_out += 1
+                self._checkouts += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            return conn
+
+    def _next_connection(self, start):
+        # Reuse an idle connection if there is one
+        try:
+            return self._validate(self._idle.get_nowait())
+        except queue.Empty:
+            pass
+
+        # Otherwise open a new one while under the size + overflow limit
+        if self._reserve_slot():
+            try:
+                return self._open()
+            except Exception:
+                with self._lock:
+                    self._total -= 1
+                raise
+
+        # At the limit: wait for another request to give one back
+        remaining = self.timeout - (time.monotonic() - start)
+        try:
+            conn = self._idle.get(timeout=max(remaining, 0))
+        except queue.Empty:
+            with self._lock:
+                self._timeouts += 1
+            raise HTTPException(status_code=503, detail="Database connection pool exhausted")
+        return self._validate(conn)
+
+    def _validate(self, conn):
+        """Returns the idle connection if it is still usable, otherwise closes
+        it and returns None so the caller picks (or opens) another one."""
+        born = self._born.get(id(conn), 0)
+        if self.recycle and time.monotonic() - born > self.recycle:
+            self._close(conn)
+            with self._lock:
+                self._recycled += 1
+            return None
+        if self.pre_ping and not self._healthy(conn):
+            self._close(conn)
+            with self._lock:
+                self._discarded += 1
+            return None
+        return conn
+
+    def checkin(self, conn):
+        with self._lock:
+            self._checked_out -= 1
+        try:
+            # Never hand a half-finished transaction to the next request
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            self._close(conn)
+            with self._lock:
+                self._discarded += 1
+            return
+
+        if self._idle.qsize() >= self.pool_size:
+            # Overflow connection, let it go
+            self._close(conn)
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.checkout()
+        try:
+            yield conn
+        finally:
+            self.checkin(conn)
+
+    def dispose(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pool_size": self.pool_size,
+                "max_overflow": self.max_overflow,
+                "open": self._total,
+                "idle": self._idle.qsize(),
+                "checked_out": self._checked_out,
+                "checkouts": self._checkouts,
+                "created": self._created,
+                "recycled": self._recycled,
+                "discarded": self._discarded,
+                "timeouts": self._timeouts,
+                "wait_time_total": round(self._wait_total, 6),
+                "wait_time_avg": round(self._wait_total / self._checkouts, 6) if self._checkouts else 0.0,
+                "wait_time_max": round(self._wait_max, 6),
+            }
+
+
+db_pool = ConnectionPool()
+
+# mysql.connector is blocking, so queries run on a bounded thread pool. One
+# worker per connection the pool can hand out is enough: any more would only
+# queue on the pool anyway.
+db_executor = ThreadPoolExecutor(
+    max_workers=DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW,
+    thread_name_prefix="db",
+)
+
+
+async def run_db(fn, *args, **kwargs):
+    """Runs a blocking database call on the DB executor and awaits the result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(fn, *args, **kwargs))
+
+
+class AsyncCursor:
+    """Awaitable wrapper around a mysql.connector cursor. Attributes such as
+    `rowcount` and `lastrowid` are passed straight through."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    async def execute(self, query, params=None):
+        return await run_db(self._cursor.execute, query, params)
+
+    async def executemany(self, query, seq_params):
+        return await run_db(self._cursor.executemany, query, seq_params)
+
+    async def fetchone(self):
+        return await run_db(self._cursor.fetchone)
+
+    async def fetchall(self):
+        return await run_db(self._cursor.fetchall)
+
+    def close(self):
+        self._cursor.close()
+
+
+class AsyncConnection:
+    """Awaitable wrapper around a pooled connection, handed to route handlers."""
+
+    def __init__(self, conn):
+        self.raw = conn
+
+    def cursor(self, *args, **kwargs):
+        return AsyncCursor(self.raw.cursor(*args, **kwargs))
+
+    async def commit(self):
+        return await run_db(self.raw.commit)
+
+    async def rollback(self):
+        return await run_db(self.raw.rollback)
+
+
+@asynccontextmanager
+async def db_connection():
+    """A pooled connection for part of a request handler, e.g. one that must
+    give it back before a slow LLM call that get_db would hold it through.
+    Like get_db, it waits for a free connection off the event loop."""
+    conn = await asyncio.get_running_loop().run_in_executor(None, db_pool.checkout)
+    try:
+        yield AsyncConnection(conn)
+    finally:
+        db_pool.checkin(conn)
+
+
+# FastAPI dependency: one pooled connection per request. It is a plain
+# generator, so FastAPI waits for a free connection on its thread pool rather
+# than on the event loop.
+def get_db():
+    conn = db_pool.checkout()
+    try:
+        yield AsyncConnection(conn)
+    finally:
+        db_pool.checkin(conn)
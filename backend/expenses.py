@@ -0,0 +1,138 @@
+import io
+import os
+import re
+import time
+from datetime import datetime
+from itertools import repeat
+
+import pandas as pd
+from fastapi import HTTPException
+
+# Rows per multi-row INSERT when loading an upload
+EXPENSE_INSERT_CHUNK = int(os.getenv("EXPENSE_INSERT_CHUNK", 1000))
+# Rows parsed at a time by the streaming importer
+EXPENSE_IMPORT_CHUNK = int(os.getenv("EXPENSE_IMPORT_CHUNK", 5000))
+
+def _bad_rows(mask: pd.Series) -> str:
+    # CSV line numbers (header is line 1) of the first few offending rows
+    rows = [str(i + 2) for i in mask[mask].index[:5]]
+    return ", ".join(rows) + ("..." if mask.sum() > 5 else "")
+
+
+def prepare_expenses(df: pd.DataFrame) -> pd.DataFrame:
+    """Validates an uploaded expense DataFrame and returns date/amount/description columns."""
+    missing = [column for column in ('date', 'amount', 'description') if column not in df.columns]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"CSV file is missing column(s): {', '.join(missing)}")
+
+    dates = pd.to_datetime(df['date'], errors='coerce')
+    if dates.isna().any():
+        raise HTTPException(status_code=400, detail=f"Invalid date on row(s) {_bad_rows(dates.isna())}")
+
+    amounts = pd.to_numeric(df['amount'], errors='coerce')
+    if amounts.isna().any():
+        raise HTTPException(status_code=400, detail=f"Invalid amount on row(s) {_bad_rows(amounts.isna())}")
+
+    return pd.DataFrame({
+        'date': dates.dt.date,
+        'amount': amounts.astype(float),
+        'description': df['description'],
+    })
+
+
+async def insert_expenses(cursor, expenses: pd.DataFrame, user_id: int, chunk_size: int = EXPENSE_INSERT_CHUNK) -> int:
+    """Writes prepared, categorized expenses with batched multi-row INSERTs. The caller owns the transaction."""
+    query = """
+        INSERT INTO Expenses (date, amount, category, user_id)
+        VALUES (%s, %s, %s, %s)
+    """
+    rows = list(zip(expenses['date'], expenses['amount'].tolist(), expenses['category'], repeat(user_id)))
+    for start in range(0, len(rows), chunk_size):
+        await cursor.executemany(query, rows[start:start + chunk_size])
+    return len(rows)
+
+
+def iter_csv_chunks(fileobj, chunksize: int = EXPENSE_IMPORT_CHUNK):
+    """Yields the rows of a binary CSV file object as DataFrames of `chunksize` rows."""
+    text = io.TextIOWrapper(fileobj, encoding='utf-8', newline='')
+    try:
+        yield from pd.read_csv(text, chunksize=chunksize)
+    finally:
+        text.detach()  # leave the underlying upload open for its owner
+
+
+_OFX_TAG = re.compile(r'<(/?)([A-Z0-9.]+)>([^<\r\n]*)')
+_OFX_OPEN, _OFX_CLOSE = '<STMTTRN>', '</STMTTRN>'
+# Characters read from an OFX upload at a time
+OFX_READ_SIZE = 1 << 16
+
+
+def _ofx_date(value: str) -> str:
+    # DTPOSTED looks like 20241210, 20241210120000 or 20241210120000.000[-5:EST]
+    return datetime.strptime(value[:8], '%Y%m%d').date().isoformat()
+
+
+def _ofx_transactions(fileobj, read_size: int = OFX_READ_SIZE):
+    """Yields the text of every <STMTTRN>...</STMTTRN> aggregate in a binary
+    OFX file object. It is read in fixed-size blocks and split on those tags
+    rather than on lines, since many banks export the whole file as one line."""
+    text = io.TextIOWrapper(fileobj, encoding='utf-8', errors='replace', newline='')
+    try:
+        buffer = ''
+        while True:
+            block = text.read(read_size)
+            buffer += block
+            pos = 0
+            while True:
+                end = buffer.find(_OFX_CLOSE, pos)
+                if end == -1:
+                    break
+                end += len(_OFX_CLOSE)
+                start = buffer.rfind(_OFX_OPEN, pos, end)
+                if start != -1:
+                    yield buffer[start:end]
+                pos = end
+            if not block:
+                return
+            # Keep the open transaction, if any, or else whatever could be the
+            # start of a tag cut off by the block boundary
+            start = buffer.rfind(_OFX_OPEN, pos)
+            buffer = buffer[start:] if start != -1 else buffer[max(pos, len(buffer) - len(_OFX_OPEN)):]
+    finally:
+        text.detach()  # leave the underlying upload open for its owner
+
+
+def iter_ofx_chunks(fileobj, chunksize: int = EXPENSE_IMPORT_CHUNK):
+    """Yields the debit transactions of a binary OFX/QFX file object as
+    date/description/amount DataFrames of up to `chunksize` rows.
+
+    Transactions are parsed one at a time as the file is read, so only the
+    current chunk is held in memory. Credits (deposits, refunds) are not
+    expenses and are skipped."""
+    rows = []
+    for aggregate in _ofx_transactions(fileobj):
+        transaction = {tag: value.strip() for closing, tag, value in _OFX_TAG.findall(aggregate)
+                       if not closing and tag != 'STMTTRN'}
+        if 'TRNAMT' in transaction and 'DTPOSTED' in transaction:
+            amount = float(transaction['TRNAMT'])
+            if amount < 0:
+                rows.append({
+                    'date': _ofx_date(transaction['DTPOSTED']),
+                    'description': transaction.get('NAME') or transaction.get('MEMO', ''),
+                    'amount': -amount,
+                })
+                if len(rows) >= chunksize:
+                    yield pd.DataFrame(rows)
+                    rows = []
+    if rows:
+        yield pd.DataFrame(rows)
+
+
+def ingest_summary(rows: int, started: float) -> dict:
+    """Row count and throughput of an upload that started at `started` (time.perf_counter())."""
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": rows,
+        "elapsed_seconds": round(elapsed, 4),
+        "rows_per_second": round(rows / elapsed, 1) if elapsed > 0 else None,
+    }
@@ -0,0 +1,261 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import logging
+import threading
+from typing import Awaitable, Callable, Hashable, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+JOBS_BACKEND = os.getenv("JOBS_BACKEND", "memory")              # memory | sqlite
+JOBS_SQLITE_PATH = os.getenv("JOBS_SQLITE_PATH", "jobs.sqlite3")
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", 4))                 # jobs running at once
+JOBS_MAX_PENDING = int(os.getenv("JOBS_MAX_PENDING", 100))       # queued jobs before submit answers 503
+JOBS_RESULT_SIZE = int(os.getenv("JOBS_RESULT_SIZE", 10000))
+JOBS_RESULT_TTL = int(os.getenv("JOBS_RESULT_TTL", 3600))        # seconds a finished job can be fetched
+
+PENDING = ("queued", "running")
+
+
+class JobsBusy(Exception):
+    """JOBS_MAX_PENDING jobs are already waiting for a worker."""
+
+
+class MemoryStore:
+    """In-process LRU of job records. Jobs are lost on restart and each app
+    instance only sees its own."""
+
+    name = "memory"
+
+    def __init__(self, maxsize: int = JOBS_RESULT_SIZE, ttl: int = JOBS_RESULT_TTL):
+        self._jobs = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    async def save(self, job: dict):
+        self._jobs.set(job["job_id"], dict(job))
+
+    async def load(self, job_id: str) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    def stats(self) -> dict:
+        return self._jobs.stats()
+
+
+class SQLiteStore:
+    """Job records in a local SQLite file, so results survive a restart."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str = JOBS_SQLITE_PATH, ttl: int = JOBS_RESULT_TTL):
+        self.ttl = ttl
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    result TEXT,
+                    error TEXT
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_finished_at ON jobs (finished_at)")
+            # Nothing is left to finish jobs the previous process had queued or started
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Interrupted by a restart', finished_at = ? "
+                "WHERE status IN ('queued', 'running')",
+                (time.time(),)
+            )
+
+    def _save(self, job: dict):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job["job_id"], job["owner"], job["kind"], job["status"], job["created_at"],
+                 job["started_at"], job["finished_at"],
+                 json.dumps(job["result"]) if job["result"] is not None else None, job["error"])
+            )
+            if job["finished_at"] is not None:
+                self._conn.execute("DELETE FROM jobs WHERE finished_at < ?", (time.time() - self.ttl,))
+
+    def _load(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,))
+            row = cursor.fetchone()
+            columns = [c[0] for c in cursor.description]
+        if row is None:
+            return None
+        job = dict(zip(columns, row))
+        if job["finished_at"] is not None and job["finished_at"] < time.time() - self.ttl:
+            return None
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    async def save(self, job: dict):
+        await asyncio.to_thread(self._save, dict(job))
+
+    async def load(self, job_id: str) -> Optional[dict]:
+        return await asyncio.to_thread(self._load, job_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+
+STORES = {"memory": MemoryStore, "sqlite": SQLiteStore}
+
+
+def error_message(e: Exception) -> str:
+    if isinstance(e, asyncio.TimeoutError):
+        return "Timed out"
+    return str(getattr(e, "detail", None) or e) or type(e).__name__
+
+
+class JobQueue:
+    """Background jobs run by a fixed pool of asyncio workers.
+
+    `submit` returns at once with a queued job; at most `workers` jobs run
+    at a time and at most `max_pending` wait, beyond which submit raises
+    JobsBusy instead of letting a spike pile up work. A job identical to one
+    the same owner already has queued or running (same kind and key) is not
+    queued again; the existing job is returned."""
+
+    def __init__(self, store, workers: int = JOBS_WORKERS, max_pending: int = JOBS_MAX_PENDING):
+        self.store = store
+        self.workers = workers
+        self.max_pending = max_pending
+        self._queue = None
+        self._tasks = []
+        self._live = {}     # job_id -> job, while queued or running
+        self._inflight = {}  # (owner, kind, key) -> job
+        self._saving = 0     # submitted jobs not queued until their record is saved
+        self.running = 0
+        self.submitted = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.succeeded = 0
+        self.failed = 0
+
+    def _start(self):
+        # Created lazily so the queue and workers belong to the server's event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.max_pending)
+            self._tasks = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+
+    async def submit(self, owner: str, kind: str, key: Hashable, run: Callable[[], Awaitable]) -> dict:
+        """Queues `run()` as a job of `kind` for `owner`. Its return value
+        (JSON-encodable) becomes the job's result."""
+        self._start()
+        dedup = (owner, kind, key)
+        job = self._inflight.get(dedup)
+        if job is not None:
+            self.deduplicated += 1
+            return self.public(job)
+        if self._queue.qsize() + self._saving >= self.max_pending:
+            self.rejected += 1
+            raise JobsBusy(f"{self.max_pending} jobs are already waiting, please try again later")
+
+        job = {
+            "job_id": uuid.uuid4().hex, "owner": owner, "kind": kind, "status": "queued",
+            "created_at": time.time(), "started_at": None, "finished_at": None, "result": None, "error": None,
+        }
+        self._live[job["job_id"]] = job
+        self._inflight[dedup] = job
+        # Saved before it is queued, so a worker never saves it as running
+        # before (and then gets overwritten by) the queued record. The slot
+        # it takes is held while the save runs.
+        self._saving += 1
+        try:
+            await self.store.save(job)
+        except Exception:
+            self._live.pop(job["job_id"], None)
+            self._inflight.pop(dedup, None)
+            raise
+        finally:
+            self._saving -= 1
+        self._queue.put_nowait((dedup, job, run))
+        self.submitted += 1
+        return self.public(job)
+
+    async def _work(self):
+        while True:
+            dedup, job, run = await self._queue.get()
+            try:
+                await self._run(dedup, job, run)
+            except Exception as e:
+                logger.error(f"Job {job['job_id']} could not be saved: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, dedup: tuple, job: dict, run: Callable[[], Awaitable]):
+        job.update(status="running", started_at=time.time())
+        self.running += 1
+        try:
+            await self.store.save(job)
+            job["result"] = jsonable_encoder(await run())
+            job["status"] = "succeeded"
+            self.succeeded += 1
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = error_message(e)
+            self.failed += 1
+            logger.warning(f"Job {job['job_id']} ({job['kind']}) failed: {job['error']}")
+        finally:
+            self.running -= 1
+            job["finished_at"] = time.time()
+        try:
+            await self.store.save(job)
+        finally:
+            self._live.pop(job["job_id"], None)
+            self._inflight.pop(dedup, None)
+
+    async def get(self, job_id: str, owner: str) -> Optional[dict]:
+        """The job's public record, or None if it does not exist (or has
+        expired, or belongs to someone else)."""
+        job = self._live.get(job_id) or await self.store.load(job_id)
+        if job is None or job["owner"] != owner:
+            return None
+        return self.public(job)
+
+    @staticmethod
+    def public(job: dict) -> dict:
+        return {k: v for k, v in job.items() if k != "owner"}
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.store.name,
+            "workers": self.workers,
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "store": self.store.stats(),
+        }
+
+
+job_queue = JobQueue(STORES[JOBS_BACKEND]())
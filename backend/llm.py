@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import openai
+
+from cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+Messages = List[Dict[str, str]]
+
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")          # openai | fake
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 4))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 60))           # seconds per completion
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", 30))  # seconds to wait for a free slot
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", 1000))
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 24 * 3600))
+
+
+class LLMBusy(Exception):
+    """Every completion slot stayed taken for LLM_QUEUE_TIMEOUT seconds."""
+
+
+class OpenAIProvider:
+    """Chat completions through the async side of the openai 0.28 client."""
+
+    name = "openai"
+
+    def __init__(self, model: str = LLM_MODEL, timeout: float = LLM_TIMEOUT):
+        self.model = model
+        self.timeout = timeout
+
+    async def complete(self, messages: Messages) -> str:
+        response = await openai.ChatCompletion.acreate(
+            model=self.model, messages=messages, request_timeout=self.timeout
+        )
+        return response['choices'][0]['message']['content'].strip()
+
+    async def stream(self, messages: Messages) -> AsyncIterator[str]:
+        chunks = await openai.ChatCompletion.acreate(
+            model=self.model, messages=messages, stream=True, request_timeout=self.timeout
+        )
+        async for chunk in chunks:
+            text = chunk['choices'][0]['delta'].get('content')
+            if text:
+                yield text
+
+
+class FakeProvider:
+    """Deterministic local stand-in for tests and benchmarks: answers with a
+    digest of the prompt after `latency` seconds, streamed word by word."""
+
+    name = "fake"
+
+    def __init__(self, latency: float = float(os.getenv("LLM_FAKE_LATENCY", 0.5)), model: str = "fake"):
+        self.latency = latency
+        self.model = model
+
+    def _answer(self, messages: Messages) -> str:
+        prompt = messages[-1]["content"]
+        digest = hashlib.sha1(prompt.encode()).hexdigest()[:8]
+        return (f"Overview: This is a fake analysis ({digest}) of a {len(prompt)}-character prompt.\n\n"
+                f"Action Checklist:\n- Review your largest categories\n- Keep tracking your expenses")
+
+    async def complete(self, messages: Messages) -> str:
+        await asyncio.sleep(self.latency)
+        return self._answer(messages)
+
+    async def stream(self, messages: Messages) -> AsyncIterator[str]:
+        words = self._answer(messages).split(" ")
+        for i, word in enumerate(words):
+            await asyncio.sleep(self.latency / len(words))
+            yield word if i == 0 else " " + word
+
+
+PROVIDERS = {"openai": OpenAIProvider, "fake": FakeProvider}
+
+
+def cache_key(*parts) -> str:
+    """Stable hash of whatever the answer depends on (e.g. the user's
+    expense and goal snapshot)."""
+    encoded = json.dumps(parts, default=str, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class LLMClient:
+    """Completions with a concurrency cap, timeouts and a result cache.
+
+    At most `max_concurrency` completions run at once; callers wait up to
+    `queue_timeout` for a slot and then get LLMBusy instead of piling up."""
+
+    def __init__(self, provider, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 timeout: float = LLM_TIMEOUT, queue_timeout: float = LLM_QUEUE_TIMEOUT,
+                 cache: Optional[LRUCache] = None):
+        self.provider = provider
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.cache = cache if cache is not None else LRUCache(maxsize=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL)
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.active = 0
+        self.calls = 0
+        self.timeouts = 0
+
+    async def _acquire(self):
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise LLMBusy(f"No completion slot free after {self.queue_timeout}s")
+        self.active += 1
+        self.calls += 1
+
+    def _release(self):
+        self.active -= 1
+        self._slots.release()
+
+    def cached(self, key: Optional[str]) -> Optional[str]:
+        return self.cache.get(key) if key else None
+
+    async def complete(self, messages: Messages, key: Optional[str] = None) -> str:
+        text, _ = await self.complete_cached(messages, key)
+        return text
+
+    async def complete_cached(self, messages: Messages, key: Optional[str] = None) -> Tuple[str, bool]:
+        """(text, whether it came from the cache), from a single cache lookup."""
+        hit = self.cached(key)
+        if hit is not None:
+            return hit, True
+        await self._acquire()
+        started = time.perf_counter()
+        try:
+            text = await asyncio.wait_for(self.provider.complete(messages), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self._release()
+        logger.info(f"LLM completion ({self.provider.name}) took {time.perf_counter() - started:.2f}s")
+        if key:
+            self.cache.set(key, text)
+        return text, False
+
+    async def stream(self, messages: Messages, key: Optional[str] = None) -> AsyncIterator[str]:
+        """Yields the completion as it is generated; a cached answer comes
+        back as one chunk. The full text is cached once the stream ends."""
+        hit = self.cached(key)
+        if hit is not None:
+            yield hit
+            return
+        await self._acquire()
+        deadline = time.monotonic() + self.timeout
+        parts = []
+        try:
+            chunks = self.provider.stream(messages).__aiter__()
+            while True:
+                try:
+                    text = await asyncio.wait_for(chunks.__anext__(), max(0.0, deadline - time.monotonic()))
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    raise
+                parts.append(text)
+                yield text
+        finally:
+            self._release()
+        if key:
+            self.cache.set(key, "".join(parts).strip())
+
+    def stats(self) -> dict:
+        return {
+            "provider": self.provider.name,
+            "model": self.provider.model,
+            "max_concurrency": self.max_concurrency,
+            "active": self.active,
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "cache": self.cache.stats(),
+        }
+
+
+llm = LLMClient(PROVIDERS[LLM_PROVIDER]())
@@ -1,16 +1,18 @@
-from fastapi import FastAPI, HTTPException, Request, Depends, File, UploadFile
+from fastapi import FastAPI, HTTPException, Request, Response, Depends, File, UploadFile
 from io import StringIO
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from fastapi.security import OAuth2AuthorizationCodeBearer
 from jose import jwt
 from dotenv import load_dotenv
 from pydantic import BaseModel
-import requests
 import os
-import mysql.connector
 from mysql.connector import Error
-import csv
-import re
+import time
+import asyncio
+import json
 import pandas as pd
 import openai
 from datetime import date,  datetime, timedelta
@@ -20,12 +22,31 @@ from typing import Optional
 from collections import defaultdict
 import logging
 
-logging.basicConfig(level=logging.DEBUG)
-logger = logging.getLogger(__name__)
+# Load environment variables before the backend modules, which read their
+# settings (database credentials, pool sizes, providers) when imported
+load_dotenv()
 
+from db import db_connection, db_pool, get_db, run_db
+from categorizer import load_user_categorizer, invalidate_user_categorizer, categorizer_stats
+from schema import migrate, migration_status
+from marketplace import run_ingestion, ingestion_progress
+from pricehistory import price_history, local_time, PRICE_HISTORY_MAX_POINTS
+from search import get_search_index, rebuild_search_index, refresh_search_index
+from pricematch import compare_catalogs
+from catalog import CatalogCache
+from llm import llm, cache_key, LLMBusy
+from jobs import job_queue, JobsBusy
+from prompts import render_ai_review_prompt, render_price_comparison_prompt, prompt_stats
+from units import add_unit_prices, size_text
+from expenses import prepare_expenses, insert_expenses, ingest_summary, iter_csv_chunks, iter_ofx_chunks
+from dashboard import build_dashboard
+from readcache import read_cache
+from rollups import rollup_deltas, apply_rollup_deltas, subtract_dates, replace_expense, daily_averages, weekly_averages
+from auth import JWKSCache
+from cache import LRUCache
 
-# Load environment variables
-load_dotenv()
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
 
 # Auth0 configuration
 AUTH0_DOMAIN = os.getenv("REACT_APP_AUTH0_DOMAIN", "dev-xgm0lup6iwjt0i8k.us.auth0.com")
@@ -33,12 +54,6 @@ AUTH0_CLIENT_ID = os.getenv("REACT_APP_AUTH0_CLIENT_ID", "h6VQMvtBnAn3ApXwVjiWcQ
 AUTH0_AUDIENCE = os.getenv("REACT_APP_AUTH0_AUDIENCE", "EKtYAN3Rd7RCVsNhoAPLCuZ0j9AbQoA1")
 ALGORITHMS = ["RS256"]
 
-# Database configuration
-DB_HOST = os.getenv("db_host")
-DB_NAME = os.getenv("db_name")
-DB_USER = os.getenv("db_user")
-DB_PASS = os.getenv("db_pass")
-
 # OpenAI configuration
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
@@ -98,42 +113,36 @@ class Expense(BaseModel):
     category: str
     user_id: int
 
+class CategoryRuleCreate(BaseModel):
+    keyword: str
+    category: str
+
 class YesNoRequest(BaseModel):
     email: str
     response: str  # Must be 'Yes' or 'No'
     auth0_id: str
 
-# Database connection helper
-def create_connection():
-    try:
-        conn = mysql.connector.connect(
-            host=DB_HOST,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASS,
-        )
-        if conn.is_connected():
-            print("Connected to the database")
-            return conn
-    except Error as error:
-        raise HTTPException(status_code=500, detail=f"Database connection error: {error}")
+# Auth0 signing keys and already-verified tokens, so verification is a local operation
+jwks_cache = JWKSCache(
+    os.getenv("AUTH0_JWKS_URL", f"https://{AUTH0_DOMAIN}/.well-known/jwks.json"),
+    ttl=int(os.getenv("AUTH0_JWKS_TTL", 3600)),
+)
+token_cache = LRUCache(maxsize=int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 1024)))
+
+# auth0_id -> user_id, so most requests skip the Users lookup
+user_id_cache = LRUCache(
+    maxsize=int(os.getenv("USER_ID_CACHE_SIZE", 10000)),
+    ttl=int(os.getenv("USER_ID_CACHE_TTL", 3600)),
+)
 
 # Utility to verify JWT
 async def verify_token(token: str = Depends(oauth2_scheme)):
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
     try:
-        jwks_url = f"https://{AUTH0_DOMAIN}/.well-known/jwks.json"
-        jwks = requests.get(jwks_url).json()
         unverified_header = jwt.get_unverified_header(token)
-        rsa_key = {}
-        for key in jwks["keys"]:
-            if key["kid"] == unverified_header["kid"]:
-                rsa_key = {
-                    "kty": key["kty"],
-                    "kid": key["kid"],
-                    "use": key["use"],
-                    "n": key["n"],
-                    "e": key["e"]
-                }
+        rsa_key = await jwks_cache.get_key(unverified_header["kid"])
         if rsa_key:
             payload = jwt.decode(
                 token,
@@ -142,6 +151,8 @@ async def verify_token(token: str = Depends(oauth2_scheme)):
                 audience=AUTH0_AUDIENCE,
                 issuer=f"https://{AUTH0_DOMAIN}/"
             )
+            # Cached until the token itself expires
+            token_cache.set(token, payload, expires_at=payload.get("exp"))
             return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token is expired")
@@ -151,41 +162,71 @@ async def verify_token(token: str = Depends(oauth2_scheme)):
         raise HTTPException(status_code=401, detail="Unable to parse authentication token")
     raise HTTPException(status_code=401, detail="Unable to find appropriate key")
 
+# Resolve the Users.user_id for an Auth0 subject
+async def resolve_user_id(cursor, auth0_id: str) -> int:
+    user_id = user_id_cache.get(auth0_id)
+    if user_id is not None:
+        return user_id
+    await cursor.execute("SELECT user_id FROM Users WHERE auth0_id = %s", (auth0_id,))
+    user_result = await cursor.fetchone()
+    if not user_result:
+        raise HTTPException(status_code=404, detail="User not found")
+    user_id_cache.set(auth0_id, user_result['user_id'])
+    return user_result['user_id']
+
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to Econo-Me!"}
 
 
+# Runtime metrics
+@app.get("/metrics")
+async def metrics():
+    index = get_search_index()
+    return {
+        "db_pool": db_pool.stats(),
+        "auth": {"jwks": jwks_cache.stats(), "tokens": token_cache.stats()},
+        "user_ids": user_id_cache.stats(),
+        "categorizers": categorizer_stats(),
+        "read_cache": read_cache.stats(),
+        "search_index": {"products": len(index), "build_seconds": index.build_seconds} if index else None,
+        "catalogs": catalog_cache.stats(),
+        "llm": llm.stats(),
+        "prompts": prompt_stats.snapshot(),
+        "jobs": job_queue.stats(),
+    }
+
+
 # Login endpoint
 @app.post("/login")
-async def login(user_data: UserLogin, token: str = Depends(oauth2_scheme)):
+async def login(user_data: UserLogin, token: str = Depends(oauth2_scheme), conn=Depends(get_db)):
     user_payload = await verify_token(token)
     print("hitting login endpoint")
     
     if not all([user_data.auth0_id, user_data.email, user_data.name]):
         raise HTTPException(status_code=400, detail="Incomplete user information")
 
-    conn = create_connection()
     try:
         cursor = conn.cursor(dictionary=True)
         # Check if the user already exists
-        cursor.execute("SELECT * FROM Users WHERE auth0_id = %s", (user_data.auth0_id,))
-        user = cursor.fetchone()
+        await cursor.execute("SELECT * FROM Users WHERE auth0_id = %s", (user_data.auth0_id,))
+        user = await cursor.fetchone()
         print("does user exist:", user)
 
         if not user:
             print("User does not exist")
             print(user_data)
             # Insert new user into the database
-            cursor.execute(
+            await cursor.execute(
                 "INSERT INTO Users (auth0_id, name, email) VALUES (%s, %s, %s)",
                 (user_data.auth0_id, user_data.name, user_data.email),
             )
             print("User inserted")
-            conn.commit()
-            cursor.execute("SELECT * FROM Users WHERE auth0_id = %s", (user_data.auth0_id,))
-            user = cursor.fetchone()
+            await conn.commit()
+            user_id_cache.pop(user_data.auth0_id)
+            await cursor.execute("SELECT * FROM Users WHERE auth0_id = %s", (user_data.auth0_id,))
+            user = await cursor.fetchone()
             print(user)
 
         return {"message": "Login successful", "user": user}
@@ -194,20 +235,17 @@ async def login(user_data: UserLogin, token: str = Depends(oauth2_scheme)):
     finally:
         if cursor:
             cursor.close()
-        if conn:
-            conn.close()
 
 # Profile endpoint
 @app.get("/profile")
-async def profile(token: str = Depends(oauth2_scheme)):
+async def profile(token: str = Depends(oauth2_scheme), conn=Depends(get_db)):
     user_payload = await verify_token(token)
     print(user_payload)
     # fetch user data from the database
-    conn = create_connection()
     try:
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM Users WHERE auth0_id = %s", (user_payload["sub"],))
-        user = cursor.fetchone()
+        await cursor.execute("SELECT * FROM Users WHERE auth0_id = %s", (user_payload["sub"],))
+        user = await cursor.fetchone()
         print(user)
         return {"user": user}
     except Error as e:
@@ -215,99 +253,78 @@ async def profile(token: str = Depends(oauth2_scheme)):
     finally:
         if cursor:
             cursor.close()
-        if conn:
-            conn.close()
 
 
 
-# Function to upload data from CSV to the database
-def upload_csv_data():
-    csv_file_paths = [
-        "trader_joes_products.csv",  # Trader Joe's products
-        "scraped_products.csv"       # Target products
-    ]
-
-    try:
-        conn = create_connection()
-        if not conn:
-            raise HTTPException(status_code=500, detail="Database connection failed.")
-        cursor = conn.cursor()
-
-        for csv_file_path in csv_file_paths:
-            if not os.path.exists(csv_file_path):
-                print(f"CSV file '{csv_file_path}' not found, skipping.")
-                continue
-
-            print(f"Processing file: {csv_file_path}")
-            with open(csv_file_path, mode='r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    # Clean the 'price' field to remove any non-numeric characters
-                    price_str = row['price']
-                    cleaned_price = re.sub(r'[^\d.]', '', price_str)
-
-                    # Convert the cleaned price to a float
-                    try:
-                        price = float(cleaned_price)
-                    except ValueError:
-                        print(f"Invalid price format for product {row['product_name']}: {price_str}")
-                        continue
-
-                    # Check for existing entry to avoid duplicates
-                    cursor.execute("""
-                        SELECT COUNT(*) FROM Marketplace WHERE product_name = %s AND store_name = %s
-                    """, (row['product_name'], row['store_name']))
-                    count = cursor.fetchone()[0]
-
-                    if count == 0:
-                        # Insert new product
-                        cursor.execute("""
-                            INSERT INTO Marketplace (product_name, price, store_name)
-                            VALUES (%s, %s, %s)
-                        """, (row['product_name'], price, row['store_name']))
-                    else:
-                        # Update existing product
-                        cursor.execute("""
-                            UPDATE Marketplace
-                            SET price = %s
-                            WHERE product_name = %s AND store_name = %s
-                        """, (price, row['product_name'], row['store_name']))
-
-        conn.commit()
-        print("CSV data uploaded successfully.")
-    except Error as e:
-        print(f"Error: {e}")
-    finally:
-        if cursor:
+# LIKE scan over Marketplace, used until the search index has been built
+def search_products_in_db(search: Optional[str], store: Optional[str], limit: Optional[int], offset: int):
+    with db_pool.connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            query = "SELECT * FROM Marketplace WHERE 1 = 1"
+            values = []
+            if search:
+                query += " AND LOWER(product_name) LIKE %s"
+                values.append(f"%{search.lower()}%")
+            if store:
+                query += " AND LOWER(store_name) = %s"
+                values.append(store.lower())
+            if limit is not None:
+                query += " LIMIT %s OFFSET %s"
+                values.extend([limit, offset])
+            cursor.execute(query, tuple(values))
+            products = cursor.fetchall()
+            return products if limit is not None else products[offset:]
+        finally:
             cursor.close()
-        if conn:
-            conn.close()
 
 # Endpoint to fetch products
 @app.get("/products/")
-async def get_products(search: str = None):
+async def get_products(
+    response: Response,
+    search: str = None,
+    store: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+):
+    index = get_search_index()
+    if index is not None:
+        result = index.search(search, store, limit, offset)
+        response.headers["X-Total-Count"] = str(result["total"])
+        return result["products"]
     try:
-        conn = create_connection()
-        if not conn:
-            raise HTTPException(status_code=500, detail="Database connection failed.")
-        cursor = conn.cursor(dictionary=True)
-
-        if search:
-            query = "SELECT * FROM Marketplace WHERE LOWER(product_name) LIKE %s"
-            cursor.execute(query, (f"%{search.lower()}%",))
-        else:
-            query = "SELECT * FROM Marketplace"
-            cursor.execute(query)
-
-        products = cursor.fetchall()
-        return products
+        return await run_db(search_products_in_db, search, store, limit, offset)
     except Error as error:
         raise HTTPException(status_code=500, detail=str(error))
+
+# Min/max/avg price of one product over a time range, with a downsampled
+# sparkline, served from PriceHistory (see pricehistory.py)
+@app.get("/price-history")
+async def get_price_history(
+    store_name: str = Query(...),
+    product_name: str = Query(...),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    days: int = Query(90, ge=1, le=3660),
+    points: int = Query(60, ge=1, le=PRICE_HISTORY_MAX_POINTS),
+    conn=Depends(get_db),
+):
+    end = local_time(end) if end else datetime.now().replace(microsecond=0)
+    start = local_time(start) if start else end - timedelta(days=days)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    cursor = None
+    try:
+        cursor = conn.cursor(dictionary=True)
+        history = await price_history(cursor, store_name, product_name, start, end, points)
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     finally:
         if cursor:
             cursor.close()
-        if conn:
-            conn.close()
+    if history is None:
+        raise HTTPException(status_code=404, detail=f"No price history for '{product_name}' at {store_name}")
+    return history
 
 # Function to read products from a CSV file using Pandas
 def read_products_from_csv(file_path: str) -> pd.DataFrame:
@@ -322,70 +339,70 @@ def read_products_from_csv(file_path: str) -> pd.DataFrame:
         # Remove rows where price is NaN (invalid data)
         df = df.dropna(subset=['price'])
 
-        return df[['product_name', 'price']]  # Return only the necessary columns
+        # Package size (unit column or URL) -> quantity, canonical unit and price per unit
+        df = add_unit_prices(df, size_text(df))
+
+        return df[['product_name', 'price', 'quantity', 'unit', 'unit_price']]  # Return only the necessary columns
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail=f"CSV file '{file_path}' not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# Price comparison function using OpenAI
-def generate_price_comparison_summary(target_df: pd.DataFrame, trader_joes_df: pd.DataFrame) -> str:
-    logger.debug(f"OPENAI_API_KEY is {'set' if os.getenv('OPENAI_API_KEY') else 'not set'}")
-    # Convert DataFrames to a string format for OpenAI
-    target_products_str = target_df.to_dict(orient='records')
-    trader_joes_products_str = trader_joes_df.to_dict(orient='records')
-
-    prompt = f"""
-    You are a price comparison assistant. I will provide you with product prices from two stores, Target and Trader Joe's.
-
-    Please compare the prices of the following products between the two stores. You do not need to rely on exact product names but instead use your understanding to evaluate if two products are similar. For example, "Red Onion" and "Onion" can be considered the same. Use keywords, context, and common product categories to determine similarity. If two products are different but belong to the same category (e.g., onions, tomatoes, garlic, herbs), treat them as similar.
-
-    If a product is found in both stores, calculate the percentage price difference. If a product is only found in one store, ignore it in the comparison.
-
-    Please provide a general overall summary comparing the two stores in plain text format without Markdown:
-    - Which store generally has better prices (Target or Trader Joe's)?
-    - What is the approximate percentage difference in prices across all products compared (if applicable)?
-
-    Ensure that the response is brief and formatted for easy readability in a UI card component.
+# Optional: have the LLM reword the locally computed comparison. It only ever
+# sees the summary numbers, never the catalogs.
+COMPARE_PRICES_USE_LLM = os.getenv("COMPARE_PRICES_USE_LLM", "false").lower() == "true"
 
-    Here is the data you should consider:
-
-    Target Products:
-    {target_products_str}
-
-    Trader Joe's Products:
-    {trader_joes_products_str}
-    """
+async def generate_price_comparison_summary(comparison: dict) -> str:
+    logger.debug(f"OPENAI_API_KEY is {'set' if os.getenv('OPENAI_API_KEY') else 'not set'}")
+    prompt, _ = render_price_comparison_prompt(comparison, model=llm.provider.model)
+    return await llm.complete([
+        {"role": "system", "content": "You are a price comparison assistant."},
+        {"role": "user", "content": prompt}
+    ])
 
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a price comparison assistant."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        return response['choices'][0]['message']['content'].strip()
-    except Exception as e:
-        print("API Call Failed:", str(e))
-        return "Failed to generate price comparison summary."
 
+# Cleaned catalogs and comparison results, recomputed only when a CSV changes
+catalog_cache = CatalogCache(read_products_from_csv)
 
 # API endpoint to compare prices between Target and Trader Joe's
-@app.post("/compare_prices")
-async def compare_prices():
-    # Define file paths for the CSV files
-    target_file_path = "scraped_products.csv"  # Path to your Target CSV file
-    trader_joes_file_path = "trader_joes_products.csv"  # Path to your Trader Joe's CSV file
-
-    # Read products from both CSV files using Pandas
-    target_df = read_products_from_csv(target_file_path)
-    trader_joes_df = read_products_from_csv(trader_joes_file_path)
+# Define file paths for the CSV files
+target_file_path = "scraped_products.csv"  # Path to your Target CSV file
+trader_joes_file_path = "trader_joes_products.csv"  # Path to your Trader Joe's CSV file
+
+def catalog_signatures() -> tuple:
+    return (catalog_cache.signature(target_file_path), catalog_cache.signature(trader_joes_file_path))
+
+async def price_comparison(catalogs: tuple, use_llm: bool) -> dict:
+
+    # Match products and compute the price differences locally (see pricematch.py)
+    def build_comparison():
+        target_df = catalog_cache.frame(target_file_path)
+        trader_joes_df = catalog_cache.frame(trader_joes_file_path)
+        return compare_catalogs(target_df, trader_joes_df, "Target", "Trader Joe's")
+
+    async def compute_comparison():
+        return await run_in_threadpool(build_comparison)
+
+    async def compute_llm_comparison():
+        comparison = await catalog_cache.memoize(("comparison", catalogs), compute_comparison)
+        summary = await generate_price_comparison_summary(comparison)
+        return {**comparison, "summary": summary}
+
+    if use_llm:
+        try:
+            return await catalog_cache.memoize(("comparison+llm", catalogs), compute_llm_comparison)
+        except Exception as e:
+            # Fall back to the local summary without caching the failure, so
+            # the next request asks the LLM again
+            print("API Call Failed:", str(e))
+    return await catalog_cache.memoize(("comparison", catalogs), compute_comparison)
 
-    # Generate the price comparison summary using OpenAI
+@app.post("/compare_prices")
+async def compare_prices(use_llm: bool = Query(COMPARE_PRICES_USE_LLM)):
     try:
-        summary = generate_price_comparison_summary(target_df, trader_joes_df)
-        return {"summary": summary}
+        return await price_comparison(catalog_signatures(), use_llm)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -394,26 +411,18 @@ async def compare_prices():
 # GOALS
 
 @app.post("/goals")
-async def create_goal(request: Request, goal: GoalCreate, token: str = Depends(oauth2_scheme)):
+async def create_goal(request: Request, goal: GoalCreate, token: str = Depends(oauth2_scheme), conn=Depends(get_db)):
     print("Reaching create_goal function")
     body = await request.json()
     print(f"Received request body: {body}")
     print(f"Parsed goal: {goal}")
     
     user_payload = await verify_token(token)
-    conn = create_connection()
     try:
         cursor = conn.cursor(dictionary=True)
         
         # First, get the user_id from the Users table
-        user_query = "SELECT user_id FROM Users WHERE auth0_id = %s"
-        cursor.execute(user_query, (user_payload["sub"],))
-        user_result = cursor.fetchone()
-        
-        if not user_result:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        user_id = user_result['user_id']
+        user_id = await resolve_user_id(cursor, user_payload["sub"])
         
         # Now insert into Goals table
         query = """
@@ -432,8 +441,9 @@ async def create_goal(request: Request, goal: GoalCreate, token: str = Depends(o
             goal.title,
             goal.description
         )
-        cursor.execute(query, values)
-        conn.commit()
+        await cursor.execute(query, values)
+        await conn.commit()
+        await read_cache.bump(user_payload["sub"])
         goal_id = cursor.lastrowid
         return {"message": "Goal created successfully", "goal_id": goal_id}
     except Error as e:
@@ -442,43 +452,41 @@ async def create_goal(request: Request, goal: GoalCreate, token: str = Depends(o
     finally:
         if cursor:
             cursor.close()
-        if conn:
-            conn.close()
 
 
 @app.get("/goals")
-async def get_goals(status: Optional[str] = Query(None), token: str = Depends(oauth2_scheme)):
+async def get_goals(request: Request, status: Optional[str] = Query(None), token: str = Depends(oauth2_scheme), conn=Depends(get_db)):
     user_payload = await verify_token(token)
-    conn = create_connection()
-    try:
+
+    async def load():
         cursor = conn.cursor(dictionary=True)
-        query = "SELECT * FROM Goals WHERE auth0_id = %s"
-        values = [user_payload["sub"]]
-        if status:
-            query += " AND status = %s"
-            values.append(status)
-        query += " ORDER BY due_date ASC"
-        cursor.execute(query, tuple(values))
-        goals = cursor.fetchall()
-        return {"goals": goals}
+        try:
+            query = "SELECT * FROM Goals WHERE auth0_id = %s"
+            values = [user_payload["sub"]]
+            if status:
+                query += " AND status = %s"
+                values.append(status)
+            query += " ORDER BY due_date ASC"
+            await cursor.execute(query, tuple(values))
+            goals = await cursor.fetchall()
+            return {"goals": goals}
+        finally:
+            cursor.close()
+
+    try:
+        return await read_cache.respond(request, user_payload["sub"], "goals", load, status or "")
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
 
 @app.put("/goals/{goal_id}")
-async def update_goal(goal_id: int, goal: GoalUpdate, token: str = Depends(oauth2_scheme)):
+async def update_goal(goal_id: int, goal: GoalUpdate, token: str = Depends(oauth2_scheme), conn=Depends(get_db)):
     user_payload = await verify_token(token)
-    conn = create_connection()
     try:
         cursor = conn.cursor(dictionary=True)
 
         # Check if the goal belongs to the user
-        cursor.execute("SELECT * FROM Goals WHERE goal_id = %s AND auth0_id = %s", (goal_id, user_payload["sub"]))
-        existing_goal = cursor.fetchone()
+        await cursor.execute("SELECT * FROM Goals WHERE goal_id = %s AND auth0_id = %s", (goal_id, user_payload["sub"]))
+        existing_goal = await cursor.fetchone()
         if not existing_goal:
             raise HTTPException(status_code=404, detail="Goal not found or does not belong to the user")
         
@@ -500,8 +508,9 @@ async def update_goal(goal_id: int, goal: GoalUpdate, token: str = Depends(oauth
             query = f"UPDATE Goals SET {', '.join(update_fields)} WHERE goal_id = %s"
             values.append(goal_id)
             print(f"Executing query: {query} with values: {values}")
-            cursor.execute(query, tuple(values))
-            conn.commit()
+            await cursor.execute(query, tuple(values))
+            await conn.commit()
+            await read_cache.bump(user_payload["sub"])
 
         return {"message": "Goal updated successfully"}
     except Error as e:
@@ -510,37 +519,32 @@ async def update_goal(goal_id: int, goal: GoalUpdate, token: str = Depends(oauth
     finally:
         if cursor:
             cursor.close()
-        if conn:
-            conn.close()
 
 
 @app.delete("/goals/{goal_id}")
-async def delete_goal(goal_id: int, token: str = Depends(oauth2_scheme)):
+async def delete_goal(goal_id: int, token: str = Depends(oauth2_scheme), conn=Depends(get_db)):
     user_payload = await verify_token(token)
-    conn = create_connection()
     try:
         cursor = conn.cursor(dictionary=True)
         # First, check if the goal belongs to the user
-        cursor.execute("SELECT * FROM Goals WHERE goal_id = %s AND auth0_id = %s", (goal_id, user_payload["sub"]))
-        existing_goal = cursor.fetchone()
+        await cursor.execute("SELECT * FROM Goals WHERE goal_id = %s AND auth0_id = %s", (goal_id, user_payload["sub"]))
+        existing_goal = await cursor.fetchone()
         if not existing_goal:
             raise HTTPException(status_code=404, detail="Goal not found or does not belong to the user")
         
         # Delete the goal
-        cursor.execute("DELETE FROM Goals WHERE goal_id = %s", (goal_id,))
-        conn.commit()
+        await cursor.execute("DELETE FROM Goals WHERE goal_id = %s", (goal_id,))
+        await conn.commit()
+        await read_cache.bump(user_payload["sub"])
         return {"message": "Goal deleted successfully"}
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     finally:
         if cursor:
             cursor.close()
-        if conn:
-            conn.close()
 
 @app.post("/api/yes_no")
-async def save_yes_no(data: YesNoRequest):
-    conn = create_connection()
+async def save_yes_no(data: YesNoRequest, conn=Depends(get_db)):
     try:
         cursor = conn.cursor()
         sql = """
@@ -548,24 +552,22 @@ async def save_yes_no(data: YesNoRequest):
             VALUES (%s, %s, %s)
         """
         values = (data.auth0_id, data.email, data.response)
-        cursor.execute(sql, values)
-        conn.commit()
+        await cursor.execute(sql, values)
+        await conn.commit()
         return {"message": "Response saved successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     finally:
         cursor.close()
-        conn.close()
 
 @app.get("/api/yes_no")
-async def check_email_exists(email: str = Query(...)):
+async def check_email_exists(email: str = Query(...), conn=Depends(get_db)):
     print(f"Checking if email exists: {email}")
-    conn = create_connection()
     try:
         cursor = conn.cursor(dictionary=True)
         query = "SELECT 1 FROM yes_no WHERE email = %s"
-        cursor.execute(query, (email,))
-        result = cursor.fetchone()
+        await cursor.execute(query, (email,))
+        result = await cursor.fetchone()
 
         # If a record exists, return exists=True
         if result:
@@ -577,47 +579,87 @@ async def check_email_exists(email: str = Query(...)):
     finally:
         if cursor:
             cursor.close()
-        if conn:
-            conn.close()
 
 
 
-# EXPENSES
+# CATEGORY RULES
 
-def categorize_expense(description: str) -> str:
-    # This is a simple categorization. You might want to use a more sophisticated method or AI for better categorization.
-    categories = {
-        'grocery': ['grocery', 'supermarket', 'food'],
-        'transport': ['transport', 'gas', 'fuel', 'uber', 'taxi'],
-        'utilities': ['utility', 'electric', 'water', 'internet'],
-        'entertainment': ['restaurant', 'cinema', 'theater', 'streaming'],
-        'shopping': ['purchase', 'buy', 'amazon'],
-    }
-    
-    description = description.lower()
-    for category, keywords in categories.items():
-        if any(keyword in description for keyword in keywords):
-            return category
-    return 'other'
+@app.get("/category-rules")
+async def get_category_rules(token: str = Depends(oauth2_scheme), conn=Depends(get_db)):
+    user_payload = await verify_token(token)
+    try:
+        cursor = conn.cursor(dictionary=True)
+        user_id = await resolve_user_id(cursor, user_payload["sub"])
+        await cursor.execute(
+            "SELECT rule_id, keyword, category FROM CategoryRules WHERE user_id = %s ORDER BY rule_id",
+            (user_id,)
+        )
+        return {"rules": await cursor.fetchall()}
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    finally:
+        if cursor:
+            cursor.close()
+
+@app.post("/category-rules")
+async def create_category_rule(rule: CategoryRuleCreate, token: str = Depends(oauth2_scheme), conn=Depends(get_db)):
+    user_payload = await verify_token(token)
+    if not rule.keyword.strip() or not rule.category.strip():
+        raise HTTPException(status_code=400, detail="Keyword and category are required")
+    try:
+        cursor = conn.cursor(dictionary=True)
+        user_id = await resolve_user_id(cursor, user_payload["sub"])
+        await cursor.execute(
+            "INSERT INTO CategoryRules (user_id, keyword, category) VALUES (%s, %s, %s)",
+            (user_id, rule.keyword.strip().lower(), rule.category.strip())
+        )
+        await conn.commit()
+        invalidate_user_categorizer(user_id)
+        return {"message": "Rule created successfully", "rule_id": cursor.lastrowid}
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    finally:
+        if cursor:
+            cursor.close()
+
+@app.delete("/category-rules/{rule_id}")
+async def delete_category_rule(rule_id: int, token: str = Depends(oauth2_scheme), conn=Depends(get_db)):
+    user_payload = await verify_token(token)
+    try:
+        cursor = conn.cursor(dictionary=True)
+        user_id = await resolve_user_id(cursor, user_payload["sub"])
+        await cursor.execute("DELETE FROM CategoryRules WHERE rule_id = %s AND user_id = %s", (rule_id, user_id))
+        await conn.commit()
+        if cursor.rowcount == 0:
+            raise HTTPException(status_code=404, detail="Rule not found or does not belong to the user")
+        invalidate_user_categorizer(user_id)
+        return {"message": "Rule deleted successfully"}
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    finally:
+        if cursor:
+            cursor.close()
+
+# EXPENSES
 
 @app.post("/upload-expenses")
 async def upload_expenses(
     file: UploadFile = File(...),
     update_date: Optional[str] = None,
-    token: str = Depends(oauth2_scheme)
+    token: str = Depends(oauth2_scheme),
+    conn=Depends(get_db)
 ):
     user_payload = await verify_token(token)
     content = await file.read()
+    started = time.perf_counter()
     df = pd.read_csv(StringIO(content.decode('utf-8')))
     
-    # Validate that all dates in the file are the same
-    if 'date' not in df.columns:
-        raise HTTPException(status_code=400, detail="CSV file must contain a 'date' column")
-    
-    # Convert dates to consistent format
-    df['date'] = pd.to_datetime(df['date']).dt.date
-    unique_dates = df['date'].unique()
+    # Validate the whole file at once (dates, amounts)
+    expenses = prepare_expenses(df)
+    unique_dates = expenses['date'].unique()
     
+    if len(unique_dates) == 0:
+        raise HTTPException(status_code=400, detail="The file has no valid expenses")
     if len(unique_dates) > 1:
         raise HTTPException(
             status_code=400, 
@@ -635,135 +677,236 @@ async def upload_expenses(
                 detail=f"File contains expenses for {file_date}, but updating date {update_date}"
             )
     
-    conn = create_connection()
     try:
         cursor = conn.cursor(dictionary=True)
         
         # Get user_id
-        cursor.execute("SELECT user_id FROM Users WHERE auth0_id = %s", (user_payload["sub"],))
-        user_result = cursor.fetchone()
-        if not user_result:
-            raise HTTPException(status_code=404, detail="User not found")
-        user_id = user_result['user_id']
+        user_id = await resolve_user_id(cursor, user_payload["sub"])
         
         # If updating, delete existing expenses for that date
         if update_date:
-            cursor.execute(
+            await subtract_dates(cursor, user_id, [update_date])
+            await cursor.execute(
                 "DELETE FROM Expenses WHERE user_id = %s AND date = %s",
                 (user_id, update_date)
             )
         
-        # Insert expenses
-        for _, row in df.iterrows():
-            category = categorize_expense(row['description'])
-            expense = Expense(
-                date=file_date,
-                amount=float(row['amount']),
-                category=category,
-                user_id=user_id
-            )
-            query = """
-                INSERT INTO Expenses (date, amount, category, user_id)
-                VALUES (%s, %s, %s, %s)
-            """
-            values = (expense.date, expense.amount, expense.category, expense.user_id)
-            cursor.execute(query, values)
+        # Categorize every row with the user's rules, then insert in batches, all in one transaction
+        categorizer = await load_user_categorizer(cursor, user_id)
+        expenses['category'] = categorizer.categorize(expenses['description'])
+        rows = await insert_expenses(cursor, expenses, user_id)
+        await apply_rollup_deltas(cursor, user_id, rollup_deltas(expenses))
         
-        conn.commit()
-        return {"message": "Expenses uploaded successfully"}
+        await conn.commit()
+        await read_cache.bump(user_payload["sub"])
+        return {"message": "Expenses uploaded successfully", **ingest_summary(rows, started)}
     except Error as e:
+        await conn.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     finally:
         if cursor:
             cursor.close()
-        if conn:
-            conn.close()
 
+# Streaming import for full bank statements: any number of dates, CSV or OFX/QFX.
+# Every date present in the file replaces what was stored for that date.
+@app.post("/import-expenses")
+async def import_expenses(
+    file: UploadFile = File(...),
+    token: str = Depends(oauth2_scheme),
+    conn=Depends(get_db)
+):
+    user_payload = await verify_token(token)
+    started = time.perf_counter()
+    filename = (file.filename or "").lower()
+    if filename.endswith((".ofx", ".qfx")):
+        chunks = iter_ofx_chunks(file.file)
+    else:
+        chunks = iter_csv_chunks(file.file)
+
+    cursor = None
+    try:
+        cursor = conn.cursor(dictionary=True)
+        user_id = await resolve_user_id(cursor, user_payload["sub"])
+        categorizer = await load_user_categorizer(cursor, user_id)
+
+        summary = {}  # date -> {"rows", "total"}
+        rows = 0
+        while True:
+            # Parsing is blocking, so pull each chunk on the thread pool
+            df = await run_in_threadpool(next, chunks, None)
+            if df is None:
+                break
+            expenses = prepare_expenses(df)
+            expenses['category'] = categorizer.categorize(expenses['description'])
+
+            # First time we see a date: clear what was stored for it
+            new_dates = [d for d in expenses['date'].unique() if d not in summary]
+            if new_dates:
+                await subtract_dates(cursor, user_id, new_dates)
+                placeholders = ", ".join(["%s"] * len(new_dates))
+                await cursor.execute(
+                    f"DELETE FROM Expenses WHERE user_id = %s AND date IN ({placeholders})",
+                    (user_id, *new_dates)
+                )
+                for d in new_dates:
+                    summary[d] = {"rows": 0, "total": 0.0}
+
+            rows += await insert_expenses(cursor, expenses, user_id)
+            await apply_rollup_deltas(cursor, user_id, rollup_deltas(expenses))
+            for d, group in expenses.groupby('date')['amount']:
+                summary[d]["rows"] += int(group.size)
+                summary[d]["total"] += float(group.sum())
+
+        await conn.commit()
+        await read_cache.bump(user_payload["sub"])
+        return {
+            "message": "Expenses imported successfully",
+            "dates": [
+                {"date": d.isoformat(), "rows": s["rows"], "total": round(s["total"], 2)}
+                for d, s in sorted(summary.items())
+            ],
+            **ingest_summary(rows, started),
+        }
+    except HTTPException:
+        await conn.rollback()
+        raise
+    except (Error, ValueError, pd.errors.ParserError) as e:
+        await conn.rollback()
+        status = 500 if isinstance(e, Error) else 400
+        raise HTTPException(status_code=status, detail=f"Import failed: {str(e)}")
+    finally:
+        if cursor:
+            cursor.close()
+
+# Expense reads go through the per-user read cache; every expense write above bumps it
 @app.get("/expense-dates")
-async def get_expense_dates(token: str = Depends(oauth2_scheme)):
+async def get_expense_dates(request: Request, token: str = Depends(oauth2_scheme), conn=Depends(get_db)):
+    user_payload = await verify_token(token)
+
+    async def load():
+        cursor = conn.cursor(dictionary=True)
+        try:
+            # Get user_id
+            user_id = await resolve_user_id(cursor, user_payload["sub"])
+            
+            # Get distinct dates of expenses
+            await cursor.execute("SELECT DISTINCT date FROM Expenses WHERE user_id = %s ORDER BY date DESC", (user_id,))
+            dates = await cursor.fetchall()
+            
+            return {"dates": [date['date'].isoformat() for date in dates]}
+        finally:
+            cursor.close()
+
+    try:
+        return await read_cache.respond(request, user_payload["sub"], "expense-dates", load)
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+@app.get("/expenses/{date}")
+async def get_expenses_by_date(request: Request, date: str, token: str = Depends(oauth2_scheme), conn=Depends(get_db)):
+    user_payload = await verify_token(token)
+
+    async def load():
+        cursor = conn.cursor(dictionary=True)
+        try:
+            # Get user_id
+            user_id = await resolve_user_id(cursor, user_payload["sub"])
+            
+            # Get expenses for the specified date
+            await cursor.execute("SELECT * FROM Expenses WHERE user_id = %s AND date = %s", (user_id, date))
+            expenses = await cursor.fetchall()
+            
+            return {"expenses": expenses}
+        finally:
+            cursor.close()
+
+    try:
+        return await read_cache.respond(request, user_payload["sub"], "expenses", load, date)
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+@app.put("/expenses/{expense_id}")
+async def update_expense(expense_id: int, expense: Expense, token: str = Depends(oauth2_scheme), conn=Depends(get_db)):
     user_payload = await verify_token(token)
-    conn = create_connection()
     try:
         cursor = conn.cursor(dictionary=True)
         
         # Get user_id
-        cursor.execute("SELECT user_id FROM Users WHERE auth0_id = %s", (user_payload["sub"],))
-        user_result = cursor.fetchone()
-        if not user_result:
-            raise HTTPException(status_code=404, detail="User not found")
-        user_id = user_result['user_id']
+        user_id = await resolve_user_id(cursor, user_payload["sub"])
         
-        # Get distinct dates of expenses
-        cursor.execute("SELECT DISTINCT date FROM Expenses WHERE user_id = %s ORDER BY date DESC", (user_id,))
-        dates = cursor.fetchall()
+        await cursor.execute(
+            "SELECT date, amount, category FROM Expenses WHERE expense_id = %s AND user_id = %s",
+            (expense_id, user_id)
+        )
+        old = await cursor.fetchone()
+        if old is None:
+            raise HTTPException(status_code=404, detail="Expense not found or does not belong to the user")
         
-        return {"dates": [date['date'].isoformat() for date in dates]}
+        # Update the expense and move it between rollups in the same transaction
+        query = "UPDATE Expenses SET date = %s, amount = %s, category = %s WHERE expense_id = %s AND user_id = %s"
+        values = (expense.date, expense.amount, expense.category, expense_id, user_id)
+        await cursor.execute(query, values)
+        await replace_expense(cursor, user_id, old, {"date": expense.date, "amount": expense.amount, "category": expense.category})
+        await conn.commit()
+        await read_cache.bump(user_payload["sub"])
+        
+        return {"message": "Expense updated successfully"}
     except Error as e:
+        await conn.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     finally:
         if cursor:
             cursor.close()
-        if conn:
-            conn.close()
 
-@app.get("/expenses/{date}")
-async def get_expenses_by_date(date: str, token: str = Depends(oauth2_scheme)):
+# Everything the Dashboard page needs on load in one call, instead of
+# /expense-dates, /expenses/{date}, /daily-average and /weekly-averages
+@app.get("/dashboard")
+async def get_dashboard(request: Request, token: str = Depends(oauth2_scheme), conn=Depends(get_db)):
+    user_payload = await verify_token(token)
+    today = datetime.now().date()
+
+    async def load():
+        cursor = conn.cursor(dictionary=True)
+        try:
+            user_id = await resolve_user_id(cursor, user_payload["sub"])
+            return {"as_of": today.isoformat(), **(await build_dashboard(cursor, user_id, today))}
+        finally:
+            cursor.close()
+
+    try:
+        # Keyed on the day too, so the averages windows roll over at midnight
+        return await read_cache.respond(request, user_payload["sub"], "dashboard", load, today.isoformat())
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+# Category breakdowns served from ExpenseRollups (see rollups.py)
+@app.get("/daily-average")
+async def get_daily_average(days: int = Query(30, ge=1, le=366), token: str = Depends(oauth2_scheme), conn=Depends(get_db)):
     user_payload = await verify_token(token)
-    conn = create_connection()
+    cursor = None
     try:
         cursor = conn.cursor(dictionary=True)
-        
-        # Get user_id
-        cursor.execute("SELECT user_id FROM Users WHERE auth0_id = %s", (user_payload["sub"],))
-        user_result = cursor.fetchone()
-        if not user_result:
-            raise HTTPException(status_code=404, detail="User not found")
-        user_id = user_result['user_id']
-        
-        # Get expenses for the specified date
-        cursor.execute("SELECT * FROM Expenses WHERE user_id = %s AND date = %s", (user_id, date))
-        expenses = cursor.fetchall()
-        
-        return {"expenses": expenses}
+        user_id = await resolve_user_id(cursor, user_payload["sub"])
+        return await daily_averages(cursor, user_id, days, datetime.now().date())
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     finally:
         if cursor:
             cursor.close()
-        if conn:
-            conn.close()
 
-@app.put("/expenses/{expense_id}")
-async def update_expense(expense_id: int, expense: Expense, token: str = Depends(oauth2_scheme)):
+@app.get("/weekly-averages")
+async def get_weekly_averages(weeks: int = Query(4, ge=1, le=104), token: str = Depends(oauth2_scheme), conn=Depends(get_db)):
     user_payload = await verify_token(token)
-    conn = create_connection()
+    cursor = None
     try:
         cursor = conn.cursor(dictionary=True)
-        
-        # Get user_id
-        cursor.execute("SELECT user_id FROM Users WHERE auth0_id = %s", (user_payload["sub"],))
-        user_result = cursor.fetchone()
-        if not user_result:
-            raise HTTPException(status_code=404, detail="User not found")
-        user_id = user_result['user_id']
-        
-        # Update the expense
-        query = "UPDATE Expenses SET date = %s, amount = %s, category = %s WHERE expense_id = %s AND user_id = %s"
-        values = (expense.date, expense.amount, expense.category, expense_id, user_id)
-        cursor.execute(query, values)
-        conn.commit()
-        
-        if cursor.rowcount == 0:
-            raise HTTPException(status_code=404, detail="Expense not found or does not belong to the user")
-        
-        return {"message": "Expense updated successfully"}
+        user_id = await resolve_user_id(cursor, user_payload["sub"])
+        return await weekly_averages(cursor, user_id, weeks, datetime.now().date())
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     finally:
         if cursor:
             cursor.close()
-        if conn:
-            conn.close()
 
 
 def calculate_average_daily_spending(expenses: List[Dict]) -> float:
@@ -777,7 +920,7 @@ def calculate_goal_alignment(expenses: List[Dict], goals: List[Dict]) -> float:
     if not goals:
         return 100  # If there are no goals, we consider the user 100% aligned
     
-    total_daily_target = sum(goal['target_amount'] / (goal['due_date'] - datetime.now().date()).days for goal in goals if goal['due_date'] > datetime.now().date())
+    total_daily_target = sum(goal['target_amount'] / (goal['due_date'] - datetime.now().date()).days for goal in goals if goal['due_date'] and goal['due_date'] > datetime.now().date())
     avg_daily_spending = calculate_average_daily_spending(expenses)
     
     if total_daily_target == 0:
@@ -786,102 +929,207 @@ def calculate_goal_alignment(expenses: List[Dict], goals: List[Dict]) -> float:
     alignment = (1 - min(1, max(0, (avg_daily_spending - total_daily_target) / total_daily_target))) * 100
     return round(alignment, 2)
 
+async def build_ai_review_prompt(cursor, auth0_id: str):
+    """(messages, cache key, prompt metrics) for the user's AI review. The
+    key hashes the expense and goal snapshot the prompt is built from."""
+    # Get user_id
+    user_id = await resolve_user_id(cursor, auth0_id)
+    
+    # Get user's expenses for the last 30 days
+    today = datetime.now().date()
+    thirty_days_ago = today - timedelta(days=30)
+    await cursor.execute("SELECT * FROM Expenses WHERE user_id = %s AND date >= %s ORDER BY date DESC", (user_id, thirty_days_ago))
+    expenses = await cursor.fetchall()
+    
+    # Get user's active goals
+    await cursor.execute("SELECT * FROM Goals WHERE user_id = %s AND status = 'active'", (user_id,))
+    goals = await cursor.fetchall()
+    
+    # Calculate average daily spending and goal alignment
+    avg_daily_spending = calculate_average_daily_spending(expenses)
+    goal_alignment = calculate_goal_alignment(expenses, goals)
+    
+    # Aggregated and trimmed to the token budget (see prompts.py)
+    prompt, prompt_metrics = render_ai_review_prompt(
+        expenses, goals, avg_daily_spending, goal_alignment, model=llm.provider.model
+    )
+
+    messages = [
+        {"role": "system", "content": "You are a financial advisor assistant. Provide clear, actionable advice."},
+        {"role": "user", "content": prompt}
+    ]
+    # Alignment depends on today's date too, so it is part of the snapshot
+    return messages, cache_key("ai-review", llm.provider.model, user_id, today, expenses, goals), prompt_metrics
+
+# The connection goes back to the pool once the prompt is built, instead of
+# being held through the LLM queue wait and completion
+async def load_ai_review_prompt(auth0_id: str):
+    try:
+        async with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                return await build_ai_review_prompt(cursor, auth0_id)
+            finally:
+                cursor.close()
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
 @app.get("/ai-review")
 async def get_ai_review(token: str = Depends(oauth2_scheme)):
     user_payload = await verify_token(token)
-    conn = create_connection()
+    messages, key, prompt_metrics = await load_ai_review_prompt(user_payload["sub"])
     try:
-        cursor = conn.cursor(dictionary=True)
-        
-        # Get user_id
-        cursor.execute("SELECT user_id FROM Users WHERE auth0_id = %s", (user_payload["sub"],))
-        user_result = cursor.fetchone()
-        if not user_result:
-            raise HTTPException(status_code=404, detail="User not found")
-        user_id = user_result['user_id']
-        
-        # Get user's expenses for the last 30 days
-        thirty_days_ago = datetime.now().date() - timedelta(days=30)
-        cursor.execute("SELECT * FROM Expenses WHERE user_id = %s AND date >= %s ORDER BY date DESC", (user_id, thirty_days_ago))
-        expenses = cursor.fetchall()
-        
-        # Get user's active goals
-        cursor.execute("SELECT * FROM Goals WHERE user_id = %s AND status = 'active'", (user_id,))
-        goals = cursor.fetchall()
-        
-        # Calculate average daily spending and goal alignment
-        avg_daily_spending = calculate_average_daily_spending(expenses)
-        goal_alignment = calculate_goal_alignment(expenses, goals)
-        
-        # Prepare data for OpenAI
-        expenses_str = "\n".join([f"Date: {e['date']}, Amount: ${e['amount']:.2f}, Category: {e['category']}" for e in expenses])
-        goals_str = "\n".join([f"Goal: {g['title']}, Target: ${g['target_amount']:.2f}, Deadline: {g['due_date']}" for g in goals])
-        
-        prompt = f"""
-        Analyze the following user's expenses and financial goals:
-
-        Average Daily Spending: ${avg_daily_spending:.2f}
-        Current Goal Alignment: {goal_alignment}%
-
-        Expenses (last 30 days):
-        {expenses_str}
-
-        Financial Goals:
-        {goals_str}
-
-        Please provide a comprehensive analysis of the user's spending habits in relation to their financial goals. 
-        Your response should include:
-
-        1. A brief overview of their current financial situation.
-        2. An explanation of their goal alignment percentage and what it means. calculate the goal alignment and give a specific value like Goal Alignment: 75%. explain how it is calculated as well.
-        3. Specific recommendations for each goal, considering their current spending habits.
-        4. A checklist of 3-5 actionable items to improve their financial situation.
-        5. Encouragement and positive reinforcement for any good financial habits observed.
-
-        Format your response as follows:
-
-        Overview: [Your analysis here]
-
-        Goal Alignment: [Explanation of the {goal_alignment}% alignment]
+        analysis, cached = await llm.complete_cached(messages, key=key)
+        return {"analysis": analysis, "cached": cached, "prompt": prompt_metrics}
+    except LLMBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="The AI review took too long, please try again")
+
+# JOBS
+
+# Same analyses as background jobs: submitting answers 202 with a job id right
+# away and the client polls GET /jobs/{job_id}, instead of holding the request
+# (and an instance slot) open for the whole LLM round trip
+async def submit_job(owner: str, kind: str, key, run) -> JSONResponse:
+    try:
+        job = await job_queue.submit(owner, kind, key, run)
+    except JobsBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return JSONResponse(status_code=202, content=jsonable_encoder(job), headers={"Location": f"/jobs/{job['job_id']}"})
 
-        Goal-specific Recommendations:
-        [List each goal and provide specific advice]
+@app.post("/jobs/ai-review")
+async def submit_ai_review_job(token: str = Depends(oauth2_scheme)):
+    user_payload = await verify_token(token)
+    messages, key, prompt_metrics = await load_ai_review_prompt(user_payload["sub"])
 
-        Action Checklist:
-        - [Action item 1]
-        - [Action item 2]
-        - [Action item 3]
-        - [Action item 4 (if applicable)]
-        - [Action item 5 (if applicable)]
+    async def run():
+        analysis = await llm.complete(messages, key=key)
+        return {"analysis": analysis, "prompt": prompt_metrics}
 
-        Positive Reinforcement: [Encouragement and recognition of good habits]
+    # The key hashes the expense/goal snapshot, so only identical reviews are merged
+    return await submit_job(user_payload["sub"], "ai-review", key, run)
 
-        Make sure to address the user in your response. Address the user as "you"
-        """
+@app.post("/jobs/compare_prices")
+async def submit_compare_prices_job(use_llm: bool = Query(COMPARE_PRICES_USE_LLM), token: str = Depends(oauth2_scheme)):
+    user_payload = await verify_token(token)
+    catalogs = catalog_signatures()
+    return await submit_job(
+        user_payload["sub"], "compare_prices", (catalogs, use_llm), lambda: price_comparison(catalogs, use_llm)
+    )
 
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a financial advisor assistant. Provide clear, actionable advice."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        
-        return {"analysis": response['choices'][0]['message']['content'].strip()}
-    except Error as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, token: str = Depends(oauth2_scheme)):
+    user_payload = await verify_token(token)
+    job = await job_queue.get(job_id, user_payload["sub"])
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    headers = {"Retry-After": "1"} if job["status"] in ("queued", "running") else {}
+    return JSONResponse(content=jsonable_encoder(job), headers=headers)
+
+def sse(data, event: Optional[str] = None) -> str:
+    """One Server-Sent Events message; data is JSON so newlines survive."""
+    return (f"event: {event}\n" if event else "") + f"data: {json.dumps(data)}\n\n"
+
+# Same review, streamed as it is generated: "data" events carry text chunks,
+# then a final "done" (or "error") event
+@app.get("/ai-review/stream")
+async def stream_ai_review(token: str = Depends(oauth2_scheme)):
+    user_payload = await verify_token(token)
+    messages, key, _ = await load_ai_review_prompt(user_payload["sub"])
+
+    async def events():
+        try:
+            async for chunk in llm.stream(messages, key=key):
+                yield sse(chunk)
+            yield sse({}, event="done")
+        except LLMBusy as e:
+            yield sse({"detail": str(e)}, event="error")
+        except asyncio.TimeoutError:
+            yield sse({"detail": "The AI review took too long, please try again"}, event="error")
+        except Exception as e:
+            logger.exception("AI review stream failed")
+            yield sse({"detail": str(e)}, event="error")
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Marketplace ingestion runs in the background so the instance can serve
+# auth/goals/expenses right away. Set MARKETPLACE_LOAD_ON_STARTUP=false when
+# the load runs as a separate job (python marketplace.py).
+MARKETPLACE_LOAD_ON_STARTUP = os.getenv("MARKETPLACE_LOAD_ON_STARTUP", "true").lower() == "true"
+# Whether /health/ready should wait for the marketplace load to finish
+READY_REQUIRES_MARKETPLACE = os.getenv("READY_REQUIRES_MARKETPLACE", "false").lower() == "true"
+# How often to check whether a load outside this process changed the marketplace
+SEARCH_INDEX_REFRESH_SECONDS = float(os.getenv("SEARCH_INDEX_REFRESH_SECONDS", 60))
+
+startup_tasks = set()
+
+def run_startup_jobs():
+    try:
+        migrate()
+    except Exception:
+        # Recorded in migration_status, so /health/ready keeps answering 503.
+        # Loading into a half-migrated schema could duplicate products.
+        logger.exception("Could not apply schema migrations")
+        return
+    if MARKETPLACE_LOAD_ON_STARTUP:
+        print("Starting CSV upload...")
+        run_ingestion()
+        print("CSV upload completed.")
+    try:
+        rebuild_search_index()
+    except Exception:
+        logger.exception("Could not build the product search index")
+
+async def watch_search_index():
+    # Standalone loads (python marketplace.py) can't rebuild this process's
+    # index, so compare its version with MarketplaceVersion now and then
+    while True:
+        await asyncio.sleep(SEARCH_INDEX_REFRESH_SECONDS)
+        if startup_tasks or migration_status.snapshot()["state"] != "done":
+            continue
+        try:
+            await run_db(refresh_search_index)
+        except Exception:
+            logger.exception("Could not refresh the product search index")
 
-# Upload CSV data at startup
 @app.on_event("startup")
 async def startup_event():
-    print("Starting CSV upload...")
-    upload_csv_data()
-    print("CSV upload completed.")
+    task = asyncio.get_running_loop().run_in_executor(None, run_startup_jobs)
+    startup_tasks.add(task)
+    task.add_done_callback(startup_tasks.discard)
+    app.state.search_watcher = asyncio.create_task(watch_search_index())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.search_watcher.cancel()
+    await job_queue.close()
+
+
+# Liveness: the process is up and the event loop responds
+@app.get("/health/live")
+async def health_live():
+    return {"status": "ok"}
+
+# Readiness: the database answers, the schema is migrated (and, if
+# configured, the marketplace is loaded)
+@app.get("/health/ready")
+async def health_ready():
+    marketplace = ingestion_progress.snapshot()
+    migrations = migration_status.snapshot()
+    try:
+        conn = await run_db(db_pool.checkout)
+        db_pool.checkin(conn)
+    except Exception as e:
+        return JSONResponse(status_code=503, content={"status": "unavailable", "database": str(e),
+                                                      "migrations": migrations, "marketplace": marketplace})
+    if migrations["state"] != "done":
+        status = "migration_failed" if migrations["state"] == "failed" else "migrating"
+        return JSONResponse(status_code=503, content={"status": status, "migrations": migrations, "marketplace": marketplace})
+    if READY_REQUIRES_MARKETPLACE and not ingestion_progress.done:
+        return JSONResponse(status_code=503, content={"status": "loading", "migrations": migrations, "marketplace": marketplace})
+    return {"status": "ready", "migrations": migrations, "marketplace": marketplace}
 
 if __name__ == "__main__":
     import uvicorn
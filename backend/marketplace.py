@@ -0,0 +1,466 @@
+import glob
+import hashlib
+import os
+import threading
+import time
+import logging
+from datetime import datetime
+
+import pandas as pd
+from mysql.connector import Error
+
+from db import db_pool
+from pricehistory import append_price_history, observed_at
+from units import add_unit_prices, size_text
+
+logger = logging.getLogger(__name__)
+
+# The store adapters' csv_filename (scrapers/traderjoes.py, scrapers/target.py)
+MARKETPLACE_CSV_FILES = [
+    "trader_joes_products.csv",  # Trader Joe's products
+    "scraped_products.csv"       # Target products
+]
+
+# Products per INSERT ... ON DUPLICATE KEY UPDATE (or DELETE) statement
+MARKETPLACE_BATCH_SIZE = int(os.getenv("MARKETPLACE_BATCH_SIZE", 1000))
+
+
+def delta_path(csv_path: str) -> str:
+    """trader_joes_products.csv -> trader_joes_products.delta.csv, the file
+    where the scrapers append what changed since their previous run."""
+    return os.path.splitext(csv_path)[0] + ".delta.csv"
+
+
+class IngestionProgress:
+    """Thread-safe progress of the current (or last) marketplace load, for /health/ready."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = {"state": "pending"}
+
+    def update(self, **fields):
+        with self._lock:
+            self._state.update(fields)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._state)
+
+    @property
+    def done(self) -> bool:
+        return self.snapshot()["state"] == "done"
+
+
+ingestion_progress = IngestionProgress()
+
+
+def clean_prices(prices: pd.Series) -> pd.Series:
+    """'$4.99' -> 4.99; anything that isn't a number becomes NaN."""
+    return pd.to_numeric(prices.astype(str).str.replace(r'[^\d.]', '', regex=True), errors='coerce')
+
+
+MARKETPLACE_COLUMNS = ['product_name', 'store_name', 'price', 'quantity', 'unit', 'unit_price']
+# Staged rows also carry when they were scraped, for PriceHistory
+STAGED_COLUMNS = MARKETPLACE_COLUMNS + ['observed_at']
+SCRAPED_COLUMNS = {'product_name', 'store_name', 'price', 'url', 'unit', 'last_checked_at'}
+
+
+def product_keys(frame: pd.DataFrame) -> pd.DataFrame:
+    """(product_name, store_name) casefolded, the way Marketplace's
+    case-insensitive unique key compares them."""
+    return frame[['product_name', 'store_name']].apply(lambda column: column.str.casefold())
+
+
+def read_marketplace_csvs(paths=MARKETPLACE_CSV_FILES) -> pd.DataFrame:
+    """Stages every scraped CSV into one frame of STAGED_COLUMNS, one row per
+    (product_name, store_name), with sizes parsed into unit prices."""
+    frames = []
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"CSV file '{path}' not found, skipping.")
+            continue
+        print(f"Processing file: {path}")
+        df = pd.read_csv(path, usecols=lambda c: c in SCRAPED_COLUMNS, dtype=str)
+        df['price'] = clean_prices(df['price'])
+        df['observed_at'] = observed_at(df)
+        invalid = df['price'].isna()
+        if invalid.any():
+            print(f"Skipping {int(invalid.sum())} rows with an invalid price in {path}")
+        df = df[~invalid]
+        frames.append(add_unit_prices(df, size_text(df))[STAGED_COLUMNS])
+    if not frames:
+        return pd.DataFrame(columns=STAGED_COLUMNS)
+    staged = pd.concat(frames, ignore_index=True)
+    # Later rows win, like the old row-by-row UPDATE
+    return staged[~product_keys(staged).duplicated(keep='last')]
+
+
+def upsert_products(cursor, products: pd.DataFrame, batch_size: int = MARKETPLACE_BATCH_SIZE, progress=None):
+    """One multi-row INSERT ... ON DUPLICATE KEY UPDATE per batch. Relies on the
+    unique (product_name, store_name) key created by schema.migrate."""
+    sizes = products[['quantity', 'unit', 'unit_price']].astype(object)
+    sizes = sizes.where(sizes.notna(), None)  # NaN -> NULL
+    rows = list(zip(products['product_name'], products['price'].astype(float).tolist(), products['store_name'],
+                    sizes['quantity'], sizes['unit'], sizes['unit_price']))
+    for start in range(0, len(rows), batch_size):
+        if progress:
+            progress.update(written=start)
+        batch = rows[start:start + batch_size]
+        placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(batch))
+        cursor.execute(
+            f"""
+            INSERT INTO Marketplace (product_name, price, store_name, quantity, unit, unit_price)
+            VALUES {placeholders}
+            ON DUPLICATE KEY UPDATE price = VALUES(price), quantity = VALUES(quantity),
+                unit = VALUES(unit), unit_price = VALUES(unit_price)
+            """,
+            [value for row in batch for value in row]
+        )
+
+
+def stage_products(cursor, products: pd.DataFrame, batch_size: int = MARKETPLACE_BATCH_SIZE):
+    """Copies staged rows into the session's MarketplaceStaging temporary
+    table, keyed (and collated) like Marketplace, with `changed` unset."""
+    cursor.execute("DROP TEMPORARY TABLE IF EXISTS MarketplaceStaging")
+    cursor.execute(
+        """
+        CREATE TEMPORARY TABLE MarketplaceStaging (
+            product_name VARCHAR(255) NOT NULL,
+            store_name VARCHAR(100) NOT NULL,
+            price DECIMAL(10, 2) NOT NULL,
+            quantity DECIMAL(10, 3) NULL,
+            unit VARCHAR(10) NULL,
+            unit_price DECIMAL(12, 4) NULL,
+            observed_at DATETIME NOT NULL,
+            changed BOOL NOT NULL DEFAULT FALSE,
+            PRIMARY KEY (product_name, store_name)
+        )
+        """
+    )
+    sizes = products[['quantity', 'unit', 'unit_price']].astype(object)
+    sizes = sizes.where(sizes.notna(), None)
+    rows = list(zip(products['product_name'], products['store_name'], products['price'].astype(float).tolist(),
+                    sizes['quantity'], sizes['unit'], sizes['unit_price'],
+                    pd.to_datetime(products['observed_at']).dt.to_pydatetime()))
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * len(batch))
+        # Names differing only in case share a key here too; the later row wins
+        cursor.execute(
+            f"""
+            INSERT INTO MarketplaceStaging (product_name, store_name, price, quantity, unit, unit_price, observed_at)
+            VALUES {placeholders}
+            ON DUPLICATE KEY UPDATE price = VALUES(price), quantity = VALUES(quantity), unit = VALUES(unit),
+                unit_price = VALUES(unit_price), observed_at = VALUES(observed_at)
+            """,
+            [value for row in batch for value in row]
+        )
+
+
+def write_staged_changes(cursor) -> tuple:
+    """Flags the staged products that are new or whose price or unit price
+    changed, by probing Marketplace's unique key, then upserts them and
+    appends them to PriceHistory. Returns (written, history). A NULL unit
+    price on either side only matches another NULL, which also catches rows
+    stored before unit prices existed."""
+    cursor.execute(
+        """
+        UPDATE MarketplaceStaging SET changed = TRUE
+        WHERE NOT EXISTS (
+            SELECT 1 FROM Marketplace m
+            WHERE m.product_name = MarketplaceStaging.product_name
+              AND m.store_name = MarketplaceStaging.store_name
+              AND ABS(m.price - MarketplaceStaging.price) <= 0.005
+              AND (ABS(m.unit_price - MarketplaceStaging.unit_price) <= 0.00005
+                   OR (m.unit_price IS NULL AND MarketplaceStaging.unit_price IS NULL))
+        )
+        """
+    )
+    cursor.execute("SELECT COUNT(*) FROM MarketplaceStaging WHERE changed")
+    written = cursor.fetchall()[0][0]
+    cursor.execute(
+        """
+        INSERT INTO Marketplace (product_name, price, store_name, quantity, unit, unit_price)
+        SELECT product_name, price, store_name, quantity, unit, unit_price
+        FROM MarketplaceStaging WHERE changed
+        ON DUPLICATE KEY UPDATE price = VALUES(price), quantity = VALUES(quantity),
+            unit = VALUES(unit), unit_price = VALUES(unit_price)
+        """
+    )
+    cursor.execute(
+        """
+        INSERT IGNORE INTO PriceHistory (store_name, product_name, observed_at, price, unit_price)
+        SELECT store_name, product_name, observed_at, price, unit_price
+        FROM MarketplaceStaging WHERE changed
+        """
+    )
+    return written, cursor.rowcount
+
+
+def delete_products(cursor, products: pd.DataFrame, batch_size: int = MARKETPLACE_BATCH_SIZE) -> int:
+    """Batched DELETEs of (product_name, store_name) pairs."""
+    deleted = 0
+    for store_name, names in products.groupby('store_name')['product_name']:
+        names = names.tolist()
+        for start in range(0, len(names), batch_size):
+            batch = names[start:start + batch_size]
+            placeholders = ", ".join(["%s"] * len(batch))
+            cursor.execute(
+                f"DELETE FROM Marketplace WHERE store_name = %s AND product_name IN ({placeholders})",
+                [store_name, *batch]
+            )
+            deleted += cursor.rowcount
+    return deleted
+
+
+def bump_marketplace_version(cursor):
+    cursor.execute(
+        """
+        INSERT INTO MarketplaceVersion (id, version) VALUES (1, 1)
+        ON DUPLICATE KEY UPDATE version = version + 1
+        """
+    )
+
+
+def marketplace_version(cursor) -> int:
+    """Goes up with every load that changed Marketplace; 0 before the first."""
+    cursor.execute("SELECT version FROM MarketplaceVersion WHERE id = 1")
+    rows = cursor.fetchall()
+    if not rows:
+        return 0
+    return rows[0]['version'] if isinstance(rows[0], dict) else rows[0][0]
+
+
+def csv_signatures(paths=MARKETPLACE_CSV_FILES) -> dict:
+    """csv name -> SHA-256 of its content, for the CSVs that exist. Content,
+    not mtime, since every image build gives the files a new mtime."""
+    signatures = {}
+    for path in paths:
+        digest = hashlib.sha256()
+        try:
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+        except FileNotFoundError:
+            continue
+        signatures[os.path.basename(path)] = digest.hexdigest()
+    return signatures
+
+
+def loaded_signatures(cursor) -> dict:
+    cursor.execute("SELECT csv_name, signature FROM MarketplaceCatalogs")
+    return {name: signature for name, signature in cursor.fetchall()}
+
+
+def record_signatures(cursor, signatures: dict):
+    if signatures:
+        cursor.executemany(
+            """
+            INSERT INTO MarketplaceCatalogs (csv_name, signature) VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE signature = VALUES(signature)
+            """,
+            list(signatures.items())
+        )
+
+
+def claim_deltas(paths=MARKETPLACE_CSV_FILES) -> list:
+    """Renames each catalog's delta file to <delta>.<time>.applying before it
+    is read, so whatever a scraper writes meanwhile goes to a new delta file
+    instead of being deleted unread. Returns the claimed files, oldest first,
+    including those a failed load left behind. A catalog without any has no
+    changes."""
+    claimed = []
+    for path in paths:
+        delta = delta_path(path)
+        try:
+            os.replace(delta, f"{delta}.{time.time_ns()}.applying")
+        except FileNotFoundError:
+            pass
+        leftovers = glob.glob(f"{glob.escape(delta)}.*.applying")
+        claimed.extend(sorted(leftovers, key=lambda claim: int(claim.rsplit(".", 2)[1])))
+    return claimed
+
+
+def read_marketplace_deltas(deltas: list):
+    """Splits the delta files, oldest first, into (upserts, removals,
+    observations). A product that changed over several scraper runs is
+    upserted or removed once, as of its latest row in any of them;
+    observations keep every price it had, for PriceHistory."""
+    frames = []
+    for path in deltas:
+        df = pd.read_csv(path, usecols=lambda c: c in SCRAPED_COLUMNS | {'change'}, dtype=str)
+        df['price'] = clean_prices(df['price'])
+        df['observed_at'] = observed_at(df)
+        invalid = df['price'].isna() & (df['change'] != 'removed')
+        if invalid.any():
+            print(f"Skipping {int(invalid.sum())} rows with an invalid price in {path}")
+        frames.append(df[~invalid])
+    if not frames:
+        empty = pd.DataFrame(columns=STAGED_COLUMNS)
+        return empty, pd.DataFrame(columns=['product_name', 'store_name']), empty
+
+    df = pd.concat(frames, ignore_index=True)
+    removed = df['change'] == 'removed'
+    observations = df[~removed]
+    observations = add_unit_prices(observations, size_text(observations))[STAGED_COLUMNS]
+    latest = ~product_keys(df).duplicated(keep='last')
+    removals = df.loc[latest & removed, ['product_name', 'store_name']]
+    upserts = observations[latest[~removed]]
+    return upserts, removals, observations
+
+
+def load_marketplace(paths=MARKETPLACE_CSV_FILES, batch_size: int = MARKETPLACE_BATCH_SIZE, progress=None) -> dict:
+    """Brings Marketplace in line with the scraped CSVs, writing only new
+    products and products whose price or unit price changed. The comparison
+    runs in MySQL against a temporary staging table, so it costs one probe
+    of the unique key per staged product however big Marketplace is, and
+    matches names the way that key does (case-insensitively). Products the
+    scrapers' delta files record as removed (and that the CSVs no longer
+    list) are deleted, since the CSVs alone can't say what disappeared."""
+    started = time.perf_counter()
+    # Hashed before reading, so a CSV rewritten meanwhile is reloaded next time
+    signatures = csv_signatures(paths)
+    staged = read_marketplace_csvs(paths)
+    deltas = claim_deltas(paths)
+    _, removals, _ = read_marketplace_deltas(deltas)
+    listed = product_keys(removals).merge(product_keys(staged).drop_duplicates(), how='left',
+                                          indicator=True)['_merge'] == 'both'
+    removals = removals[~listed.to_numpy()]
+    if progress:
+        progress.update(staged=len(staged))
+
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            stage_products(cursor, staged, batch_size)
+            written, history = write_staged_changes(cursor)
+            if progress:
+                progress.update(to_write=written, written=written)
+            removed = delete_products(cursor, removals, batch_size)
+            if written or removed:
+                bump_marketplace_version(cursor)
+            record_signatures(cursor, signatures)
+            conn.commit()
+        except Error as e:
+            conn.rollback()
+            print(f"Error: {e}")
+            raise
+        finally:
+            # A failed cleanup must not hide the load's own error; the temporary
+            # table also goes away with the session
+            try:
+                cursor.execute("DROP TEMPORARY TABLE IF EXISTS MarketplaceStaging")
+            except Exception as e:
+                logger.warning(f"Could not drop MarketplaceStaging: {e}")
+            finally:
+                cursor.close()
+
+    # The full load covers whatever the scrapers' delta files held
+    for path in deltas:
+        os.remove(path)
+
+    stats = {
+        "mode": "full",
+        "staged": len(staged),
+        "written": written,
+        "unchanged": len(staged) - written,
+        "removed": removed,
+        "history": history,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
+    logger.info(f"Marketplace load: {stats}")
+    return stats
+
+
+def apply_marketplace_deltas(paths=MARKETPLACE_CSV_FILES, batch_size: int = MARKETPLACE_BATCH_SIZE,
+                             progress=None) -> dict:
+    """Applies only what the scrapers recorded as added, changed or removed
+    since the last load, instead of re-reading and diffing whole catalogs.
+    A catalog without a delta file has no changes. Each delta file is
+    deleted once its changes are committed."""
+    started = time.perf_counter()
+    deltas = claim_deltas(paths)
+    upserts, removals, observations = read_marketplace_deltas(deltas)
+    if progress:
+        progress.update(staged=len(upserts) + len(removals), to_write=len(upserts), written=0)
+
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            upsert_products(cursor, upserts, batch_size, progress)
+            removed = delete_products(cursor, removals, batch_size)
+            history = append_price_history(cursor, observations)
+            if len(upserts) or removed:
+                bump_marketplace_version(cursor)
+            conn.commit()
+        except Error as e:
+            conn.rollback()
+            print(f"Error: {e}")
+            raise
+        finally:
+            cursor.close()
+
+    for path in deltas:
+        os.remove(path)
+
+    stats = {
+        "mode": "delta",
+        "deltas": len(deltas),
+        "staged": len(upserts) + len(removals),
+        "written": len(upserts),
+        "removed": removed,
+        "history": history,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
+    logger.info(f"Marketplace delta load: {stats}")
+    return stats
+
+
+def catalogs_changed(paths=MARKETPLACE_CSV_FILES) -> bool:
+    """Whether Marketplace is empty or a CSV differs from the one last fully
+    loaded, e.g. a deploy shipped new CSVs, which come without delta files."""
+    signatures = csv_signatures(paths)
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT 1 FROM Marketplace LIMIT 1")
+            if not cursor.fetchall():
+                return True
+            loaded = loaded_signatures(cursor)
+        finally:
+            cursor.close()
+    return any(loaded.get(name) != signature for name, signature in signatures.items())
+
+
+def ingest(paths=MARKETPLACE_CSV_FILES, progress=None, full: bool = False) -> dict:
+    """Runs the full diffing load when Marketplace is empty, a CSV changed
+    since the last full load, or with --full; otherwise applies only the
+    scrapers' delta files."""
+    if full or catalogs_changed(paths):
+        return load_marketplace(paths, progress=progress)
+    return apply_marketplace_deltas(paths, progress=progress)
+
+
+def run_ingestion(progress: IngestionProgress = ingestion_progress, full: bool = False) -> dict:
+    """Runs a marketplace load and records its progress and outcome. Meant to
+    run in the background so the app can serve requests meanwhile."""
+    progress.update(state="running", started_at=datetime.now().isoformat(), finished_at=None, error=None)
+    try:
+        stats = ingest(progress=progress, full=full)
+    except Exception as e:
+        progress.update(state="failed", finished_at=datetime.now().isoformat(), error=str(e))
+        logger.exception("Marketplace load failed")
+        return {}
+    progress.update(state="done", finished_at=datetime.now().isoformat(), **stats)
+    return stats
+
+
+# Standalone entry point, e.g. a Cloud Run job or cron:  python marketplace.py [--full]
+if __name__ == "__main__":
+    import sys
+
+    from schema import migrate
+
+    logging.basicConfig(level=logging.INFO)
+    migrate()
+    print(run_ingestion(full="--full" in sys.argv[1:]))
@@ -0,0 +1,142 @@
+import math
+import os
+from datetime import datetime
+from typing import List, Optional
+
+import pandas as pd
+
+# Append-only price history in PriceHistory, keyed (store_name, product_name,
+# observed_at). A row is written whenever a marketplace load writes a
+# product's price (first seen, or changed), so each product's history is a
+# step function: a price holds from its observed_at until the next row.
+# The primary key clusters a product's rows by time, so a range query reads
+# one contiguous slice however many products and years the table holds, and
+# the bucketing happens in SQL, so a response is at most `points` rows.
+
+# Rows per INSERT statement
+PRICE_HISTORY_BATCH_SIZE = int(os.getenv("PRICE_HISTORY_BATCH_SIZE", 1000))
+# Upper bound on the sparkline points one request can ask for
+PRICE_HISTORY_MAX_POINTS = int(os.getenv("PRICE_HISTORY_MAX_POINTS", 500))
+
+
+def observed_at(frame: pd.DataFrame) -> pd.Series:
+    """When each scraped row was seen: its last_checked_at, or now for rows
+    (and CSVs) without one."""
+    now = pd.Timestamp(datetime.now().replace(microsecond=0))
+    if 'last_checked_at' not in frame.columns:
+        return pd.Series(now, index=frame.index)
+    return pd.to_datetime(frame['last_checked_at'], errors='coerce').fillna(now)
+
+
+def local_time(moment: datetime) -> datetime:
+    """observed_at is the scrapers' naive local time; a timezone-aware query
+    bound is converted to match."""
+    return moment.astimezone().replace(tzinfo=None) if moment.tzinfo else moment
+
+
+def append_price_history(cursor, products: pd.DataFrame, batch_size: int = PRICE_HISTORY_BATCH_SIZE) -> int:
+    """Appends a row per product (store_name, product_name, price, unit_price,
+    observed_at). Loading the same scrape twice adds nothing, since its rows
+    have the same keys."""
+    if products.empty:
+        return 0
+    unit_prices = products['unit_price'].astype(object)
+    unit_prices = unit_prices.where(unit_prices.notna(), None)
+    rows = list(zip(products['store_name'], products['product_name'],
+                    pd.to_datetime(products['observed_at']).dt.to_pydatetime(),
+                    products['price'].astype(float).tolist(), unit_prices))
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        placeholders = ", ".join(["(%s, %s, %s, %s, %s)"] * len(batch))
+        cursor.execute(
+            f"""
+            INSERT IGNORE INTO PriceHistory (store_name, product_name, observed_at, price, unit_price)
+            VALUES {placeholders}
+            """,
+            [value for row in batch for value in row]
+        )
+    return len(rows)
+
+
+def _number(value) -> Optional[float]:
+    return None if value is None else round(float(value), 2)
+
+
+def downsample(buckets: List[dict], opening: Optional[float], start: datetime, width: int, count: int) -> List[dict]:
+    """One point per bucket: the price at the bucket's end and the lowest and
+    highest price in effect during it. Buckets without a change carry the
+    previous price forward; those before the first observation have none."""
+    by_bucket = {int(b['bucket']): b for b in buckets}
+    price = opening
+    points = []
+    for i in range(count):
+        bucket = by_bucket.get(i)
+        low = high = price
+        if bucket is not None:
+            low = float(bucket['low']) if price is None else min(price, float(bucket['low']))
+            high = float(bucket['high']) if price is None else max(price, float(bucket['high']))
+            price = float(bucket['close'])
+        points.append({
+            "start": (start + pd.Timedelta(seconds=i * width)).isoformat(),
+            "price": _number(price),
+            "low": _number(low),
+            "high": _number(high),
+        })
+    return points
+
+
+async def price_history(cursor, store_name: str, product_name: str, start: datetime, end: datetime,
+                        points: int) -> Optional[dict]:
+    """Min/max/average price of a product over [start, end) and a sparkline
+    of at most `points` points, or None if it has no history at all."""
+    # The price already in effect when the range starts
+    await cursor.execute(
+        """
+        SELECT price FROM PriceHistory
+        WHERE store_name = %s AND product_name = %s AND observed_at < %s
+        ORDER BY observed_at DESC LIMIT 1
+        """,
+        (store_name, product_name, start)
+    )
+    row = await cursor.fetchone()
+    opening = float(row['price']) if row else None
+
+    width = max(1, math.ceil((end - start).total_seconds() / points))
+    await cursor.execute(
+        """
+        SELECT b.bucket, b.low, b.high, b.observations, h.price AS close
+        FROM (
+            SELECT FLOOR((UNIX_TIMESTAMP(observed_at) - UNIX_TIMESTAMP(%s)) / %s) AS bucket,
+                   MIN(price) AS low, MAX(price) AS high, COUNT(*) AS observations,
+                   MAX(observed_at) AS last_observed_at
+            FROM PriceHistory
+            WHERE store_name = %s AND product_name = %s AND observed_at >= %s AND observed_at < %s
+            GROUP BY bucket
+        ) b
+        JOIN PriceHistory h
+            ON h.store_name = %s AND h.product_name = %s AND h.observed_at = b.last_observed_at
+        ORDER BY b.bucket
+        """,
+        (start, width, store_name, product_name, start, end, store_name, product_name)
+    )
+    buckets = await cursor.fetchall()
+    if opening is None and not buckets:
+        return None
+
+    sparkline = downsample(buckets, opening, start, width, math.ceil((end - start).total_seconds() / width))
+    priced = [p for p in sparkline if p["price"] is not None]
+    return {
+        "store_name": store_name,
+        "product_name": product_name,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "bucket_seconds": width,
+        "min": min(p["low"] for p in priced),
+        "max": max(p["high"] for p in priced),
+        # Time-weighted at the sparkline's resolution
+        "avg": round(sum(p["price"] for p in priced) / len(priced), 2),
+        "first": priced[0]["price"],
+        "last": priced[-1]["price"],
+        "changes": sum(int(b['observations']) for b in buckets),
+        "sparkline": sparkline,
+    }
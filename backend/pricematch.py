@@ -0,0 +1,254 @@
+import re
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Pairs products across two store catalogs and compares their prices, all
+# locally: names are normalized into tokens, embedded as character-trigram
+# TF-IDF vectors and matched by cosine similarity, preferring pairs that fall
+# into the same category bucket. Deterministic for a given pair of catalogs.
+
+# Words that say nothing about what the product is
+STOPWORDS = {
+    "and", "the", "of", "with", "on", "in", "a", "may", "vary", "style", "fresh", "cut", "mini", "baby",
+    "petite", "jumbo", "premium", "little", "leaf", "farms", "gourmet", "garden", "world", "spice",
+    "litehouse", "taylor", "good", "gather", "bag",
+}
+
+# Category buckets, keyed by the (singular) words that put a product in them.
+# A name's last bucket word wins: "Kale Chopped Salad Kit" is a salad, not kale.
+BUCKETS = {
+    "salad": ["salad", "slaw", "coleslaw", "kit", "bowl"],
+    "lettuce": ["lettuce", "romaine", "arugula", "spring mix", "chicory", "gem", "herb salad"],
+    "leafy greens": ["kale", "spinach", "collard", "chard", "bok choy"],
+    "herbs": ["basil", "parsley", "chive", "cilantro", "rosemary", "ginger", "dill", "mint", "italian blend"],
+    "onion": ["onion", "shallot", "leek"],
+    "garlic": ["garlic"],
+    "tomato": ["tomato", "kumato"],
+    "potato": ["potato", "yam"],
+    "carrot": ["carrot"],
+    "pepper": ["pepper", "lollipepper", "shishito"],
+    "mushroom": ["mushroom", "shiitake", "portabella"],
+    "squash": ["squash", "zucchini", "pumpkin"],
+    "cucumber": ["cucumber"],
+    "crucifers": ["broccoli", "cauliflower", "brussels", "sprout", "cabbage", "cruciferous"],
+    "beans and peas": ["bean", "haricot", "pea"],
+    "corn": ["corn"],
+    "celery": ["celery", "mirepoix"],
+    "mixed vegetables": ["medley", "tray", "stir fry", "veggie"],
+    "root vegetables": ["beet", "jicama", "radish", "turnip"],
+    "apple": ["apple"],
+    "citrus": ["mandarin", "grapefruit", "orange", "lemon", "lime"],
+    "berries": ["cranberry", "gooseberry", "berry", "grape"],
+    "melon": ["watermelon", "cantaloupe", "melon"],
+    "tropical fruit": ["mango", "pineapple", "pomegranate", "persimmon", "avocado"],
+}
+
+_BUCKET_OF = {word: bucket for bucket, words in BUCKETS.items() for word in words}
+_BUCKET_WORDS = re.compile(r"\b(" + "|".join(sorted(map(re.escape, _BUCKET_OF), key=len, reverse=True)) + r")\b")
+
+
+def normalize_names(names: pd.Series) -> pd.Series:
+    """'Cherry Tomatoes on the Vine' -> 'cherry tomato vine'."""
+    words = names.fillna("").astype(str).str.lower().str.replace(r"[^a-z0-9 ]+", " ", regex=True).str.split()
+    return words.map(lambda tokens: " ".join(_singular(t) for t in tokens if t not in STOPWORDS))
+
+
+def _singular(token: str) -> str:
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith("oes"):
+        return token[:-2]
+    if token.endswith("s") and not token.endswith(("ss", "us")) and len(token) > 3:
+        return token[:-1]
+    return token
+
+
+def bucket_names(normalized: pd.Series) -> pd.Series:
+    """Category bucket for each normalized name ('' when none applies)."""
+    found = normalized.str.findall(_BUCKET_WORDS)
+    return found.map(lambda words: _BUCKET_OF[words[-1]] if words else "")
+
+
+def _trigrams(name: str) -> List[str]:
+    grams = []
+    for token in name.split():
+        padded = f" {token} "
+        grams.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def tfidf_vectors(*corpora: pd.Series) -> List[np.ndarray]:
+    """L2-normalized character-trigram TF-IDF rows for each corpus, sharing
+    one vocabulary and IDF so vectors from different corpora are comparable."""
+    docs = [_trigrams(name) for corpus in corpora for name in corpus]
+    vocab, inverse = np.unique(np.array([g for doc in docs for g in doc] or [""]), return_inverse=True)
+    doc_ids = np.repeat(np.arange(len(docs)), [len(doc) for doc in docs])
+
+    tf = np.zeros((len(docs), len(vocab)), dtype=np.float32)
+    np.add.at(tf, (doc_ids, inverse[:doc_ids.size]), 1.0)
+    df = np.count_nonzero(tf, axis=0)
+    tf *= (np.log((1 + len(docs)) / (1 + df)) + 1).astype(np.float32)
+    norms = np.linalg.norm(tf, axis=1, keepdims=True)
+    tf /= np.where(norms == 0, 1, norms)
+
+    out, start = [], 0
+    for corpus in corpora:
+        out.append(tf[start:start + len(corpus)])
+        start += len(corpus)
+    return out
+
+
+def match_products(left: pd.DataFrame, right: pd.DataFrame, min_similarity: float = 0.35,
+                   cross_bucket_similarity: float = 0.7) -> pd.DataFrame:
+    """Best `right` match for every `left` product (product_name/price frames,
+    optionally with quantity/unit/unit_price from units.add_unit_prices).
+
+    Candidates in the same category bucket need `min_similarity`; products in
+    different (or no) buckets only pair when their names are near-identical."""
+    left = left.reset_index(drop=True)
+    right = right.reset_index(drop=True)
+    left_norm, right_norm = normalize_names(left['product_name']), normalize_names(right['product_name'])
+    left_bucket, right_bucket = bucket_names(left_norm), bucket_names(right_norm)
+    if left.empty or right.empty:
+        return pd.DataFrame(columns=['left_name', 'right_name', 'bucket', 'similarity']
+                            + [f"{side}_{c}" for side in ('left', 'right') for c in _SIZE_COLUMNS])
+
+    left_vec, right_vec = tfidf_vectors(left_norm, right_norm)
+    similarity = left_vec @ right_vec.T
+    lb, rb = left_bucket.to_numpy(), right_bucket.to_numpy()
+    same_bucket = (lb[:, None] == rb[None, :]) & (lb != "")[:, None]
+    allowed = np.where(same_bucket, similarity >= min_similarity, similarity >= cross_bucket_similarity)
+    scores = np.where(allowed, similarity, -1.0)
+
+    best = scores.argmax(axis=1)
+    best_score = scores[np.arange(len(left)), best]
+    keep = best_score >= 0
+    li, ri = np.flatnonzero(keep), best[keep]
+    pairs = pd.DataFrame({
+        'left_name': left['product_name'].to_numpy()[li],
+        'right_name': right['product_name'].to_numpy()[ri],
+        'bucket': np.where(lb[li] != "", lb[li], rb[ri]),
+        'similarity': best_score[keep].astype(float).round(3),
+    })
+    for side, frame, ids in (('left', left, li), ('right', right, ri)):
+        for column in _SIZE_COLUMNS:
+            values = frame[column].to_numpy()[ids] if column in frame.columns else np.full(ids.size, np.nan)
+            pairs[f"{side}_{column}"] = values
+    return pairs
+
+
+_SIZE_COLUMNS = ['price', 'quantity', 'unit', 'unit_price']
+
+
+def _rounded(percent: float) -> Optional[float]:
+    # None rather than NaN, which isn't valid JSON
+    return None if pd.isna(percent) else round(float(percent), 1)
+
+
+def compare_catalogs(left: pd.DataFrame, right: pd.DataFrame,
+                     left_store: str, right_store: str, top: int = 5) -> dict:
+    """Matched pairs plus per-pair, per-bucket and overall price differences.
+    Positive differences mean `right_store` is cheaper.
+
+    When both products of a pair have a size in the same canonical unit they
+    are compared per unit: `right_cost` is what the left product's quantity
+    would cost at the right store. Otherwise shelf prices are compared."""
+    pairs = match_products(left, right)
+    for column in ('left_price', 'right_price', 'left_quantity', 'left_unit_price', 'right_unit_price'):
+        pairs[column] = pd.to_numeric(pairs[column], errors='coerce')
+    unit_priced = (
+        pairs['left_unit'].notna() & (pairs['left_unit'] == pairs['right_unit'])
+        & pairs['left_unit_price'].notna() & pairs['right_unit_price'].notna()
+    )
+    pairs['basis'] = np.where(unit_priced, 'unit', 'shelf')
+    pairs['left_cost'] = pairs['left_price']
+    pairs['right_cost'] = np.where(unit_priced, pairs['right_unit_price'] * pairs['left_quantity'],
+                                   pairs['right_price']).round(2)
+    pairs['difference'] = (pairs['left_cost'] - pairs['right_cost']).round(2)
+    # A free (zero-cost) left product has no percentage; NaN, so None below
+    pairs['percent_difference'] = (pairs['difference'] / pairs['left_cost'].where(pairs['left_cost'] != 0) * 100).round(1)
+
+    overall = {
+        "matched": int(len(pairs)),
+        "left_products": int(len(left)),
+        "right_products": int(len(right)),
+        "unit_priced": int(unit_priced.sum()),
+    }
+    if not pairs.empty:
+        left_total, right_total = pairs['left_cost'].sum(), pairs['right_cost'].sum()
+        overall.update({
+            "cheaper_at": {
+                left_store: int((pairs['difference'] < 0).sum()),
+                right_store: int((pairs['difference'] > 0).sum()),
+                "same price": int((pairs['difference'] == 0).sum()),
+            },
+            "median_percent_difference": _rounded(pairs['percent_difference'].median()),
+            # The matched items bought once at each store, in the same sizes where known
+            "basket_percent_difference": _rounded((left_total - right_total) / left_total * 100) if left_total else None,
+        })
+
+    buckets = (
+        pairs.groupby('bucket')
+        .agg(pairs=('difference', 'size'), left_total=('left_cost', 'sum'), right_total=('right_cost', 'sum'))
+        .reset_index()
+    )
+    buckets['percent_difference'] = ((buckets['left_total'] - buckets['right_total'])
+                                     / buckets['left_total'].where(buckets['left_total'] != 0) * 100).round(1)
+    # Shelf prices of different pack sizes make for misleading extremes
+    candidates = pairs[unit_priced] if unit_priced.any() else pairs
+    biggest = candidates.reindex(candidates['percent_difference'].abs().sort_values(ascending=False).index).head(top)
+    pairs = pairs.astype(object).where(pairs.notna(), None)  # NaN isn't valid JSON
+    buckets = buckets.round(2).astype(object).where(buckets.notna(), None)
+
+    result = {
+        "stores": [left_store, right_store],
+        "overall": overall,
+        "categories": buckets.to_dict(orient='records'),
+        "biggest_differences": pairs.loc[biggest.index].to_dict(orient='records'),
+        "pairs": pairs.to_dict(orient='records'),
+    }
+    result["summary"] = summarize_comparison(result)
+    return result
+
+
+def summarize_comparison(result: dict) -> str:
+    """Plain-text summary for the Marketplace insights card."""
+    left_store, right_store = result["stores"]
+    overall = result["overall"]
+    if not overall["matched"]:
+        return f"No comparable products were found between {left_store} and {right_store}."
+
+    # The verdict and the percentage quoted with it both come from the basket
+    # (every matched product bought once at each store), so they can't disagree
+    basket = overall["basket_percent_difference"]
+    compared = f"{overall['matched']} comparable products ({overall['unit_priced']} compared by unit price)"
+    if basket is None:
+        lines = [f"The {compared} are listed at no cost at {left_store}, so their prices can't be compared."]
+    elif abs(basket) < 0.5:
+        lines = [f"{left_store} and {right_store} have about the same prices.",
+                 f"Buying each of the {compared} once costs about the same at both stores."]
+    else:
+        cheaper, pricier = (right_store, left_store) if basket > 0 else (left_store, right_store)
+        lines = [f"{cheaper} generally has better prices.",
+                 f"Buying each of the {compared} once costs about {abs(basket):.0f}% less at {cheaper} "
+                 f"than at {pricier}."]
+    # A few expensive items can outweigh the rest of the basket; say so
+    typical = overall["median_percent_difference"]
+    if basket is not None and typical is not None and typical * basket < 0 and abs(typical) >= 0.5:
+        lines.append(f"The typical product, though, is about {abs(typical):.0f}% cheaper at "
+                     f"{right_store if typical > 0 else left_store}.")
+    lines.append(f"{left_store} is cheaper on {overall['cheaper_at'][left_store]} products, "
+                 f"{right_store} on {overall['cheaper_at'][right_store]}.")
+    categories: List[Tuple[str, float]] = [(c['bucket'], c['percent_difference'])
+                                           for c in result["categories"]
+                                           if c['bucket'] and c['percent_difference'] is not None]
+    if categories:
+        best_right = max(categories, key=lambda c: c[1])
+        best_left = min(categories, key=lambda c: c[1])
+        if best_right[1] > 0:
+            lines.append(f"Biggest {right_store} advantage: {best_right[0]} ({best_right[1]:.0f}% cheaper).")
+        if best_left[1] < 0:
+            lines.append(f"Biggest {left_store} advantage: {best_left[0]} ({right_store} costs {-best_left[1]:.0f}% more).")
+    return " ".join(lines)
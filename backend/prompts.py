@@ -0,0 +1,248 @@
+import os
+import re
+import math
+import logging
+import threading
+from datetime import date
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+try:
+    import tiktoken
+except ImportError:  # fall back to a character/word estimate
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Prompts send the model aggregates, not raw rows, and are shrunk until their
+# estimated size fits PROMPT_TOKEN_BUDGET, so cost and latency stay flat no
+# matter how many expenses or products a user has.
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", 1500))
+PROMPT_TOP_TRANSACTIONS = int(os.getenv("PROMPT_TOP_TRANSACTIONS", 10))
+
+_encodings = {}
+
+
+def estimate_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
+    """Token count from tiktoken when installed, otherwise an estimate
+    (~4 characters or ~0.75 words per token, whichever is larger)."""
+    if tiktoken is not None:
+        encoding = _encodings.get(model)
+        if encoding is None:
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoding = tiktoken.get_encoding("cl100k_base")
+            _encodings[model] = encoding
+        return len(encoding.encode(text))
+    return math.ceil(max(len(text) / 4, len(text.split()) * 1.33))
+
+
+class PromptStats:
+    """Running totals of prompt sizes, for /metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_kind = {}
+
+    def record(self, metrics: dict):
+        with self._lock:
+            s = self._by_kind.setdefault(metrics["kind"], {"calls": 0, "tokens": 0, "max_tokens": 0, "reduced": 0})
+            s["calls"] += 1
+            s["tokens"] += metrics["tokens"]
+            s["max_tokens"] = max(s["max_tokens"], metrics["tokens"])
+            s["reduced"] += bool(metrics["reductions"])
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                kind: {**s, "avg_tokens": round(s["tokens"] / s["calls"], 1)}
+                for kind, s in self._by_kind.items()
+            }
+
+
+prompt_stats = PromptStats()
+
+
+def _fit(kind: str, render, levels: List[dict], budget: int, model: str, **counts) -> tuple:
+    """Renders with each detail level in turn until the prompt fits the
+    budget (the last level is used regardless). Returns (text, metrics)."""
+    for i, level in enumerate(levels):
+        # Template indentation is pure token overhead
+        text = "\n".join(line.strip() for line in render(**level).strip().splitlines())
+        text = re.sub(r"\n{3,}", "\n\n", text)
+        tokens = estimate_tokens(text, model)
+        if tokens <= budget:
+            break
+    metrics = {
+        "kind": kind,
+        "tokens": tokens,
+        "budget": budget,
+        "chars": len(text),
+        "reductions": i,
+        "over_budget": tokens > budget,
+        "tokenizer": "tiktoken" if tiktoken is not None else "estimate",
+        **counts,
+    }
+    prompt_stats.record(metrics)
+    logger.info(f"Prompt {kind}: {metrics}")
+    return text, metrics
+
+
+# EXPENSE AGGREGATES
+
+def expense_frame(expenses: List[Dict]) -> pd.DataFrame:
+    df = pd.DataFrame(expenses, columns=['date', 'amount', 'category'])
+    df['date'] = pd.to_datetime(df['date'])
+    df['amount'] = pd.to_numeric(df['amount'], errors='coerce').astype(float).fillna(0.0)
+    df['category'] = df['category'].fillna('other')
+    return df
+
+
+def category_totals(df: pd.DataFrame) -> pd.DataFrame:
+    totals = df.groupby('category')['amount'].agg(total='sum', count='size').sort_values('total', ascending=False)
+    grand_total = totals['total'].sum()
+    totals['share'] = (totals['total'] / grand_total * 100).round(1) if grand_total else 0.0
+    return totals.reset_index()
+
+
+def weekly_trend(df: pd.DataFrame) -> pd.DataFrame:
+    weeks = df['date'] - pd.to_timedelta(df['date'].dt.weekday, unit='D')
+    return df.groupby(weeks.dt.date)['amount'].sum().rename_axis('week').reset_index()
+
+
+def _render_categories(totals: pd.DataFrame, limit: Optional[int]) -> str:
+    if limit is not None and len(totals) > limit:
+        rest = totals.iloc[limit:]
+        totals = pd.concat([totals.iloc[:limit], pd.DataFrame([{
+            'category': f"{len(rest)} other categories", 'total': rest['total'].sum(),
+            'count': rest['count'].sum(), 'share': rest['share'].sum(),
+        }])])
+    return "\n".join(
+        f"- {r.category}: ${r.total:.2f} over {int(r.count)} expenses ({r.share:.1f}%)" for r in totals.itertuples()
+    ) or "- none"
+
+
+def render_ai_review_prompt(expenses: List[Dict], goals: List[Dict], avg_daily_spending: float,
+                            goal_alignment: float, budget: int = PROMPT_TOKEN_BUDGET,
+                            top_n: int = PROMPT_TOP_TRANSACTIONS, model: str = "gpt-3.5-turbo") -> tuple:
+    """(prompt, metrics) for the AI review of 30 days of expenses."""
+    df = expense_frame(expenses)
+    totals = category_totals(df)
+    largest = df.nlargest(top_n, 'amount')
+    trend = weekly_trend(df)
+    # Soonest deadline first; goals without one (NULL due_date) last
+    goals = sorted(goals, key=lambda g: (g['due_date'] is None, g['due_date'] or date.max))
+
+    def render(transactions: int, categories: Optional[int], weeks: Optional[int], goal_limit: Optional[int]) -> str:
+        top = "\n".join(
+            f"- {r.date.date()}: ${r.amount:.2f} ({r.category})" for r in largest.head(transactions).itertuples()
+        )
+        recent = trend if weeks is None else trend.tail(weeks) if weeks else trend.iloc[:0]
+        weekly = "\n".join(f"- week of {r.week}: ${r.amount:.2f}" for r in recent.itertuples())
+        shown_goals = goals if goal_limit is None else goals[:goal_limit]
+        goals_str = "\n".join(
+            f"Goal: {g['title']}, Target: ${float(g['target_amount']):.2f}, Deadline: {g['due_date']}" for g in shown_goals
+        )
+        if len(shown_goals) < len(goals):
+            goals_str += f"\n(and {len(goals) - len(shown_goals)} more goals with later deadlines)"
+
+        return f"""
+        Analyze the following user's expenses and financial goals:
+
+        Average Daily Spending: ${avg_daily_spending:.2f}
+        Current Goal Alignment: {goal_alignment}%
+
+        Expenses (last 30 days): {len(df)} expenses totalling ${df['amount'].sum():.2f}
+
+        Spending by category:
+        {_render_categories(totals, categories)}
+        {f'''
+        Largest transactions:
+        {top}''' if transactions else ''}
+        {f'''
+        Weekly spending:
+        {weekly}''' if weekly else ''}
+
+        Financial Goals:
+        {goals_str}
+
+        Please provide a comprehensive analysis of the user's spending habits in relation to their financial goals.
+        Your response should include:
+
+        1. A brief overview of their current financial situation.
+        2. An explanation of their goal alignment percentage and what it means. calculate the goal alignment and give a specific value like Goal Alignment: 75%. explain how it is calculated as well.
+        3. Specific recommendations for each goal, considering their current spending habits.
+        4. A checklist of 3-5 actionable items to improve their financial situation.
+        5. Encouragement and positive reinforcement for any good financial habits observed.
+
+        Format your response as follows:
+
+        Overview: [Your analysis here]
+
+        Goal Alignment: [Explanation of the {goal_alignment}% alignment]
+
+        Goal-specific Recommendations:
+        [List each goal and provide specific advice]
+
+        Action Checklist:
+        - [Action item 1]
+        - [Action item 2]
+        - [Action item 3]
+        - [Action item 4 (if applicable)]
+        - [Action item 5 (if applicable)]
+
+        Positive Reinforcement: [Encouragement and recognition of good habits]
+
+        Make sure to address the user in your response. Address the user as "you"
+        """
+
+    # Least useful detail goes first
+    levels = [
+        dict(transactions=top_n, categories=None, weeks=None, goal_limit=None),
+        dict(transactions=top_n // 2, categories=None, weeks=None, goal_limit=None),
+        dict(transactions=top_n // 2, categories=8, weeks=4, goal_limit=None),
+        dict(transactions=3, categories=5, weeks=4, goal_limit=10),
+        dict(transactions=0, categories=5, weeks=0, goal_limit=5),
+    ]
+    return _fit("ai-review", render, levels, budget, model,
+                expenses=len(df), categories=len(totals), goals=len(goals))
+
+
+# PRICE COMPARISON
+
+def render_price_comparison_prompt(comparison: dict, budget: int = PROMPT_TOKEN_BUDGET,
+                                   model: str = "gpt-3.5-turbo") -> tuple:
+    """(prompt, metrics) asking the model to word an already computed comparison."""
+    left_store, right_store = comparison["stores"]
+    # Buckets with no percentage (nothing to compare against) go last
+    categories = sorted(comparison["categories"], key=lambda c: abs(c["percent_difference"] or 0), reverse=True)
+    fields = ("left_name", "right_name", "left_price", "right_price", "basis", "percent_difference")
+    biggest = [{k: p[k] for k in fields} for p in comparison["biggest_differences"]]
+
+    def render(category_limit: Optional[int], examples: int) -> str:
+        facts = {
+            "stores": comparison["stores"],
+            "overall": comparison["overall"],
+            "categories": categories[:category_limit],
+            "biggest_differences": biggest[:examples],
+        }
+        return f"""
+        You are a price comparison assistant. The comparison between {left_store} and {right_store} below has already been computed; do not recalculate anything.
+        left_* fields refer to {left_store}, right_* fields to {right_store}, and a positive percent_difference means {right_store} is cheaper.
+
+        Write a brief overall summary in plain text without Markdown, formatted for easy readability in a UI card component:
+        - Which store generally has better prices? Go by overall.basket_percent_difference (the matched products bought once at each store).
+        - What is that approximate percentage difference, and in which categories is it largest?
+
+        {facts}
+        """
+
+    levels = [
+        dict(category_limit=None, examples=len(biggest)),
+        dict(category_limit=10, examples=3),
+        dict(category_limit=5, examples=0),
+    ]
+    return _fit("compare-prices", render, levels, budget, model,
+                categories=len(categories), pairs=comparison["overall"]["matched"])
@@ -0,0 +1,125 @@
+import os
+import json
+import uuid
+import hashlib
+from typing import Awaitable, Callable, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from cache import LRUCache
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # only needed when READ_CACHE_URL points at Redis
+    aioredis = None
+
+READ_CACHE_URL = os.getenv("READ_CACHE_URL")
+READ_CACHE_SIZE = int(os.getenv("READ_CACHE_SIZE", 10000))
+READ_CACHE_TTL = int(os.getenv("READ_CACHE_TTL", 3600))
+
+
+class LocalBackend:
+    """In-process LRU. Each app instance keeps its own copy."""
+
+    name = "local"
+
+    def __init__(self, maxsize: int = READ_CACHE_SIZE, ttl: int = READ_CACHE_TTL):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: bytes):
+        self._cache.set(key, value)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+class RedisBackend:
+    """Shared across app instances. Takes a redis URL, or any client with
+    async get(key) / set(key, value, ex=seconds) for a local stand-in."""
+
+    name = "redis"
+
+    def __init__(self, url: Optional[str] = None, ttl: int = READ_CACHE_TTL, client=None):
+        if client is None:
+            if aioredis is None:
+                raise RuntimeError("READ_CACHE_URL is set but the redis package is not installed")
+            client = aioredis.from_url(url)
+        self._client = client
+        self.ttl = ttl
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._client.get(key)
+
+    async def set(self, key: str, value: bytes):
+        await self._client.set(key, value, ex=self.ttl)
+
+    def stats(self) -> dict:
+        return {}
+
+
+class ReadCache:
+    """Per-user cache of rendered JSON responses with versioned keys.
+
+    Every key embeds the owner's current version token, so a write only has
+    to replace that token (`bump`) and every older entry becomes unreachable;
+    nothing is deleted and a read racing a write can only ever fill a key
+    that is already stale. Tokens are random rather than counters so a
+    version evicted from the cache can never come back and resurrect old
+    entries. Responses carry an ETag, and a matching If-None-Match gets a
+    bodyless 304."""
+
+    def __init__(self, backend=None):
+        self.backend = backend or LocalBackend()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    async def version(self, owner: str) -> str:
+        key = f"v:{owner}"
+        token = await self.backend.get(key)
+        if token is None:
+            token = uuid.uuid4().hex[:12].encode()
+            await self.backend.set(key, token)
+        return token.decode() if isinstance(token, bytes) else token
+
+    async def bump(self, owner: str):
+        await self.backend.set(f"v:{owner}", uuid.uuid4().hex[:12].encode())
+
+    async def respond(self, request: Request, owner: str, name: str,
+                      load: Callable[[], Awaitable[dict]], *args) -> Response:
+        """Serves `name` for `owner` from the cache, calling `load()` on a miss."""
+        version = await self.version(owner)
+        key = ":".join([name, owner, version, *(str(a) for a in args)])
+        entry = await self.backend.get(key)
+        if entry is not None:
+            self.hits += 1
+            etag, body = entry.split(b"\n", 1)
+            etag = etag.decode()
+        else:
+            self.misses += 1
+            body = json.dumps(jsonable_encoder(await load())).encode()
+            etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+            await self.backend.set(key, etag.encode() + b"\n" + body)
+
+        # no-cache: the browser keeps its copy but revalidates every time
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if request.headers.get("if-none-match") == etag:
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "store": self.backend.stats(),
+        }
+
+
+read_cache = ReadCache(RedisBackend(READ_CACHE_URL) if READ_CACHE_URL else LocalBackend())
@@ -0,0 +1,187 @@
+from datetime import date, timedelta
+from typing import Iterable, List, Optional
+
+import pandas as pd
+
+# Per-user, per-category spending totals by day, week (starting Monday) and
+# month, kept in ExpenseRollups. Every write to Expenses applies the matching
+# delta in the same transaction, so the dashboard reads O(periods) rows
+# instead of every expense.
+PERIODS = ("day", "week", "month")
+
+
+def period_start(period: str, day: date) -> date:
+    if period == "day":
+        return day
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def rollup_deltas(expenses: pd.DataFrame, sign: int = 1) -> List[tuple]:
+    """(period_type, period_start, category, total, count) rows for a frame of
+    date/amount/category expenses. An optional `count` column says how many
+    expenses a row stands for (pre-grouped input). sign=-1 gives the rows to
+    subtract."""
+    if expenses.empty:
+        return []
+    days = pd.to_datetime(expenses['date'])
+    starts = {
+        "day": days,
+        "week": days - pd.to_timedelta(days.dt.weekday, unit='D'),
+        "month": days.dt.to_period('M').dt.start_time,
+    }
+    frame = pd.DataFrame({
+        'category': expenses['category'].to_numpy(),
+        'amount': expenses['amount'].astype(float).to_numpy(),
+        'count': expenses['count'].astype(int).to_numpy() if 'count' in expenses.columns else 1,
+    })
+    rows = []
+    for period in PERIODS:
+        frame['period_start'] = starts[period].dt.date.to_numpy()
+        grouped = frame.groupby(['period_start', 'category']).agg(total=('amount', 'sum'), count=('count', 'sum'))
+        for (start, category), total, count in zip(grouped.index, grouped['total'], grouped['count']):
+            rows.append((period, start, category, sign * round(float(total), 2), sign * int(count)))
+    return rows
+
+
+async def apply_rollup_deltas(cursor, user_id: int, deltas: Iterable[tuple]):
+    deltas = list(deltas)
+    if not deltas:
+        return
+    await cursor.executemany(
+        """
+        INSERT INTO ExpenseRollups (user_id, period_type, period_start, category, total_amount, expense_count)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            total_amount = total_amount + VALUES(total_amount),
+            expense_count = expense_count + VALUES(expense_count)
+        """,
+        [(user_id, *delta) for delta in deltas]
+    )
+    if any(delta[4] < 0 for delta in deltas):
+        await cursor.execute("DELETE FROM ExpenseRollups WHERE user_id = %s AND expense_count <= 0", (user_id,))
+
+
+async def subtract_dates(cursor, user_id: int, dates: List[date]):
+    """Takes the stored expenses of `dates` out of the rollups. Call before deleting them."""
+    if not dates:
+        return
+    placeholders = ", ".join(["%s"] * len(dates))
+    await cursor.execute(
+        f"""
+        SELECT date, category, SUM(amount) AS amount, COUNT(*) AS n
+        FROM Expenses WHERE user_id = %s AND date IN ({placeholders})
+        GROUP BY date, category
+        """,
+        (user_id, *dates)
+    )
+    existing = await cursor.fetchall()
+    if existing:
+        frame = pd.DataFrame(existing).rename(columns={'n': 'count'})
+        await apply_rollup_deltas(cursor, user_id, rollup_deltas(frame, sign=-1))
+
+
+async def replace_expense(cursor, user_id: int, old: Optional[dict], new: Optional[dict]):
+    """Moves a single edited expense (date/amount/category dicts) from `old` to `new`."""
+    deltas = []
+    for row, sign in ((old, -1), (new, 1)):
+        if row is None:
+            continue
+        for period in PERIODS:
+            deltas.append((period, period_start(period, row['date']), row['category'],
+                           sign * round(float(row['amount']), 2), sign))
+    await apply_rollup_deltas(cursor, user_id, deltas)
+
+
+async def category_totals(cursor, user_id: int, period: str, since: date) -> List[dict]:
+    await cursor.execute(
+        """
+        SELECT category, SUM(total_amount) AS total, COUNT(DISTINCT period_start) AS periods,
+               MIN(period_start) AS first_period, MAX(period_start) AS last_period
+        FROM ExpenseRollups
+        WHERE user_id = %s AND period_type = %s AND period_start >= %s
+        GROUP BY category
+        """,
+        (user_id, period, since)
+    )
+    return await cursor.fetchall()
+
+
+def category_shares(rows: List[dict], spans: int, value_key: str) -> List[dict]:
+    """Average per period and share of spending for each category, biggest first."""
+    grand_total = sum(float(r['total']) for r in rows)
+    if grand_total <= 0 or spans <= 0:
+        return []
+    shares = [
+        {
+            "category": r['category'],
+            value_key: round(float(r['total']) / grand_total * 100, 2),
+            "average": round(float(r['total']) / spans, 2),
+        }
+        for r in rows
+    ]
+    return sorted(shares, key=lambda s: s[value_key], reverse=True)
+
+
+async def daily_averages(cursor, user_id: int, days: int, today: date) -> dict:
+    rows = await category_totals(cursor, user_id, "day", today - timedelta(days=days - 1))
+    if not rows:
+        return {"daily_averages": [], "average_daily_spending": 0}
+    # Average over the days since the first recorded expense in the window
+    first = min(r['first_period'] for r in rows)
+    last = max(r['last_period'] for r in rows)
+    spans = (last - first).days + 1
+    total = sum(float(r['total']) for r in rows)
+    return {
+        "daily_averages": category_shares(rows, spans, "value"),
+        "average_daily_spending": round(total / spans, 2),
+    }
+
+
+async def weekly_averages(cursor, user_id: int, weeks: int, today: date) -> dict:
+    since = period_start("week", today) - timedelta(weeks=weeks - 1)
+    rows = await category_totals(cursor, user_id, "week", since)
+    if not rows:
+        return {"weekly_averages": []}
+    first = min(r['first_period'] for r in rows)
+    last = max(r['last_period'] for r in rows)
+    spans = (last - first).days // 7 + 1
+    return {"weekly_averages": category_shares(rows, spans, "percentage")}
+
+
+def backfill_rollups(cursor):
+    """Fills ExpenseRollups from every stored expense in three INSERT ...
+    SELECT ... GROUP BY statements. Expects an empty table."""
+    for period, expr in (
+        ("day", "date"),
+        ("week", "DATE_SUB(date, INTERVAL WEEKDAY(date) DAY)"),
+        ("month", "DATE_FORMAT(date, '%Y-%m-01')"),
+    ):
+        cursor.execute(f"""
+            INSERT INTO ExpenseRollups (user_id, period_type, period_start, category, total_amount, expense_count)
+            SELECT user_id, '{period}', {expr}, category, SUM(amount), COUNT(*)
+            FROM Expenses
+            GROUP BY user_id, {expr}, category
+        """)
+
+
+# Rebuilds the rollups from scratch, e.g. after editing Expenses by hand:  python rollups.py
+def rebuild_all(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM ExpenseRollups")
+        backfill_rollups(cursor)
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+if __name__ == "__main__":
+    from db import db_pool
+    from schema import migrate
+
+    migrate()
+    with db_pool.connection() as conn:
+        rebuild_all(conn)
+    print("Expense rollups rebuilt.")
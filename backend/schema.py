@@ -0,0 +1,299 @@
+import logging
+import threading
+
+from mysql.connector import Error
+
+from db import db_pool
+from rollups import backfill_rollups
+
+logger = logging.getLogger(__name__)
+
+
+def add_index(table: str, name: str, columns: str, unique: bool = False):
+    """Migration step creating an index unless one with that name exists
+    (MySQL has no CREATE INDEX IF NOT EXISTS)."""
+    def step(cursor):
+        cursor.execute(
+            "SELECT 1 FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s LIMIT 1",
+            (table, name)
+        )
+        if cursor.fetchone() is None:
+            cursor.execute(f"ALTER TABLE {table} ADD {'UNIQUE ' if unique else ''}INDEX {name} ({columns})")
+            logger.info(f"Created index {name} on {table}")
+    step.adds_index = (table, name, columns, unique)  # for the SQLite stand-in (benchmarks/standin.py)
+    return step
+
+
+def add_column(table: str, name: str, definition: str):
+    """Migration step adding a column unless it is already there."""
+    def step(cursor):
+        cursor.execute(
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s LIMIT 1",
+            (table, name)
+        )
+        if cursor.fetchone() is None:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+            logger.info(f"Added column {name} to {table}")
+    step.adds_column = (table, name, definition)
+    return step
+
+
+def backfill_expense_rollups(cursor):
+    """Migration step totalling the expenses stored before ExpenseRollups
+    existed. Skipped when the table already has rows (it is being kept up
+    to date, or was rebuilt with rollups.py)."""
+    cursor.execute("SELECT 1 FROM ExpenseRollups LIMIT 1")
+    if cursor.fetchone() is None:
+        backfill_rollups(cursor)
+        logger.info("Backfilled ExpenseRollups from Expenses")
+
+
+def backfill_price_history(cursor):
+    """Migration step recording today's Marketplace prices as the first
+    PriceHistory entry of every product. The loader only appends a product
+    when its price changes, so without this, products whose price never
+    changes would have no history at all. Skipped once the table has rows."""
+    cursor.execute("SELECT 1 FROM PriceHistory LIMIT 1")
+    if cursor.fetchone() is None:
+        cursor.execute(
+            """
+            INSERT IGNORE INTO PriceHistory (store_name, product_name, observed_at, price, unit_price)
+            SELECT store_name, product_name, NOW(), price, unit_price
+            FROM Marketplace WHERE price IS NOT NULL
+            """
+        )
+        logger.info(f"Backfilled PriceHistory with {cursor.rowcount} Marketplace prices")
+
+
+# Versioned schema changes, applied in order and recorded in schema_migrations.
+# Every step is idempotent (IF NOT EXISTS, add_index, add_column), so the first run
+# against a database whose tables were created by hand only fills in what is
+# missing. Append new migrations; never edit one that has shipped.
+MIGRATIONS = [
+    (1, "Base tables", [
+        """
+        CREATE TABLE IF NOT EXISTS Users (
+            user_id INT AUTO_INCREMENT PRIMARY KEY,
+            auth0_id VARCHAR(255) NOT NULL,
+            name VARCHAR(255),
+            email VARCHAR(255)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS Goals (
+            goal_id INT AUTO_INCREMENT PRIMARY KEY,
+            status VARCHAR(20) NOT NULL DEFAULT 'active',
+            set_date DATE,
+            due_date DATE,
+            goal_type VARCHAR(50),
+            target_amount DECIMAL(12, 2),
+            current_amount DECIMAL(12, 2) DEFAULT 0,
+            auth0_id VARCHAR(255) NOT NULL,
+            user_id INT,
+            title VARCHAR(255),
+            description TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS Expenses (
+            expense_id INT AUTO_INCREMENT PRIMARY KEY,
+            date DATE NOT NULL,
+            amount DECIMAL(12, 2) NOT NULL,
+            category VARCHAR(50),
+            user_id INT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS Marketplace (
+            product_id INT AUTO_INCREMENT PRIMARY KEY,
+            product_name VARCHAR(255) NOT NULL,
+            price DECIMAL(10, 2),
+            store_name VARCHAR(100) NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS yes_no (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            auth0_id VARCHAR(255),
+            email VARCHAR(255) NOT NULL,
+            response VARCHAR(3)
+        )
+        """,
+    ]),
+    (2, "Per-user category rules", [
+        """
+        CREATE TABLE IF NOT EXISTS CategoryRules (
+            rule_id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            keyword VARCHAR(100) NOT NULL,
+            category VARCHAR(50) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_category_rules_user (user_id)
+        )
+        """,
+    ]),
+    # Marketplace upserts use ON DUPLICATE KEY UPDATE on this key
+    (3, "Unique marketplace product per store", [
+        add_index("Marketplace", "uq_marketplace_product_store", "product_name, store_name", unique=True),
+    ]),
+    # Maintained incrementally by rollups.py alongside every Expenses write,
+# starting from the expenses already stored
+    (4, "Expense rollups", [
+        """
+        CREATE TABLE IF NOT EXISTS ExpenseRollups (
+            user_id INT NOT NULL,
+            period_type VARCHAR(5) NOT NULL,
+            period_start DATE NOT NULL,
+            category VARCHAR(50) NOT NULL,
+            total_amount DECIMAL(12, 2) NOT NULL DEFAULT 0,
+            expense_count INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, period_type, period_start, category)
+        )
+        """,
+        backfill_expense_rollups,
+    ]),
+    # One per hot lookup: resolve_user_id, /expense-dates + /expenses/{date},
+    # /goals?status= ordered by due date, and the yes_no email check
+    (5, "Indexes for hot queries", [
+        add_index("Users", "idx_users_auth0_id", "auth0_id"),
+        add_index("Expenses", "idx_expenses_user_date", "user_id, date"),
+        add_index("Goals", "idx_goals_auth0_status_due", "auth0_id, status, due_date"),
+        add_index("yes_no", "idx_yes_no_email", "email"),
+    ]),
+    # Package size in canonical units (oz, fl oz, each) and price per unit, see units.py
+    (6, "Marketplace unit prices", [
+        add_column("Marketplace", "quantity", "DECIMAL(10, 3) NULL"),
+        add_column("Marketplace", "unit", "VARCHAR(10) NULL"),
+        add_column("Marketplace", "unit_price", "DECIMAL(12, 4) NULL"),
+    ]),
+    # Append-only, written by marketplace.py; the key clusters each product's
+    # prices by time for the range scans in pricehistory.py
+    (7, "Price history", [
+        """
+        CREATE TABLE IF NOT EXISTS PriceHistory (
+            store_name VARCHAR(100) NOT NULL,
+            product_name VARCHAR(255) NOT NULL,
+            observed_at DATETIME NOT NULL,
+            price DECIMAL(10, 2) NOT NULL,
+            unit_price DECIMAL(12, 4) NULL,
+            PRIMARY KEY (store_name, product_name, observed_at)
+        )
+        """,
+        backfill_price_history,
+    ]),
+    # The AI review's active goals lookup (build_ai_review_prompt)
+    (8, "Index for active goals by user", [
+        add_index("Goals", "idx_goals_user_status", "user_id, status"),
+    ]),
+    # A single row bumped by every marketplace load that changes something, so
+    # other processes (the API's search index) can tell the catalog changed
+    (9, "Marketplace version", [
+        """
+        CREATE TABLE IF NOT EXISTS MarketplaceVersion (
+            id INT PRIMARY KEY,
+            version INT NOT NULL
+        )
+        """,
+    ]),
+    # Content hash of each scraped CSV as of the last full load, so a deploy
+    # that ships new CSVs (without delta files) reloads them
+    (10, "Loaded catalog signatures", [
+        """
+        CREATE TABLE IF NOT EXISTS MarketplaceCatalogs (
+            csv_name VARCHAR(255) PRIMARY KEY,
+            signature CHAR(64) NOT NULL
+        )
+        """,
+    ]),
+]
+
+
+class MigrationStatus:
+    """Thread-safe outcome of the last migrate() run, for /health/ready."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = {"state": "pending"}
+
+    def update(self, **fields):
+        with self._lock:
+            self._state.update(fields)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._state)
+
+
+migration_status = MigrationStatus()
+
+
+def applied_versions(cursor) -> set:
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            description VARCHAR(255),
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate() -> list:
+    """Applies every pending migration and returns the versions it ran. Safe
+    to run on every start; concurrent instances wait on a named lock. A
+    failing step stops the run (later migrations may depend on it) and is
+    re-raised, after being recorded in migration_status."""
+    ran = []
+    migration_status.update(state="running", error=None)
+    try:
+        _apply_pending(ran)
+    except Exception as e:
+        migration_status.update(state="failed", applied=ran, error=str(e))
+        logger.error(f"Error applying migrations (applied {ran or 'none'}): {e}")
+        raise
+    migration_status.update(state="done", applied=ran)
+    return ran
+
+
+def _apply_pending(ran: list):
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT GET_LOCK('econome_schema_migrations', 60)")
+            cursor.fetchone()
+            try:
+                done = applied_versions(cursor)
+                for version, description, steps in MIGRATIONS:
+                    if version in done:
+                        continue
+                    for step in steps:
+                        if callable(step):
+                            step(cursor)
+                        else:
+                            cursor.execute(step)
+                    cursor.execute(
+                        "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                        (version, description)
+                    )
+                    conn.commit()
+                    ran.append(version)
+                    logger.info(f"Applied migration {version}: {description}")
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK('econome_schema_migrations')")
+                cursor.fetchone()
+        except Error:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+# Standalone entry point:  python schema.py
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"Applied migrations: {migrate() or 'none pending'}")
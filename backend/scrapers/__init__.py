@@ -0,0 +1,10 @@
+"""Store scrapers: one adapter per store on a shared fetch/parse/emit
+pipeline. Run with `python -m scrapers` (see scrapers/cli.py)."""
+from scrapers.base import FIELDS, StoreAdapter, parse_pages
+from scrapers.fetch import DriverPool, FixtureFetcher, HttpFetcher, RateLimiter
+from scrapers.parsing import CardSelector, Field
+from scrapers.pipeline import run
+from scrapers.target import TargetAdapter
+from scrapers.traderjoes import TraderJoesAdapter
+
+ADAPTERS = {adapter.name: adapter for adapter in (TargetAdapter, TraderJoesAdapter)}
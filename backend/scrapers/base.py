@@ -0,0 +1,47 @@
+import os
+from typing import Iterator, List
+
+# Columns of every store's CSV; stores without a unit leave it empty
+FIELDS = ["id", "store_name", "product_name", "url", "price", "unit", "last_checked_at"]
+# Delta files add what happened to each row: added, changed or removed
+DELTA_FIELDS = FIELDS + ["change"]
+
+
+def delta_path(csv_path: str) -> str:
+    """trader_joes_products.csv -> trader_joes_products.delta.csv. The
+    marketplace loader (marketplace.py) follows the same naming."""
+    return os.path.splitext(csv_path)[0] + ".delta.csv"
+
+
+class StoreAdapter:
+    """What differs between stores: where the listing pages are, when a page
+    has rendered, and how to read products out of it. Everything else
+    (browsers, concurrency, rate limits, de-duplication, CSV output) is the
+    shared pipeline in scrapers.pipeline.
+
+    Adding a store means subclassing this, implementing page_url and parse
+    (usually by declaring a scrapers.parsing.CardSelector for its cards), and
+    registering the class in scrapers.ADAPTERS."""
+
+    name = ""               # CLI / fixture directory name
+    store_name = ""         # store_name column, as the backend expects it
+    csv_filename = ""
+    default_pages = "1"
+    ready_selector = ""     # CSS selector that is present once products have rendered
+
+    def page_url(self, page: int) -> str:
+        raise NotImplementedError
+
+    def parse(self, html: str) -> Iterator[dict]:
+        """Yields product_name, url, price and unit for each product card."""
+        raise NotImplementedError
+
+
+def parse_pages(spec: str) -> List[int]:
+    """"1-9" or "1,3,5-7" -> page numbers."""
+    pages = []
+    for part in spec.split(","):
+        first, _, last = part.partition("-")
+        pages.extend(range(int(first), int(last or first) + 1))
+    return pages
+
@@ -0,0 +1,73 @@
+"""Scrapes store listings into the CSVs the backend loads.
+
+    python -m scrapers                          # every store, default pages
+    python -m scrapers target --pages 1-9 --workers 3
+    python -m scrapers --save-pages pages       # also keep the fetched pages
+    python -m scrapers --fixtures pages         # replay saved pages, no browser
+    python -m scrapers --incremental            # skip pages unchanged since the last run
+
+Each run also appends what changed in a store's catalog (added, changed and
+removed products) to <csv name>.delta.csv, which the marketplace load
+applies instead of reloading the whole CSV.
+"""
+import argparse
+import time
+from typing import List, Optional
+
+from scrapers import ADAPTERS, DriverPool, FixtureFetcher, HttpFetcher, parse_pages, run
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m scrapers", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("stores", nargs="*", help=f"stores to scrape: {', '.join(ADAPTERS)} (default: all)")
+    parser.add_argument("--pages", help="page numbers for every store, e.g. 1-9 or 1,3,5-7 "
+                                        "(default: each store's own range)")
+    parser.add_argument("--workers", type=int, default=4, help="pages (and browsers) in flight at once, across stores")
+    parser.add_argument("--rate", type=float, default=1.0, help="page loads per second per store (0 = unlimited)")
+    parser.add_argument("--wait-timeout", type=float, default=15, help="seconds to wait for products to render")
+    parser.add_argument("--show-browser", action="store_true", help="run Chrome with a visible window")
+    parser.add_argument("--fetch", choices=["browser", "http"], default="browser",
+                        help="load pages in headless Chrome, or with plain HTTP requests for server-rendered listings")
+    parser.add_argument("--incremental", action="store_true",
+                        help="skip pages that are unchanged since the last incremental run (conditional requests "
+                             "with --fetch http or --fixtures, product hashes in the browser)")
+    parser.add_argument("--fixtures", help="read saved pages from this directory instead of the live sites")
+    parser.add_argument("--save-pages", help="also save every fetched page to this directory")
+    parser.add_argument("--output-dir", default=".")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    unknown = set(args.stores) - set(ADAPTERS)
+    if unknown:
+        parser.error(f"unknown store(s): {', '.join(sorted(unknown))} (choose from {', '.join(ADAPTERS)})")
+    adapters = [ADAPTERS[name]() for name in (args.stores or ADAPTERS)]
+    pages = {adapter: parse_pages(args.pages or adapter.default_pages) for adapter in adapters}
+
+    if args.fixtures:
+        fetcher = FixtureFetcher(args.fixtures)
+    elif args.fetch == "http":
+        fetcher = HttpFetcher(timeout=args.wait_timeout)
+    else:
+        fetcher = DriverPool(args.workers, wait_timeout=args.wait_timeout, headless=not args.show_browser)
+    start = time.perf_counter()
+    try:
+        summary = run(pages, fetcher, args.workers, args.rate, args.output_dir, args.save_pages, args.incremental)
+    finally:
+        fetcher.close()
+
+    for adapter in adapters:
+        store = summary.get(adapter.store_name)
+        if store is None:
+            print(f"{adapter.store_name}: no products found, '{adapter.csv_filename}' left unchanged")
+        elif store["added"] or store["changed"] or store["removed"]:
+            print(f"{adapter.store_name}: {store['products']} products saved to '{adapter.csv_filename}' "
+                  f"({store['added']} added, {store['changed']} changed, {store['removed']} removed; "
+                  f"pages {store['pages']})")
+        else:
+            print(f"{adapter.store_name}: {store['products']} products, no changes; "
+                  f"'{adapter.csv_filename}' left unchanged (pages {store['pages']})")
+    print(f"Scraping complete in {time.perf_counter() - start:.1f}s")
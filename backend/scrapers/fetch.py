@@ -0,0 +1,191 @@
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import formatdate
+from typing import Optional, Tuple
+
+import requests
+
+from scrapers.base import StoreAdapter
+
+
+class DriverPool:
+    """Headless Chrome drivers shared by the pipeline's worker threads.
+
+    A page borrows an idle driver (starting one if fewer than `size` exist),
+    so browsers are reused across pages and stores instead of relaunched.
+    `fetch` returns the page source as soon as the adapter's ready selector
+    is present, or after `wait_timeout` seconds if it never renders."""
+
+    def __init__(self, size: int, wait_timeout: float = 15, headless: bool = True):
+        self.size = size
+        self.wait_timeout = wait_timeout
+        self.headless = headless
+        self._idle = queue.Queue()
+        self._drivers = []
+        self._lock = threading.Lock()
+
+    def _start_driver(self):
+        # Only live scraping needs selenium; fixture runs work without it
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+        from webdriver_manager.chrome import ChromeDriverManager
+
+        options = webdriver.ChromeOptions()
+        if self.headless:
+            options.add_argument("--headless=new")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        # Don't wait for every subresource; the explicit wait below decides readiness
+        options.page_load_strategy = "eager"
+        return webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+
+    def _checkout(self):
+        # Wait for an idle driver, but keep checking for a free slot: a driver
+        # that failed to start gives its slot back, and the next page retries
+        while True:
+            with self._lock:
+                if self._idle.empty() and len(self._drivers) < self.size:
+                    self._drivers.append(None)  # reserve the slot while Chrome starts
+                    break
+            try:
+                return self._idle.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        try:
+            driver = self._start_driver()
+        except Exception:
+            with self._lock:
+                self._drivers.remove(None)
+            raise
+        with self._lock:
+            self._drivers[self._drivers.index(None)] = driver
+        return driver
+
+    @contextmanager
+    def driver(self):
+        driver = self._checkout()
+        try:
+            yield driver
+        finally:
+            self._idle.put(driver)
+
+    def fetch(self, adapter: StoreAdapter, page: int) -> str:
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        with self.driver() as driver:
+            driver.get(adapter.page_url(page))
+            try:
+                WebDriverWait(driver, self.wait_timeout).until(
+                    EC.presence_of_all_elements_located((By.CSS_SELECTOR, adapter.ready_selector))
+                )
+            except TimeoutException:
+                print(f"{adapter.store_name}: nothing rendered within {self.wait_timeout}s on page {page}")
+            return driver.page_source
+
+    def close(self):
+        with self._lock:
+            for driver in self._drivers:
+                if driver is not None:
+                    driver.quit()
+            self._drivers = []
+
+
+class HttpFetcher:
+    """Plain HTTP GETs, for listings that are rendered server-side. Much
+    cheaper than a browser, and supports conditional requests, so pages
+    that haven't changed since the last incremental run aren't downloaded."""
+
+    def __init__(self, timeout: float = 15, user_agent: str = "Mozilla/5.0 (compatible; EconoMe price scraper)"):
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self._local = threading.local()
+
+    def _session(self):
+        # requests.Session is not thread-safe; one per worker thread
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.headers["User-Agent"] = self.user_agent
+        return session
+
+    def fetch(self, adapter: StoreAdapter, page: int) -> str:
+        return self.fetch_if_changed(adapter, page)[0]
+
+    def fetch_if_changed(self, adapter: StoreAdapter, page: int, etag: Optional[str] = None,
+                         last_modified: Optional[str] = None) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """(html, etag, last_modified); html is None when the server says
+        the page is unchanged since the given validators."""
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        response = self._session().get(adapter.page_url(page), headers=headers, timeout=self.timeout)
+        if response.status_code == 304:
+            return None, etag, last_modified
+        response.raise_for_status()
+        return response.text, response.headers.get("ETag"), response.headers.get("Last-Modified")
+
+    def close(self):
+        pass
+
+
+class FixtureFetcher:
+    """Serves pages saved with --save-pages (<dir>/<store>/page_<n>.html)
+    instead of the live sites. `latency` adds a fixed delay per page to
+    model page loads. Answers conditional fetches from the file's size and
+    mtime, the way a static file server would."""
+
+    def __init__(self, directory: str, latency: float = 0.0):
+        self.directory = directory
+        self.latency = latency
+
+    def fetch(self, adapter: StoreAdapter, page: int) -> str:
+        return self.fetch_if_changed(adapter, page)[0]
+
+    def fetch_if_changed(self, adapter: StoreAdapter, page: int, etag: Optional[str] = None,
+                         last_modified: Optional[str] = None) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        if self.latency:
+            time.sleep(self.latency)
+        path = page_path(self.directory, adapter, page)
+        st = os.stat(path)
+        current_etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+        current_last_modified = formatdate(st.st_mtime, usegmt=True)
+        if etag == current_etag:
+            return None, etag, last_modified
+        with open(path, encoding="utf-8") as f:
+            return f.read(), current_etag, current_last_modified
+
+    def close(self):
+        pass
+
+
+def page_path(directory: str, adapter: StoreAdapter, page: int) -> str:
+    return os.path.join(directory, adapter.name, f"page_{page}.html")
+
+
+class RateLimiter:
+    """Spaces page loads at least 1/`per_second` seconds apart across all
+    threads (0 = unlimited). The pipeline keeps one per store, so a store's
+    site sees the same request rate however many workers run."""
+
+    def __init__(self, per_second: float):
+        self.interval = 1.0 / per_second if per_second > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
@@ -0,0 +1,107 @@
+import re
+from typing import Dict, Iterator, NamedTuple, Optional
+
+from lxml import etree
+from lxml import html as lxml_html
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # optional and faster; lxml is used without it
+    LexborHTMLParser = None
+
+BACKENDS = ("selectolax", "lxml") if LexborHTMLParser is not None else ("lxml",)
+
+
+class Field(NamedTuple):
+    selector: str                # CSS selector, relative to the card
+    attr: Optional[str] = None   # attribute to read; None reads the text
+    default: str = ""            # when the selector matches nothing
+
+
+_SIMPLE_SELECTOR = re.compile(r'^(?P<tag>[a-zA-Z][\w-]*)?(?:\[(?P<attr>[\w-]+)(?P<op>[*^]?=)"(?P<value>[^"]*)"\])?$')
+_CONDITIONS = {
+    "=": '@{attr}="{value}"',
+    "*=": 'contains(@{attr}, "{value}")',
+    "^=": 'starts-with(@{attr}, "{value}")',
+}
+
+
+def css_to_xpath(selector: str, relative: bool = True) -> str:
+    """XPath for the CSS the adapters use: descendant chains of `tag`,
+    `tag[attr="v"]`, `tag[attr*="v"]` and `tag[attr^="v"]`."""
+    steps = []
+    for part in selector.split():
+        match = _SIMPLE_SELECTOR.match(part)
+        if match is None or not (match["tag"] or match["attr"]):
+            raise ValueError(f"Unsupported selector: {selector!r}")
+        step = match["tag"] or "*"
+        if match["attr"]:
+            step += "[" + _CONDITIONS[match["op"]].format(attr=match["attr"], value=match["value"]) + "]"
+        steps.append(step)
+    return (".//" if relative else "//") + "//".join(steps)
+
+
+def _text(text: str) -> str:
+    # Collapses runs of whitespace the way a browser renders them (Selenium's
+    # .text), keeping the space between nested nodes: "Organic <b>Baby</b> Spinach"
+    return " ".join(text.split())
+
+
+class CardSelector:
+    """Extracts every product card on a page from a single parse.
+
+    Selectors are compiled once, when the adapter is defined, and fields
+    sharing a selector (a link's text and href) are looked up once per card.
+    Uses selectolax when it is installed and lxml otherwise; both give the
+    same values, with text whitespace-normalized as the browser shows it."""
+
+    def __init__(self, card: str, fields: Dict[str, Field], backend: Optional[str] = None):
+        if backend is not None and backend not in BACKENDS:
+            raise ValueError(f"Parser backend {backend!r} is not available (have {', '.join(BACKENDS)})")
+        self.backend = backend or BACKENDS[0]
+        self.card = card
+        self.fields = fields
+        by_selector = {}
+        for name, field in fields.items():
+            by_selector.setdefault(field.selector, []).append((name, field))
+        self._lookups = list(by_selector.items())
+        self._card_xpath = etree.XPath(css_to_xpath(card, relative=False))
+        self._field_xpaths = [
+            (etree.XPath(f"({css_to_xpath(selector)})[1]"), targets) for selector, targets in self._lookups
+        ]
+
+    def extract(self, html: str) -> Iterator[Dict[str, str]]:
+        if self.backend == "selectolax":
+            return self._extract_selectolax(html)
+        return self._extract_lxml(html)
+
+    def _extract_lxml(self, html: str) -> Iterator[Dict[str, str]]:
+        root = lxml_html.document_fromstring(html)
+        for card in self._card_xpath(root):
+            item = {}
+            for xpath, targets in self._field_xpaths:
+                nodes = xpath(card)
+                node = nodes[0] if nodes else None
+                for name, field in targets:
+                    if node is None:
+                        item[name] = field.default
+                    elif field.attr:
+                        item[name] = node.get(field.attr) or field.default
+                    else:
+                        item[name] = _text("".join(node.itertext()))
+            yield item
+
+    def _extract_selectolax(self, html: str) -> Iterator[Dict[str, str]]:
+        tree = LexborHTMLParser(html)
+        for card in tree.css(self.card):
+            item = {}
+            for selector, targets in self._lookups:
+                node = card.css_first(selector)
+                for name, field in targets:
+                    if node is None:
+                        item[name] = field.default
+                    elif field.attr:
+                        item[name] = node.attributes.get(field.attr) or field.default
+                    else:
+                        item[name] = _text(node.text(deep=True))
+            yield item
@@ -0,0 +1,234 @@
+import csv
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import zip_longest
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from scrapers.base import DELTA_FIELDS, FIELDS, StoreAdapter, delta_path
+from scrapers.fetch import RateLimiter, page_path
+from scrapers.state import ScrapeState, content_hash
+
+# The pipeline is a chain of generators, so pages are parsed while later
+# pages are still loading:
+#   fetch_pages -> page_products -> unique_products -> write_catalogs
+
+
+class Page(NamedTuple):
+    adapter: StoreAdapter
+    number: int
+    html: Optional[str]             # None when the page was not modified or failed to load
+    status: str = "fetched"         # fetched | not_modified | failed
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+def page_jobs(pages: Dict[StoreAdapter, List[int]]) -> List[Tuple[StoreAdapter, int]]:
+    """(adapter, page) pairs, alternating between stores so that a shared
+    worker pool loads every store's pages side by side."""
+    rounds = zip_longest(*[[(adapter, page) for page in numbers] for adapter, numbers in pages.items()])
+    return [job for jobs in rounds for job in jobs if job is not None]
+
+
+def fetch_pages(jobs: List[Tuple[StoreAdapter, int]], fetcher, workers: int = 4, rate: float = 1.0,
+                save_pages: Optional[str] = None, state: Optional[ScrapeState] = None) -> Iterator[Page]:
+    """Yields a Page per job, in `jobs` order. At most `workers` pages load
+    at once across all stores, and each store gets at most `rate` page loads
+    per second. With a `state`, fetchers that support conditional requests
+    are asked for the page only if it changed since the last run."""
+    limiters = {adapter.name: RateLimiter(rate) for adapter, _ in jobs}
+    conditional = state is not None and hasattr(fetcher, "fetch_if_changed")
+
+    def load(adapter: StoreAdapter, page: int) -> Page:
+        limiters[adapter.name].wait()
+        try:
+            if conditional:
+                html, etag, last_modified = fetcher.fetch_if_changed(
+                    adapter, page, *state.validators(adapter, adapter.page_url(page))
+                )
+                if html is None:
+                    return Page(adapter, page, None, "not_modified", etag, last_modified)
+            else:
+                html, etag, last_modified = fetcher.fetch(adapter, page), None, None
+        except Exception as e:
+            print(f"{adapter.store_name}: error loading page {page}: {e}")
+            return Page(adapter, page, None, "failed")
+        if save_pages:
+            path = page_path(save_pages, adapter, page)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(html)
+        return Page(adapter, page, html, "fetched", etag, last_modified)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(load, adapter, page) for adapter, page in jobs]
+        for future in futures:
+            yield future.result()
+
+
+class RunStats:
+    """Per-store page counts for one run."""
+
+    def __init__(self):
+        self.pages = defaultdict(lambda: defaultdict(int))
+        self.incomplete = set()  # stores with a page that neither loaded nor had a previous copy
+
+    def count(self, adapter: StoreAdapter, outcome: str):
+        self.pages[adapter.store_name][outcome] += 1
+
+
+def page_products(pages: Iterable[Page], state: Optional[ScrapeState] = None,
+                  stats: Optional[RunStats] = None) -> Iterator[Tuple[StoreAdapter, dict]]:
+    """Parses each page into products. With a `state`, a page that was not
+    modified, failed to load, or lists exactly what it listed last time
+    reuses its recorded products, and every page is recorded for the next run."""
+    stats = stats or RunStats()
+    for page in pages:
+        adapter = page.adapter
+        url = adapter.page_url(page.number)
+        previous = state.page(adapter, url) if state else None
+
+        if page.html is None:
+            if previous is None:
+                stats.count(adapter, "failed")
+                stats.incomplete.add(adapter.store_name)
+                continue
+            products = previous["products"]
+            stats.count(adapter, page.status)
+            entry = {**previous, "etag": page.etag or previous.get("etag"),
+                     "last_modified": page.last_modified or previous.get("last_modified")}
+        else:
+            products = list(adapter.parse(page.html))
+            digest = content_hash(products)
+            unchanged = previous is not None and previous["hash"] == digest
+            stats.count(adapter, "unchanged" if unchanged else "changed")
+            entry = {"etag": page.etag, "last_modified": page.last_modified, "hash": digest, "products": products}
+            print(f"{adapter.store_name}: found {len(products)} products on page {page.number}"
+                  + (" (unchanged)" if unchanged else ""))
+
+        if state is not None:
+            state.record(adapter, url, entry)
+        for product in products:
+            yield adapter, product
+
+
+def unique_products(products: Iterable[Tuple[StoreAdapter, dict]],
+                    last_checked_at: Optional[str] = None) -> Iterator[Tuple[StoreAdapter, dict]]:
+    """Numbers each store's products and drops a product whose URL that
+    store already listed on an earlier page."""
+    last_checked_at = last_checked_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    seen_links = defaultdict(set)
+    for adapter, product in products:
+        seen = seen_links[adapter.name]
+        if product["url"] in seen:
+            continue
+        seen.add(product["url"])
+        yield adapter, {
+            "id": len(seen),
+            "store_name": adapter.store_name,
+            **product,
+            "last_checked_at": last_checked_at,
+        }
+
+
+def read_catalog(path: str) -> List[dict]:
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+    except FileNotFoundError:
+        return []
+
+
+def catalog_delta(previous: List[dict], current: List[dict], removals: bool = True) -> List[dict]:
+    """Rows of `current` that are new or changed, and rows of `previous`
+    that are gone, each tagged with a `change` of added, changed or removed.
+    Products are matched by URL; a renamed product is removed under its old
+    name and added under the new one, since the backend keys on the name."""
+    before = {row["url"]: row for row in previous}
+    after = {row["url"]: row for row in current}
+    names = {row["product_name"] for row in current}
+    delta = []
+    for url, row in after.items():
+        old = before.get(url)
+        if old is None:
+            delta.append({**row, "change": "added"})
+            continue
+        if old["product_name"] != row["product_name"]:
+            if removals and old["product_name"] not in names:
+                delta.append({**old, "change": "removed"})
+            delta.append({**row, "change": "added"})
+        elif (old["price"], old.get("unit") or "") != (row["price"], row.get("unit") or ""):
+            delta.append({**row, "change": "changed"})
+    if removals:
+        # A name another listed product still uses stays in the catalog
+        delta.extend({**old, "change": "removed"} for url, old in before.items()
+                     if url not in after and old["product_name"] not in names)
+    return delta
+
+
+def _write_rows(path: str, fields: List[str], rows: List[dict], append: bool = False):
+    """Replaces `path` in one os.replace, so a reader (or the marketplace
+    loader claiming a delta file) never sees it half written. `append` keeps
+    the rows already there."""
+    if append:
+        rows = read_catalog(path) + rows
+    target = path + ".tmp"
+    with open(target, mode="w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(target, path)
+
+
+def write_catalogs(rows: Iterable[Tuple[StoreAdapter, dict]], output_dir: str = ".",
+                   stats: Optional[RunStats] = None) -> Dict[str, dict]:
+    """Writes each store's CSV and appends what changed since the previous
+    CSV to its delta file (see scrapers.base.delta_path), for the marketplace
+    loader to apply. A store whose catalog did not change keeps its CSV
+    untouched; one that returned no products at all keeps its previous CSV,
+    and one with a page that failed to load keeps that page's previous rows."""
+    stats = stats or RunStats()
+    catalogs, adapters = defaultdict(list), {}
+    for adapter, row in rows:
+        adapters[adapter.name] = adapter
+        catalogs[adapter.name].append(row)
+
+    summary = {}
+    for name, current in catalogs.items():
+        adapter = adapters[name]
+        path = os.path.join(output_dir, adapter.csv_filename)
+        previous = read_catalog(path)
+        # Products on a page that could not be loaded aren't gone, just unseen
+        removals = adapter.store_name not in stats.incomplete
+        if not removals:
+            listed = {row["url"] for row in current}
+            unseen = [row for row in previous if row["url"] not in listed]
+            current = current + [{**row, "id": len(current) + i} for i, row in enumerate(unseen, 1)]
+        delta = catalog_delta(previous, current, removals)
+        if delta:
+            _write_rows(path, FIELDS, current)
+            _write_rows(delta_path(path), DELTA_FIELDS, delta, append=True)
+        summary[adapter.store_name] = {
+            "products": len(current),
+            **{change: sum(row["change"] == change for row in delta) for change in ("added", "changed", "removed")},
+            "pages": dict(stats.pages[adapter.store_name]),
+        }
+    return summary
+
+
+def run(pages: Dict[StoreAdapter, List[int]], fetcher, workers: int = 4, rate: float = 1.0,
+        output_dir: str = ".", save_pages: Optional[str] = None, incremental: bool = False) -> Dict[str, dict]:
+    """Scrapes `pages` of each store into its CSV in `output_dir`. With
+    `incremental`, unchanged pages are skipped using what the previous
+    incremental run recorded in <output_dir>/.scrape_state."""
+    state = ScrapeState(os.path.join(output_dir, ".scrape_state")) if incremental else None
+    stats = RunStats()
+    loaded = fetch_pages(page_jobs(pages), fetcher, workers, rate, save_pages, state)
+    summary = write_catalogs(unique_products(page_products(loaded, state, stats)), output_dir, stats)
+    if state is not None:
+        for adapter in pages:
+            # Keep the old state of a store that failed completely
+            if adapter.store_name in summary:
+                state.save(adapter)
+    return summary
@@ -0,0 +1,57 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from scrapers.base import StoreAdapter
+
+
+def content_hash(products: List[dict]) -> str:
+    """Hash of what a page lists, rather than of its HTML, which changes on
+    every load (nonces, timestamps, tracking ids) even when the products don't."""
+    encoded = json.dumps(products, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class ScrapeState:
+    """What the previous incremental run saw on each listing page: its
+    ETag / Last-Modified validators, the hash of its products and the
+    products themselves. Kept per store in <directory>/<store>.json.
+
+    A run records every page it visits with `record`, and `save` replaces
+    the previous state with those pages, so pages dropped from the range
+    are forgotten."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._previous = {}  # store -> {page_url: entry}
+        self._current = {}
+
+    def _path(self, adapter: StoreAdapter) -> str:
+        return os.path.join(self.directory, f"{adapter.name}.json")
+
+    def pages(self, adapter: StoreAdapter) -> Dict[str, dict]:
+        if adapter.name not in self._previous:
+            try:
+                with open(self._path(adapter), encoding="utf-8") as f:
+                    self._previous[adapter.name] = json.load(f)["pages"]
+            except FileNotFoundError:
+                self._previous[adapter.name] = {}
+        return self._previous[adapter.name]
+
+    def page(self, adapter: StoreAdapter, url: str) -> Optional[dict]:
+        return self.pages(adapter).get(url)
+
+    def validators(self, adapter: StoreAdapter, url: str) -> Tuple[Optional[str], Optional[str]]:
+        entry = self.page(adapter, url) or {}
+        return entry.get("etag"), entry.get("last_modified")
+
+    def record(self, adapter: StoreAdapter, url: str, entry: dict):
+        self._current.setdefault(adapter.name, {})[url] = entry
+
+    def save(self, adapter: StoreAdapter):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(adapter)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"pages": self._current.get(adapter.name, {})}, f)
+        os.replace(path + ".tmp", path)
@@ -0,0 +1,43 @@
+from typing import Iterator
+from urllib.parse import urljoin
+
+from scrapers.base import StoreAdapter
+from scrapers.parsing import CardSelector, Field
+
+SITE_URL = "https://www.target.com"
+PAGE_SIZE = 12
+
+# data-test attributes are stable across Target's deploys, unlike class names
+TITLE_SELECTOR = 'a[data-test="product-title"]'
+PRICE_SELECTOR = 'span[data-test="current-price"]'
+
+
+class TargetAdapter(StoreAdapter):
+    """Target's fresh vegetables listing, 12 products per page. Cards are
+    rendered client-side, so pages need a browser."""
+
+    name = "target"
+    store_name = "Target"
+    csv_filename = "scraped_products.csv"  # the name marketplace.py and /compare_prices load
+    default_pages = "1-9"
+    ready_selector = PRICE_SELECTOR
+
+    cards = CardSelector('div[data-test="@web/ProductCard/body"]', {
+        "name": Field(TITLE_SELECTOR, default="No name available"),
+        "href": Field(TITLE_SELECTOR, attr="href"),
+        "price": Field(PRICE_SELECTOR, default="No price available"),
+    })
+
+    def page_url(self, page: int) -> str:
+        # Nao=12 for page 1, Nao=24 for page 2, etc.
+        return f"{SITE_URL}/c/fresh-vegetables-produce-grocery/-/N-4tglh?Nao={page * PAGE_SIZE}&moveTo=product-list-grid"
+
+    def parse(self, html: str) -> Iterator[dict]:
+        for card in self.cards.extract(html):
+            yield {
+                "url": urljoin(SITE_URL, card["href"]) if card["href"] else "No link available",
+                # Clean up the name if it contains variants
+                "product_name": card["name"].split(" -")[0],
+                "price": card["price"],
+                "unit": "",
+            }
@@ -0,0 +1,44 @@
+from typing import Iterator
+from urllib.parse import urljoin
+
+from scrapers.base import StoreAdapter
+from scrapers.parsing import CardSelector, Field
+
+SITE_URL = "https://www.traderjoes.com"
+CATEGORY_URL = SITE_URL + "/home/products/category/fresh-fruits-veggies-113"
+
+# Class names are CSS-module hashes (ProductList_productList__item__1EIvq);
+# matching on the stable prefix survives a redeploy that changes the hash
+CARD_SELECTOR = 'li[class*="ProductList_productList__item__"]'
+
+
+class TraderJoesAdapter(StoreAdapter):
+    """Trader Joe's fresh fruits & veggies category."""
+
+    name = "traderjoes"
+    store_name = "Trader Joe's"
+    csv_filename = "trader_joes_products.csv"
+    default_pages = "1-4"
+    ready_selector = CARD_SELECTOR
+
+    cards = CardSelector(CARD_SELECTOR, {
+        "name": Field('h2[class*="ProductCard_card__title__text__"]', default="No title found"),
+        "href": Field('a[class*="ProductCard_card__title__"]', attr="href"),
+        "price": Field('span[class*="ProductPrice_productPrice__price__"]', default="No price found"),
+        "unit": Field('span[class*="ProductPrice_productPrice__unit__"]'),
+    })
+
+    def page_url(self, page: int) -> str:
+        # Page 1 has no filter in its URL
+        if page == 1:
+            return CATEGORY_URL
+        return CATEGORY_URL + "?filters=%7B%22page%22%3A{}%7D".format(page)
+
+    def parse(self, html: str) -> Iterator[dict]:
+        for card in self.cards.extract(html):
+            yield {
+                "product_name": card["name"],
+                "url": urljoin(SITE_URL, card["href"]) if card["href"] else "No link found",
+                "price": card["price"],
+                "unit": card["unit"],
+            }
@@ -0,0 +1,207 @@
+import re
+import threading
+import time
+import logging
+from bisect import bisect_left
+from typing import List, Optional
+
+import numpy as np
+
+from cache import LRUCache
+from db import db_pool
+from marketplace import marketplace_version
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def _contains(haystack: np.ndarray, needles: np.ndarray) -> np.ndarray:
+    """Boolean mask of which `needles` are in the sorted array `haystack`."""
+    if haystack.size == 0:
+        return np.zeros(needles.size, dtype=bool)
+    pos = np.searchsorted(haystack, needles)
+    pos[pos == haystack.size] = 0
+    return haystack[pos] == needles
+
+
+def _intersect(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # Probe the bigger sorted array with the smaller one: O(small * log(big)), no sorting
+    small, big = (a, b) if a.size <= b.size else (b, a)
+    return small[_contains(big, small)]
+
+
+def trigrams(text: str) -> set:
+    padded = f"  {' '.join(tokenize(text))} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ProductSearchIndex:
+    """In-memory search over product names.
+
+    Products are numbered by a static rank (shorter names first), so every
+    posting list is a sorted numpy array already in rank order and a result
+    page is just the head of an intersection. A query matches products whose
+    name has a token starting with each query token; products where every
+    query token is a whole word come first. When nothing matches that way,
+    trigram overlap gives typo-tolerant (fuzzy) results."""
+
+    def __init__(self, products: List[dict], version: int = 0):
+        started = time.perf_counter()
+        # The MarketplaceVersion the products were read at
+        self.version = version
+        self.products = sorted(products, key=lambda p: (len(p["product_name"]), p["product_name"].lower()))
+
+        postings = {}
+        grams = {}
+        stores = {}
+        for doc_id, product in enumerate(self.products):
+            name = product["product_name"]
+            for token in set(tokenize(name)):
+                postings.setdefault(token, []).append(doc_id)
+            for gram in trigrams(name):
+                grams.setdefault(gram, []).append(doc_id)
+            stores.setdefault((product.get("store_name") or "").lower(), []).append(doc_id)
+
+        self._tokens = sorted(postings)
+        self._postings = [np.array(postings[t], dtype=np.int32) for t in self._tokens]
+        self._grams = {g: np.array(ids, dtype=np.int32) for g, ids in grams.items()}
+        self._store_masks = {}
+        for store, ids in stores.items():
+            mask = np.zeros(len(self.products), dtype=bool)
+            mask[ids] = True
+            self._store_masks[store] = mask
+        # Search-as-you-type repeats the same short prefixes and queries constantly
+        self._prefix_cache = LRUCache(maxsize=4096)
+        # One-character prefixes span huge token ranges; build them up front
+        self._first_chars = {}
+        for char in {token[0] for token in self._tokens}:
+            self._first_chars[char] = self._prefix_union(char)
+        self.build_seconds = round(time.perf_counter() - started, 3)
+
+    def __len__(self):
+        return len(self.products)
+
+    def _exact(self, token: str) -> np.ndarray:
+        i = bisect_left(self._tokens, token)
+        if i < len(self._tokens) and self._tokens[i] == token:
+            return self._postings[i]
+        return np.empty(0, dtype=np.int32)
+
+    def _prefix_union(self, prefix: str) -> np.ndarray:
+        lo = bisect_left(self._tokens, prefix)
+        hi = bisect_left(self._tokens, prefix + "\uffff")
+        if hi - lo == 1:
+            return self._postings[lo]
+        if hi > lo:
+            return np.unique(np.concatenate(self._postings[lo:hi]))
+        return np.empty(0, dtype=np.int32)
+
+    def _prefix(self, prefix: str) -> np.ndarray:
+        if len(prefix) == 1:
+            return self._first_chars.get(prefix, np.empty(0, dtype=np.int32))
+        cached = self._prefix_cache.get(prefix)
+        if cached is None:
+            cached = self._prefix_union(prefix)
+            self._prefix_cache.set(prefix, cached)
+        return cached
+
+    def _fuzzy(self, query: str, min_similarity: float = 0.5) -> np.ndarray:
+        key = "~" + query
+        cached = self._prefix_cache.get(key)
+        if cached is not None:
+            return cached
+        query_grams = trigrams(query)
+        known = [self._grams[g] for g in query_grams if g in self._grams]
+        if not known:
+            return np.empty(0, dtype=np.int32)
+        counts = np.bincount(np.concatenate(known), minlength=len(self.products))
+        needed = max(1, int(np.ceil(len(query_grams) * min_similarity)))
+        ids = np.flatnonzero(counts >= needed).astype(np.int32)
+        # Most shared trigrams first, then static rank (argsort is stable)
+        ids = ids[np.argsort(-counts[ids], kind="stable")]
+        self._prefix_cache.set(key, ids)
+        return ids
+
+    def _ordered_matches(self, query: str) -> np.ndarray:
+        tokens = tokenize(query)
+        if not tokens:
+            return np.arange(len(self.products), dtype=np.int32)
+        key = "=" + " ".join(tokens)
+        cached = self._prefix_cache.get(key)
+        if cached is None:
+            cached = self._match(query, tokens)
+            self._prefix_cache.set(key, cached)
+        return cached
+
+    def _match(self, query: str, tokens: List[str]) -> np.ndarray:
+        candidates = None
+        for token in tokens:
+            ids = self._prefix(token)
+            candidates = ids if candidates is None else _intersect(candidates, ids)
+            if candidates.size == 0:
+                return self._fuzzy(query)
+
+        exact = None
+        for token in tokens:
+            ids = self._exact(token)
+            exact = ids if exact is None else _intersect(exact, ids)
+        if exact.size == 0 or exact.size == candidates.size:
+            return candidates
+        return np.concatenate([exact, candidates[~_contains(exact, candidates)]])
+
+    def search(self, query: Optional[str] = None, store: Optional[str] = None,
+               limit: Optional[int] = None, offset: int = 0) -> dict:
+        ids = self._ordered_matches(query or "")
+        if store:
+            mask = self._store_masks.get(store.lower())
+            ids = ids[mask[ids]] if mask is not None else ids[:0]
+        total = int(ids.size)
+        end = None if limit is None else offset + limit
+        return {"total": total, "products": [self.products[i] for i in ids[offset:end]]}
+
+
+# The live index, swapped in whole whenever the marketplace is reloaded
+_index: Optional[ProductSearchIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_search_index() -> Optional[ProductSearchIndex]:
+    return _index
+
+
+def rebuild_search_index() -> Optional[ProductSearchIndex]:
+    """Rebuilds the index from Marketplace. Runs after the startup load and
+    whenever refresh_search_index() sees a newer marketplace version."""
+    global _index
+    with _index_lock:
+        with db_pool.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                # Same transaction as the products, so the version matches them
+                version = marketplace_version(cursor)
+                cursor.execute("SELECT * FROM Marketplace")
+                products = cursor.fetchall()
+            finally:
+                cursor.close()
+        _index = ProductSearchIndex(products, version)
+    logger.info(f"Search index built over {len(_index)} products (version {version}) in {_index.build_seconds}s")
+    return _index
+
+
+def refresh_search_index() -> Optional[ProductSearchIndex]:
+    """Rebuilds the index if Marketplace changed since it was built, e.g. by a
+    delta load or a standalone load (python marketplace.py) in another process."""
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            version = marketplace_version(cursor)
+        finally:
+            cursor.close()
+    if _index is not None and _index.version == version:
+        return _index
+    return rebuild_search_index()
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+# Package sizes, pulled out of whatever text a store gives us ("/12 Oz",
+# "/1 Each", a Target URL slug like ".../chopped-kale-16oz-good-gather"),
+# converted to one canonical unit per dimension so prices can be compared
+# per ounce, per fluid ounce or per item.
+
+# unit as written -> (canonical unit, multiplier to get there)
+UNITS = {
+    "oz": ("oz", 1.0), "ounce": ("oz", 1.0), "ounces": ("oz", 1.0),
+    "lb": ("oz", 16.0), "lbs": ("oz", 16.0), "pound": ("oz", 16.0), "pounds": ("oz", 16.0),
+    "g": ("oz", 0.035274), "gram": ("oz", 0.035274), "grams": ("oz", 0.035274),
+    "kg": ("oz", 35.274),
+    "floz": ("fl oz", 1.0), "fl oz": ("fl oz", 1.0), "fl-oz": ("fl oz", 1.0),
+    "ml": ("fl oz", 0.033814), "l": ("fl oz", 33.814), "liter": ("fl oz", 33.814),
+    "each": ("each", 1.0), "ea": ("each", 1.0), "ct": ("each", 1.0), "count": ("each", 1.0),
+    "pk": ("each", 1.0), "pack": ("each", 1.0),
+}
+
+_UNIT_ALTERNATION = "|".join(sorted((u.replace(" ", r"[\s-]?") for u in UNITS), key=len, reverse=True))
+
+# A number (URL slugs write 11.25 as 11-25) right before a unit, or a bare
+# "each" ("yellow-onion-each"). Units must end at a separator so "-g" in a
+# slug word never counts.
+SIZE_PATTERN = (
+    r"(?:^|[\s/-])(?:(?P<quantity>\d+(?:[.-]\d+)?)[\s-]?(?P<unit>" + _UNIT_ALTERNATION + r")"
+    r"|(?P<bare>each))(?=$|[\s/#?-])"
+)
+
+
+def parse_sizes(text: pd.Series) -> pd.DataFrame:
+    """quantity/unit columns in canonical units (oz, fl oz, each) for each
+    size text; NaN/None where no size is found. The first size wins."""
+    found = text.fillna("").astype(str).str.lower().str.extract(SIZE_PATTERN)
+    written = found['unit'].fillna(found['bare']).str.replace(r"[\s-]", " ", regex=True)
+    written = written.where(~written.isin(["fl oz", "floz"]), "fl oz")
+    quantity = pd.to_numeric(found['quantity'].str.replace("-", ".", regex=False), errors='coerce')
+    quantity = quantity.where(found['bare'].isna(), 1.0)
+
+    canonical = written.map(lambda u: UNITS.get(u, (None, np.nan)) if isinstance(u, str) else (None, np.nan))
+    unit = canonical.str[0]
+    factor = canonical.str[1].astype(float)
+    quantity = (quantity * factor).round(3)
+    valid = quantity > 0
+    return pd.DataFrame({
+        'quantity': quantity.where(valid),
+        'unit': unit.where(valid),
+    }, index=text.index)
+
+
+def add_unit_prices(products: pd.DataFrame, size_text: pd.Series) -> pd.DataFrame:
+    """Adds quantity, unit and unit_price (price per canonical unit) to a
+    frame with a numeric price column."""
+    sizes = parse_sizes(size_text)
+    products = products.assign(quantity=sizes['quantity'], unit=sizes['unit'])
+    products['unit_price'] = (products['price'] / products['quantity']).round(4)
+    return products
+
+
+def size_text(products: pd.DataFrame) -> pd.Series:
+    """Where each store keeps its sizes: Trader Joe's has a unit column,
+    Target only has them in the product URL."""
+    text = pd.Series("", index=products.index)
+    for column in ('url', 'product_name', 'unit'):
+        if column in products.columns:
+            # Later columns are more specific, so they go first
+            text = products[column].fillna("").astype(str) + " " + text
+    return text
@@ -71,26 +71,16 @@ const Dashboard = () => {
                         })
                     });
 
-                    // Fetch expense dates
-                    const datesResponse = await axios.get(`${API_URL}/expense-dates`, {
+                    // Expense dates, weekly and daily averages in one request
+                    const dashboardResponse = await axios.get(`${API_URL}/dashboard`, {
                         headers: { 'Authorization': `Bearer ${token}` }
                     });
-                    setExpenseDates(datesResponse.data.dates);
-
-                    // Fetch weekly averages
-                    const weeklyResponse = await axios.get(`${API_URL}/weekly-averages`, {
-                        headers: { 'Authorization': `Bearer ${token}` }
-                    });
-                    setWeeklyData(weeklyResponse.data.weekly_averages.length > 0 
-                        ? weeklyResponse.data.weekly_averages 
+                    setExpenseDates(dashboardResponse.data.dates);
+                    setWeeklyData(dashboardResponse.data.weekly_averages.length > 0
+                        ? dashboardResponse.data.weekly_averages
                         : DEFAULT_WEEKLY_DATA);
-
-                    // Fetch daily average
-                    const dailyResponse = await axios.get(`${API_URL}/daily-average`, {
-                        headers: { 'Authorization': `Bearer ${token}` }
-                    });
-                    setDailyData(dailyResponse.data.daily_averages.length > 0
-                        ? dailyResponse.data.daily_averages 
+                    setDailyData(dashboardResponse.data.daily_averages.length > 0
+                        ? dashboardResponse.data.daily_averages
                         : DEFAULT_DAILY_DATA);
 
                 } catch (error) {
@@ -160,12 +150,40 @@ const Dashboard = () => {
     const handleAiReview = async () => {
         try {
             const token = await getAccessTokenSilently();
-            const response = await axios.get(`${API_URL}/ai-review`, {
+            // Server-Sent Events, so the review shows up while it is being written
+            const response = await fetch(`${API_URL}/ai-review/stream`, {
                 headers: {
                     'Authorization': `Bearer ${token}`
                 }
             });
-            setAiReview(response.data.analysis);
+            if (!response.ok || !response.body) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let review = '';
+            setAiReview('');
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                const events = buffer.split('\n\n');
+                buffer = events.pop();
+                for (const raw of events) {
+                    const eventLine = raw.match(/^event: (.*)$/m);
+                    const dataLine = raw.match(/^data: (.*)$/m);
+                    const event = eventLine ? eventLine[1] : 'message';
+                    const data = dataLine ? JSON.parse(dataLine[1]) : null;
+                    if (event === 'error') {
+                        throw new Error(data.detail);
+                    }
+                    if (event === 'message') {
+                        review += data;
+                        setAiReview(review);
+                    }
+                }
+            }
         } catch (error) {
             console.error('Error getting AI review:', error);
             setAiReview('Error getting AI review. Please try again.');